@@ -0,0 +1,209 @@
+from flask import make_response, request
+from flask_restx import Namespace, Resource, fields
+from http import HTTPStatus
+from auth import require_role
+from jobs import enqueue_job
+from jobs_bp import job_model
+import profiler
+import admission
+import backup
+
+# Создаем экземпляр Namespace для администрирования
+admin_bp = Namespace("admin", description="Инструменты администратора")
+
+# Модель для входных данных при включении профилировщика
+profiler_input_model = admin_bp.model(
+    "ProfilerInput",
+    {
+        "mode": fields.String(
+            default="sample", enum=list(profiler.MODES), description="cprofile или sample"
+        ),
+        "requests": fields.Integer(description="Сколько следующих запросов профилировать"),
+        "seconds": fields.Float(description="Сколько секунд профилировать"),
+        "route": fields.String(description="Профилировать только пути с этим префиксом, например /group/"),
+        "interval_ms": fields.Float(
+            default=profiler.DEFAULT_SAMPLE_INTERVAL_MS,
+            description="Интервал сэмплирования в миллисекундах (для mode=sample)",
+        ),
+    },
+)
+
+# Модель для ответа о состоянии профилировщика
+profiler_status_model = admin_bp.model(
+    "ProfilerStatus",
+    {
+        "mode": fields.String(description="Режим съёма"),
+        "active": fields.Boolean(description="Идёт ли съём сейчас"),
+        "route": fields.String(description="Фильтр по префиксу пути"),
+        "requests_left": fields.Integer(description="Сколько запросов ещё будет профилировано"),
+        "requests_profiled": fields.Integer(description="Сколько запросов уже профилировано"),
+        "samples": fields.Integer(description="Собрано сэмплов стеков (mode=sample)"),
+        "started_at": fields.Float(description="Время начала (unix time)"),
+        "finished_at": fields.Float(description="Время окончания (unix time)"),
+    },
+)
+
+# Модель для входных данных резервного копирования
+backup_input_model = admin_bp.model(
+    "BackupInput",
+    {
+        "mode": fields.String(
+            default="online", enum=list(backup.MODES),
+            description="online - backup API по шагам, snapshot - VACUUM INTO на один момент времени",
+        ),
+        "pages": fields.Integer(default=backup.DEFAULT_PAGES, description="Страниц за шаг (online)"),
+        "sleep_ms": fields.Float(
+            default=backup.DEFAULT_SLEEP * 1000, description="Пауза между шагами в миллисекундах (online)"
+        ),
+    },
+)
+
+def _is_int(value) -> bool:
+    # bool - подкласс int, но true/false в JSON числом не считаем
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_number(value) -> bool:
+    return _is_int(value) or isinstance(value, float)
+
+
+RESULT_FORMATS = {
+    "cprofile": ("pstats", "text"),
+    "sample": ("collapsed", "text"),
+}
+
+
+@admin_bp.route("/profiler/")
+@admin_bp.response(HTTPStatus.UNAUTHORIZED, "Требуется API-ключ")
+@admin_bp.response(HTTPStatus.FORBIDDEN, "Доступ запрещен")
+class ProfilerResource(Resource):
+    @admin_bp.doc("profiler_status")
+    @admin_bp.marshal_with(profiler_status_model)
+    @admin_bp.response(HTTPStatus.NOT_FOUND, "Профилировщик не запускался")
+    @require_role("admin")
+    def get(self):
+        """Получить состояние профилировщика"""
+        capture = profiler.get_capture()
+        if capture is None:
+            admin_bp.abort(HTTPStatus.NOT_FOUND, "Профилировщик не запускался")
+        return capture.status()
+
+    @admin_bp.doc("profiler_start")
+    @admin_bp.expect(profiler_input_model)
+    @admin_bp.marshal_with(profiler_status_model, code=HTTPStatus.CREATED)
+    @admin_bp.response(HTTPStatus.BAD_REQUEST, "Неверные параметры")
+    @require_role("admin")
+    def post(self):
+        """Включить профилирование следующих N запросов и/или T секунд"""
+        data = admin_bp.payload or {}
+        mode = data.get("mode") or "sample"
+        requests_count = data.get("requests")
+        seconds = data.get("seconds")
+        interval_ms = data.get("interval_ms") or profiler.DEFAULT_SAMPLE_INTERVAL_MS
+        route = data.get("route")
+
+        if mode not in profiler.MODES:
+            admin_bp.abort(HTTPStatus.BAD_REQUEST, f"Режим должен быть одним из: {', '.join(profiler.MODES)}")
+        if not requests_count and not seconds:
+            admin_bp.abort(HTTPStatus.BAD_REQUEST, "Укажите requests и/или seconds")
+        if requests_count is not None and (
+            not _is_int(requests_count) or not 0 < requests_count <= profiler.MAX_REQUESTS
+        ):
+            admin_bp.abort(HTTPStatus.BAD_REQUEST, f"requests должен быть целым от 1 до {profiler.MAX_REQUESTS}")
+        if seconds is not None and (not _is_number(seconds) or not 0 < seconds <= profiler.MAX_SECONDS):
+            admin_bp.abort(HTTPStatus.BAD_REQUEST, f"seconds должен быть числом от 0 до {profiler.MAX_SECONDS}")
+        if not _is_number(interval_ms) or interval_ms < 1:
+            admin_bp.abort(HTTPStatus.BAD_REQUEST, "interval_ms должен быть числом не меньше 1")
+        if route is not None and not isinstance(route, str):
+            admin_bp.abort(HTTPStatus.BAD_REQUEST, "route должен быть строкой")
+
+        capture = profiler.start_capture(
+            mode=mode,
+            requests=requests_count,
+            seconds=seconds,
+            route=route,
+            interval_ms=interval_ms,
+        )
+        return capture.status(), HTTPStatus.CREATED
+
+    @admin_bp.doc("profiler_reset")
+    @admin_bp.response(HTTPStatus.NO_CONTENT, "Профилировщик выключен, результаты удалены")
+    @require_role("admin")
+    def delete(self):
+        """Выключить профилировщик и удалить результаты"""
+        profiler.reset_capture()
+        return "", HTTPStatus.NO_CONTENT
+
+
+@admin_bp.route("/profiler/result")
+@admin_bp.param("format", "pstats или text для cprofile, collapsed или text для sample")
+@admin_bp.response(HTTPStatus.BAD_REQUEST, "Формат не поддерживается этим режимом")
+@admin_bp.response(HTTPStatus.NOT_FOUND, "Профилировщик не запускался")
+class ProfilerResultResource(Resource):
+    @admin_bp.doc("profiler_result")
+    @admin_bp.produces(["text/plain", "application/octet-stream"])
+    @require_role("admin")
+    def get(self):
+        """Получить накопленный профиль"""
+        capture = profiler.get_capture()
+        if capture is None:
+            admin_bp.abort(HTTPStatus.NOT_FOUND, "Профилировщик не запускался")
+
+        result_format = request.args.get("format") or RESULT_FORMATS[capture.mode][0]
+        if result_format not in RESULT_FORMATS[capture.mode]:
+            admin_bp.abort(
+                HTTPStatus.BAD_REQUEST,
+                f"Для режима {capture.mode} доступны форматы: {', '.join(RESULT_FORMATS[capture.mode])}",
+            )
+
+        if result_format == "pstats":
+            response = make_response(capture.pstats_bytes())
+            response.mimetype = "application/octet-stream"
+            response.headers["Content-Disposition"] = "attachment; filename=profile.pstats"
+        elif result_format == "collapsed":
+            response = make_response(capture.collapsed())
+            response.mimetype = "text/plain"
+        else:
+            response = make_response(capture.text())
+            response.mimetype = "text/plain"
+        return response
+
+
+@admin_bp.route("/admission")
+@admin_bp.response(HTTPStatus.FORBIDDEN, "Доступ запрещен")
+class AdmissionResource(Resource):
+    @admin_bp.doc("admission_status")
+    @require_role("admin")
+    def get(self):
+        """Получить состояние очередей допуска и счётчики повторов"""
+        return admission.status()
+
+
+@admin_bp.route("/backup")
+@admin_bp.response(HTTPStatus.BAD_REQUEST, "Неверные параметры")
+@admin_bp.response(HTTPStatus.FORBIDDEN, "Доступ запрещен")
+class BackupResource(Resource):
+    @admin_bp.doc("start_backup")
+    @admin_bp.expect(backup_input_model)
+    @admin_bp.marshal_with(job_model, code=HTTPStatus.ACCEPTED)
+    @require_role("admin")
+    def post(self):
+        """Запустить резервное копирование базы (прогресс и отчёт - в /jobs/<id>)"""
+        data = admin_bp.payload or {}
+        mode = data.get("mode") or "online"
+        pages = data.get("pages")
+        if pages is None:
+            pages = backup.DEFAULT_PAGES
+        sleep_ms = data.get("sleep_ms")
+        if sleep_ms is None:
+            sleep_ms = backup.DEFAULT_SLEEP * 1000
+
+        if mode not in backup.MODES:
+            admin_bp.abort(HTTPStatus.BAD_REQUEST, f"Режим должен быть одним из: {', '.join(backup.MODES)}")
+        if not _is_int(pages) or pages < 1:
+            admin_bp.abort(HTTPStatus.BAD_REQUEST, "pages должен быть положительным целым")
+        if not _is_number(sleep_ms) or sleep_ms < 0:
+            admin_bp.abort(HTTPStatus.BAD_REQUEST, "sleep_ms не может быть отрицательным")
+
+        job = enqueue_job("backup", {"mode": mode, "pages": pages, "sleep_ms": sleep_ms})
+        return job, HTTPStatus.ACCEPTED
@@ -0,0 +1,267 @@
+"""
+Модуль admission.py
+
+Контроль допуска запросов и повторы при занятой базе.
+
+Запросы делятся на классы (read - GET/HEAD, write - изменяющие методы, heavy - фоновые
+задачи и админка). У каждого класса свой лимит одновременно выполняющихся запросов
+и своя ограниченная очередь ожидания. Если очередь полна или место не освободилось за
+queue_timeout секунд, клиент сразу получает 503 с заголовком Retry-After, а не висит
+в потоке, дожидаясь блокировки SQLite. Место занято, пока ответ не отдан целиком -
+у потоковой выгрузки это время генерации всего тела.
+
+retry_on_locked - декоратор для функций записи из utils.py: при "database is locked"
+операция повторяется с экспоненциальной задержкой со случайным разбросом (full jitter).
+Внутри уже открытой транзакции повтор не делается - повторять должен её владелец.
+
+Счётчики допусков, отказов и повторов попадают в /metrics, текущее состояние
+очередей - в GET /admin/admission.
+"""
+
+import functools
+import math
+import os
+import random
+import threading
+import time
+from http import HTTPStatus
+from typing import Dict, Optional
+
+from flask import g, jsonify, request
+from peewee import OperationalError
+
+import metrics
+from models import db
+
+metrics.HELP.update(
+    {
+        "academy_admission_total": ("counter", "Решения контроля допуска по классам запросов"),
+        "academy_admission_queue_length": ("gauge", "Запросы, ожидающие допуска"),
+        "academy_db_lock_retries_total": ("counter", "Повторы операций из-за занятой базы"),
+    }
+)
+
+# Пути, которые не ограничиваются (мониторинг и документация)
+EXEMPT_PREFIXES = ("/metrics", "/swagger", "/swaggerui")
+EXEMPT_PATHS = ("/",)
+# Пути "тяжёлого" класса
+HEAVY_PREFIXES = ("/jobs/", "/admin/", "/export/")
+
+LOCKED_MESSAGES = ("database is locked", "database is busy")
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.environ.get(name, default))
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.environ.get(name, default))
+
+
+class AdmissionGate:
+    """Ограничение одновременных запросов класса с ограниченной очередью ожидания."""
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self.stats = {"admitted": 0, "queued": 0, "shed": 0}
+        self._condition = threading.Condition()
+
+    def acquire(self) -> bool:
+        """Занимает место. False - запрос нужно отклонить."""
+        with self._condition:
+            if self.active < self.max_concurrent:
+                self.active += 1
+                self._count("admitted")
+                return True
+            if self.waiting >= self.max_queue:
+                self._count("shed")
+                return False
+
+            self.waiting += 1
+            self._count("queued")
+            metrics.gauge_add("academy_admission_queue_length", 1, route_class=self.name)
+            try:
+                deadline = time.monotonic() + self.queue_timeout
+                while self.active >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._count("shed")
+                        return False
+                    self._condition.wait(remaining)
+                self.active += 1
+                self._count("admitted")
+                return True
+            finally:
+                self.waiting -= 1
+                metrics.gauge_add("academy_admission_queue_length", -1, route_class=self.name)
+
+    def release(self) -> None:
+        with self._condition:
+            self.active -= 1
+            self._condition.notify()
+
+    def _count(self, outcome: str) -> None:
+        self.stats[outcome] += 1
+        metrics.inc("academy_admission_total", route_class=self.name, outcome=outcome)
+
+    @property
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.queue_timeout))
+
+    def status(self) -> Dict[str, object]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "active": self.active,
+            "waiting": self.waiting,
+            **self.stats,
+        }
+
+
+gates: Dict[str, AdmissionGate] = {
+    "read": AdmissionGate(
+        "read",
+        _env_int("ACADEMY_READ_CONCURRENCY", 32),
+        _env_int("ACADEMY_READ_QUEUE", 64),
+        _env_float("ACADEMY_READ_QUEUE_TIMEOUT", 2.0),
+    ),
+    "write": AdmissionGate(
+        "write",
+        # SQLite пишет по одному, больше нескольких писателей сразу только копят ожидание блокировки
+        _env_int("ACADEMY_WRITE_CONCURRENCY", 4),
+        _env_int("ACADEMY_WRITE_QUEUE", 16),
+        _env_float("ACADEMY_WRITE_QUEUE_TIMEOUT", 3.0),
+    ),
+    "heavy": AdmissionGate(
+        "heavy",
+        _env_int("ACADEMY_HEAVY_CONCURRENCY", 2),
+        _env_int("ACADEMY_HEAVY_QUEUE", 4),
+        _env_float("ACADEMY_HEAVY_QUEUE_TIMEOUT", 1.0),
+    ),
+}
+
+retry_stats = {"retried": 0, "recovered": 0, "gave_up": 0}
+
+
+def route_class(path: str, method: str) -> Optional[str]:
+    """Класс запроса или None, если запрос не ограничивается."""
+    if path in EXEMPT_PATHS or path.startswith(EXEMPT_PREFIXES):
+        return None
+    if path.startswith(HEAVY_PREFIXES):
+        return "heavy"
+    if method in ("GET", "HEAD", "OPTIONS"):
+        return "read"
+    return "write"
+
+
+def overloaded_response(retry_after: int, message: str = "Сервер перегружен, повторите запрос позже"):
+    response = jsonify(message=message)
+    response.status_code = HTTPStatus.SERVICE_UNAVAILABLE
+    response.headers["Retry-After"] = str(retry_after)
+    return response
+
+
+def is_locked_error(error: Exception) -> bool:
+    return isinstance(error, OperationalError) and any(
+        message in str(error) for message in LOCKED_MESSAGES
+    )
+
+
+def retry_on_locked(func=None, *, attempts: int = 5, base_delay: float = 0.05, max_delay: float = 1.0):
+    """
+    Повторяет операцию, если SQLite ответил "database is locked".
+
+    Задержка перед k-м повтором - случайная в [0, min(max_delay, base_delay * 2**k)].
+    После последней попытки исключение пробрасывается дальше.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            for attempt in range(attempts):
+                try:
+                    result = func(*args, **kwargs)
+                    if attempt:
+                        _count_retry("recovered")
+                    return result
+                except OperationalError as e:
+                    if not is_locked_error(e) or db.in_transaction():
+                        raise
+                    if attempt == attempts - 1:
+                        _count_retry("gave_up")
+                        raise
+                    _count_retry("retried")
+                    time.sleep(random.uniform(0, min(max_delay, base_delay * 2**attempt)))
+
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def _count_retry(outcome: str) -> None:
+    retry_stats[outcome] += 1
+    metrics.inc("academy_db_lock_retries_total", outcome=outcome)
+
+
+def status() -> Dict[str, object]:
+    return {
+        "gates": {name: gate.status() for name, gate in gates.items()},
+        "lock_retries": dict(retry_stats),
+    }
+
+
+def _before_request():
+    name = route_class(request.path, request.method)
+    if name is None:
+        return None
+    gate = gates[name]
+    if not gate.acquire():
+        return overloaded_response(gate.retry_after)
+    g.admission_gate = gate
+    return None
+
+
+def _after_request(response):
+    # Место в классе занято, пока не отдано всё тело: выгрузка в потоке (stream_with_context)
+    # генерируется уже после teardown (см. metrics.call_when_sent)
+    gate = g.pop("admission_gate", None)
+    if gate is not None:
+        g.admission_sent = (response, metrics.call_when_sent(response, gate.release))
+    return response
+
+
+def _teardown_request(exc):
+    # Ответ так и не сформировался - место освобождается сразу
+    gate = g.pop("admission_gate", None)
+    if gate is not None:
+        gate.release()
+        return
+    response, release = g.pop("admission_sent", (None, None))
+    if response is not None and response.direct_passthrough:
+        release()
+
+
+def init_app(app, api) -> None:
+    """Подключает контроль допуска и ответ 503 на "database is locked"."""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+
+    @api.errorhandler(OperationalError)
+    def handle_operational_error(error):
+        if is_locked_error(error):
+            return (
+                {"message": "База данных занята, повторите запрос позже"},
+                HTTPStatus.SERVICE_UNAVAILABLE,
+                {"Retry-After": "1"},
+            )
+        print(f"Ошибка базы данных: {error}")
+        return {"message": "Ошибка базы данных"}, HTTPStatus.INTERNAL_SERVER_ERROR
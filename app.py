@@ -1,17 +1,48 @@
 """
 Flask приложение для работы с API "Academy"
-"""
 
-from flask import Flask
-from flask_restx import Api
-from groups_bp import groups_bp
-from students_bp import students_bp
+Приложение собирает фабрика create_app(config):
+
+    from app import create_app
+    app = create_app({"DATABASE": "/srv/academy/academy_orm.db"})
 
-# Создаем экземпляр Flask приложения
-app = Flask(__name__)
+Сам модуль при импорте ничего тяжёлого не делает: Flask, flask_restx, модели и
+Namespaces импортируются внутри фабрики, а база открывается только при её вызове.
+Холодный старт целиком от этого не короче - импорты просто переезжают в create_app().
+Не импортируется вовсе то, что нужно не каждому процессу: сжатие (при COMPRESSION=False),
+архивы (при первом include_archived), cProfile/pstats (при первом съёме cprofile)
+и pyarrow (при первой выгрузке Arrow/Parquet).
+Для старых способов запуска (from app import app, flask --app app run,
+gunicorn app:app) атрибут app создаётся при первом обращении с настройками
+по умолчанию.
+
+Prefork-сервер (gunicorn --preload) может вызвать фабрику в мастер-процессе:
+фабрика закрывает соединение с базой перед возвратом, а после fork воркер
+забывает унаследованное соединение и открывает своё (см. models.py, jobs.py).
+"""
 
-# Конфигурация приложения - выключим ascii режим для поддержки кириллицы
-app.config["JSON_AS_ASCII"] = False
+import os
+from typing import Any, Dict, Optional
+
+# Настройки по умолчанию, create_app(config) перекрывает их
+DEFAULT_CONFIG: Dict[str, Any] = {
+    # Выключим ascii режим для поддержки кириллицы
+    "JSON_AS_ASCII": False,
+    # Файл базы и сколько ждать её блокировку (см. models.configure_db)
+    "DATABASE": os.environ.get("ACADEMY_DB_PATH", "academy_orm.db"),
+    "DATABASE_TIMEOUT": float(os.environ.get("ACADEMY_DB_BUSY_TIMEOUT", 1.0)),
+    # Создать таблицу задач и триггеры расписания/счётчиков при старте
+    "INIT_DATABASE": True,
+    # Построить индекс групп при старте (в мастере prefork-сервера его унаследуют все воркеры).
+    # Если выключено - индекс построится при первом /group/suggest
+    "PRELOAD": True,
+    # Интерактивный Swagger UI на "/" (в продакшене можно выключить, swagger.json останется)
+    "SWAGGER_UI": os.environ.get("ACADEMY_SWAGGER_UI", "1") != "0",
+    # Спецификация, собранная заранее (python openapi.py build), - см. openapi.py
+    "SWAGGER_SPEC_FILE": os.environ.get("ACADEMY_SWAGGER_SPEC_FILE"),
+    # Сжатие ответов gzip/deflate/br/zstd по Accept-Encoding - см. compression.py
+    "COMPRESSION": os.environ.get("ACADEMY_COMPRESSION", "1") != "0",
+}
 
 # Определение авторизации для Swagger UI
 authorizations = {
@@ -22,17 +53,120 @@ authorizations = {
     }
 }
 
-# Создаем экземпляр Flask-RESTX Api
-api = Api(app, version='1.0', title='Academy API',
-          description='API для управления группами и студентами в академии',
-          authorizations=authorizations,
-          security='apikey')
 
-# Регистрация Blueprint'ов как Namespaces в Flask-RESTX
-api.add_namespace(groups_bp)
-api.add_namespace(students_bp)
+def create_app(config: Optional[Dict[str, Any]] = None):
+    """
+    Создаёт и настраивает приложение.
+
+    Args:
+        config: Настройки поверх DEFAULT_CONFIG (ключи Flask и DATABASE, DATABASE_TIMEOUT,
+            INIT_DATABASE, PRELOAD, SWAGGER_UI, SWAGGER_SPEC_FILE, COMPRESSION)
+
+    Returns:
+        Flask: Готовое приложение
+    """
+    from flask import Flask
+    from flask_restx import Api
+
+    # Создаем экземпляр Flask приложения
+    app = Flask(__name__)
+    app.config.update(DEFAULT_CONFIG)
+    app.config.update(config or {})
+
+    # База привязывается к файлу из настроек только сейчас, а не при импорте models
+    from models import configure_db, db
+    configure_db(app.config["DATABASE"], app.config["DATABASE_TIMEOUT"])
+
+    from groups_bp import groups_bp
+    from students_bp import students_bp
+    from jobs_bp import jobs_bp
+    from lessons_bp import lessons_bp
+    from admin_bp import admin_bp
+    from batch_bp import batch_bp
+    from homeworks_bp import homeworks_bp
+    from export_bp import export_bp
+    from jobs import init_jobs
+    from group_index import group_index, init_group_index
+    from statement_cache import statement_cache
+    import profiler
+    import metrics
+    import admission
+    import timetable
+    import counters
+    import openapi
+
+    # Создаем экземпляр Flask-RESTX Api
+    api = Api(app, version='1.0', title='Academy API',
+              description='API для управления группами и студентами в академии',
+              authorizations=authorizations,
+              security='apikey',
+              doc="/" if app.config["SWAGGER_UI"] else False)
+    app.extensions["academy_api"] = api
+
+    # Регистрация Blueprint'ов как Namespaces в Flask-RESTX
+    api.add_namespace(groups_bp)
+    api.add_namespace(students_bp)
+    api.add_namespace(jobs_bp)
+    api.add_namespace(lessons_bp)
+    api.add_namespace(admin_bp)
+    api.add_namespace(batch_bp)
+    api.add_namespace(homeworks_bp)
+    api.add_namespace(export_bp)
+
+    # Сжатие ответов. Раньше остальных after_request - Flask выполняет их в обратном
+    # порядке, и сжиматься должен уже окончательный ответ
+    if app.config["COMPRESSION"]:
+        import compression
+        compression.init_app(app)
+
+    # Профилирование по требованию (включается через /admin/profiler/)
+    profiler.init_app(app)
+
+    # Метрики в формате Prometheus на /metrics
+    metrics.init_app(app, db)
+    metrics.register_cache("statements", lambda: statement_cache.stats)
+    metrics.register_cache("timetable", lambda: timetable.stats)
+
+    # Ограничение одновременных запросов: при перегрузке - 503 с Retry-After
+    admission.init_app(app, api)
+
+    # Готовый swagger.json с ETag и кэшированием вместо генерации на каждый запрос.
+    # После всех Namespaces и обработчиков ошибок - они тоже попадают в спецификацию
+    openapi.init_app(app, api)
+
+    if app.config["INIT_DATABASE"]:
+        # Таблица фоновых задач и очистка задач, оставшихся от упавших процессов
+        init_jobs()
+
+        # Версии недельного расписания и триггеры, которые их обновляют
+        timetable.init_timetable()
+
+        # Счётчики групп и триггеры, которые их поддерживают
+        counters.init_counters()
+
+    if app.config["PRELOAD"]:
+        # Индекс названий групп для /group/suggest
+        init_group_index()
+    else:
+        # Индекс мог остаться от приложения на другой базе в этом же процессе
+        group_index.invalidate()
+
+    # Мастер prefork-сервера не должен держать открытое соединение к моменту fork
+    if not db.is_closed():
+        db.close()
+
+    return app
+
+
+def __getattr__(name: str):
+    # app по умолчанию создаётся при первом обращении: from app import app, gunicorn app:app
+    if name == "app":
+        application = create_app()
+        globals()["app"] = application
+        return application
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # Запуск приложения
 if __name__ == "__main__":
-    app.run(debug=True)
+    create_app().run(debug=True)
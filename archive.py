@@ -0,0 +1,250 @@
+"""
+Модуль archive.py
+
+Архивирование прошедших учебных лет в отдельные файлы SQLite.
+
+Занятия, посещаемость, домашки и сдачи закончившихся групп переносятся из основной
+базы в archive/academy_<год>.db (учебный год - с 1 сентября <год> по 31 августа
+следующего). Группы и студенты остаются в основной базе, поэтому индексы по student_id,
+online_lesson_id и homework_id снова покрывают только текущие данные и помещаются
+в кэш страниц.
+
+Таблицы архива создаются по моделям (models.py), в архив старой версии недостающие
+колонки добавляются. Копирование идёт по именам колонок, а не SELECT *, поэтому
+порядок колонок в архиве и основной базе может различаться.
+
+Перенос идёт пачками по ARCHIVE_BATCH_SIZE занятий: каждая пачка - своя короткая
+транзакция (INSERT OR REPLACE в архив + DELETE из основной базы), между пачками
+пауза, чтобы запросы на запись не ждали блокировку весь перенос. Повторный запуск
+после сбоя продолжает с того же места.
+
+Для чтения архив подключается через ATTACH только на время запроса - в ответах
+с датами занятий: GET /lesson/schedule, /lesson/timetable/<id> и /lesson/<id>/calendar.ics
+с параметром include_archived=1. Выгрузка журнала, отчёты и файлы домашек работают
+только с основной базой: архивируются группы, закончившие учебный год целиком,
+и их журнал и отчёты снимаются до переноса.
+
+    python archive.py list                   # архивные файлы
+    python archive.py run 2023 [--vacuum]    # перенести учебный год 2023/24
+"""
+
+import copy
+import datetime
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple, Type
+
+from peewee import Model, fn
+from models import db, OnlineLessons, StudentsOnlineLessons, Homeworks, HomeworksStudents
+
+ARCHIVE_DIR = os.environ.get("ACADEMY_ARCHIVE_DIR", "archive")
+ARCHIVE_BATCH_SIZE = int(os.environ.get("ACADEMY_ARCHIVE_BATCH_SIZE", 200))
+# Пауза между пачками, секунды
+ARCHIVE_PAUSE = float(os.environ.get("ACADEMY_ARCHIVE_PAUSE", 0.05))
+
+# Архивируемые таблицы в порядке копирования (удаляются в обратном)
+ARCHIVED_MODELS = [OnlineLessons, StudentsOnlineLessons, Homeworks, HomeworksStudents]
+
+_FILE_PATTERN = re.compile(r"^academy_(\d{4})\.db$")
+
+# (модель, год) -> модель в архиве года (см. _archived_model)
+_archived_models: Dict[Tuple[Type[Model], int], Type[Model]] = {}
+
+
+def academic_year(day: datetime.date) -> int:
+    """Учебный год, в который попадает дата (2023 - это 2023/24)."""
+    return day.year if day.month >= 9 else day.year - 1
+
+
+def year_bounds(year: int) -> tuple:
+    return datetime.date(year, 9, 1), datetime.date(year + 1, 8, 31)
+
+
+def archive_path(year: int) -> str:
+    return os.path.join(ARCHIVE_DIR, f"academy_{year}.db")
+
+
+def archive_years() -> List[int]:
+    """Годы, для которых есть архивные файлы."""
+    if not os.path.isdir(ARCHIVE_DIR):
+        return []
+    years = []
+    for name in os.listdir(ARCHIVE_DIR):
+        match = _FILE_PATTERN.match(name)
+        if match:
+            years.append(int(match.group(1)))
+    return sorted(years)
+
+
+def _schema(year: int) -> str:
+    return f"arch_{year}"
+
+
+@contextmanager
+def attached(years: List[int]) -> Iterator[List[int]]:
+    """
+    Подключает архивы годов к соединению текущего потока (ATTACH) и отключает после.
+    Отдаёт список годов, архивы которых существуют. Вне транзакции: ATTACH в ней запрещён.
+    """
+    existing = [year for year in years if os.path.exists(archive_path(year))]
+    done = []
+    try:
+        for year in existing:
+            db.execute_sql(f'ATTACH DATABASE ? AS "{_schema(year)}"', (archive_path(year),))
+            done.append(year)
+        yield existing
+    finally:
+        for year in done:
+            db.execute_sql(f'DETACH DATABASE "{_schema(year)}"')
+
+
+def _archived_model(model: Type[Model], year: int) -> Type[Model]:
+    """Модель в подключённом архиве года: те же поля, индексы и связи, что у model."""
+    key = (model, year)
+    archived = _archived_models.get(key)
+    if archived is None:
+        meta = type("Meta", (), {"table_name": model._meta.table_name, "schema": _schema(year)})
+        # Имя класса - как у модели: от него peewee строит имена индексов, они совпадут с основной базой
+        archived = type(model.__name__, (model,), {"Meta": meta, "__module__": __name__})
+        _archived_models[key] = archived
+    return archived
+
+
+@contextmanager
+def archived_lessons(date_from: datetime.date, date_to: datetime.date) -> Iterator[List[Type[OnlineLessons]]]:
+    """Модели занятий архивов, пересекающихся с периодом (архивы подключены, пока открыт контекст)."""
+    years = range(academic_year(date_from), academic_year(date_to) + 1)
+    with attached(list(years)) as existing:
+        yield [_archived_model(OnlineLessons, year) for year in existing]
+
+
+def _columns(model: Type[Model]) -> List[str]:
+    return [field.column_name for field in model._meta.sorted_fields]
+
+
+def _create_archive_tables(year: int) -> None:
+    """
+    Создаёт таблицы и индексы архива по моделям. Если архив создан старой версией моделей,
+    недостающие колонки добавляются (без NOT NULL: у старых строк архива значений нет).
+    """
+    schema = _schema(year)
+    for model in ARCHIVED_MODELS:
+        archived = _archived_model(model, year)
+        table = model._meta.table_name
+        existing = {row[1] for row in db.execute_sql(f'PRAGMA "{schema}".table_info("{table}")')}
+        if existing:
+            for field in model._meta.sorted_fields:
+                if field.column_name not in existing:
+                    column = copy.copy(field)
+                    column.null = True
+                    ctx = db.get_sql_context()
+                    ctx.sql(column.ddl(ctx))
+                    db.execute_sql(f'ALTER TABLE "{schema}"."{table}" ADD COLUMN {ctx.query()[0]}')
+        db.create_tables([archived], safe=True)
+
+
+def finished_groups(year: int, today: Optional[datetime.date] = None) -> List[int]:
+    """Группы, последнее занятие которых было в учебном году year, если этот год закончился."""
+    start, end = year_bounds(year)
+    if (today or datetime.date.today()) <= end:
+        return []
+
+    last_lesson = fn.MAX(OnlineLessons.lesson_date)
+    query = (
+        OnlineLessons.select(OnlineLessons.group_id)
+        .group_by(OnlineLessons.group_id)
+        .having(last_lesson.between(start, end))
+    )
+    return [group_id for (group_id,) in query.tuples()]
+
+
+def _move_batch(schema: str, lesson_ids: List[int]) -> Dict[str, int]:
+    homeworks = Homeworks._meta.table_name
+    marks = ", ".join("?" * len(lesson_ids))
+    homework_ids = f"SELECT id FROM main.{homeworks} WHERE online_lesson_id IN ({marks})"
+
+    where = {
+        OnlineLessons: f"id IN ({marks})",
+        StudentsOnlineLessons: f"online_lesson_id IN ({marks})",
+        Homeworks: f"online_lesson_id IN ({marks})",
+        HomeworksStudents: f"homework_id IN ({homework_ids})",
+    }
+    moved = {}
+    with db.atomic("IMMEDIATE"):
+        for model, condition in where.items():
+            table = model._meta.table_name
+            # Колонки по именам: порядок колонок в архиве может отличаться от основной базы
+            columns = ", ".join(f'"{column}"' for column in _columns(model))
+            db.execute_sql(
+                f'INSERT OR REPLACE INTO "{schema}".{table} ({columns}) '
+                f"SELECT {columns} FROM main.{table} WHERE {condition}",
+                lesson_ids,
+            )
+        # Удаляем в обратном порядке: сдачи ищутся через ещё не удалённые домашки
+        for model, condition in reversed(list(where.items())):
+            table = model._meta.table_name
+            cursor = db.execute_sql(f"DELETE FROM main.{table} WHERE {condition}", lesson_ids)
+            moved[table] = cursor.rowcount
+    return moved
+
+
+def archive_year(year: int, vacuum: bool = False, today: Optional[datetime.date] = None) -> Dict[str, int]:
+    """
+    Переносит данные закончившихся в учебном году year групп в архив года.
+
+    Args:
+        year: Учебный год (2023 - это 2023/24)
+        vacuum: После переноса сжать основную базу (VACUUM, долгая блокировка)
+
+    Returns:
+        Количество перенесённых строк по таблицам и число групп
+    """
+    groups = finished_groups(year, today)
+    totals = {model._meta.table_name: 0 for model in ARCHIVED_MODELS}
+    totals["groups"] = len(groups)
+    if not groups:
+        return totals
+
+    lesson_ids = [
+        lesson_id
+        for (lesson_id,) in OnlineLessons.select(OnlineLessons.id)
+        .where(OnlineLessons.group_id.in_(groups))
+        .order_by(OnlineLessons.id)
+        .tuples()
+    ]
+
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    schema = _schema(year)
+    db.execute_sql(f'ATTACH DATABASE ? AS "{schema}"', (archive_path(year),))
+    try:
+        _create_archive_tables(year)
+        for start in range(0, len(lesson_ids), ARCHIVE_BATCH_SIZE):
+            moved = _move_batch(schema, lesson_ids[start : start + ARCHIVE_BATCH_SIZE])
+            for table, count in moved.items():
+                totals[table] += count
+            time.sleep(ARCHIVE_PAUSE)
+    finally:
+        db.execute_sql(f'DETACH DATABASE "{schema}"')
+
+    if vacuum:
+        db.execute_sql("VACUUM")
+    return totals
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args[:1] == ["list"]:
+        for year in archive_years():
+            size = os.path.getsize(archive_path(year))
+            print(f"{year}/{year + 1}: {archive_path(year)} ({size // 1024} КБ)")
+    elif args[:1] == ["run"] and len(args) >= 2 and args[1].isdigit() and set(args[2:]) <= {"--vacuum"}:
+        totals = archive_year(int(args[1]), vacuum="--vacuum" in args)
+        print(f"Групп: {totals.pop('groups')}")
+        for table, count in totals.items():
+            print(f"{table}: {count}")
+    else:
+        print("Использование: python archive.py list | python archive.py run <год> [--vacuum]")
+        sys.exit(2)
@@ -0,0 +1,49 @@
+"""
+Модуль auth.py
+
+Простая авторизация по API-ключу из заголовка X-API-KEY (см. authorizations в app.py).
+Пользователи и их роли берутся из api_keys.users.
+"""
+
+from functools import wraps
+from http import HTTPStatus
+from typing import Optional, Dict, Any
+
+from flask import request
+from flask_restx import abort
+from api_keys import users
+
+# Индекс пользователей по ключу, чтобы не перебирать список на каждый запрос
+_users_by_key = {user["api_key"]: user for user in users}
+
+
+def get_current_user() -> Optional[Dict[str, Any]]:
+    """
+    Возвращает пользователя по API-ключу из заголовка X-API-KEY или None.
+    """
+    api_key = request.headers.get("X-API-KEY")
+    if not api_key:
+        return None
+    return _users_by_key.get(api_key)
+
+
+def require_role(*roles: str):
+    """
+    Декоратор для методов Resource: пропускает только пользователей с одной из ролей.
+
+    Без ключа - 401, с ключом, но без нужной роли - 403.
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            user = get_current_user()
+            if user is None:
+                abort(HTTPStatus.UNAUTHORIZED, "Требуется API-ключ")
+            if roles and user["role"] not in roles:
+                abort(HTTPStatus.FORBIDDEN, "Доступ запрещен")
+            return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,212 @@
+"""
+Модуль backup.py
+
+Резервные копии базы без остановки приложения.
+
+Режимы:
+    online   - SQLite online backup API: страницы копируются пачками по `pages` штук,
+               между пачками поток спит `sleep` секунд и отпускает блокировку, поэтому
+               запросы почти не замечают копирования. Если во время копирования базу
+               меняет другое соединение, SQLite начинает копирование заново - под
+               постоянной записью лучше snapshot.
+    snapshot - VACUUM INTO: копия на один момент времени из одной читающей транзакции
+               (заодно сжатая). В режиме WAL писатели при этом не ждут; в режиме
+               rollback journal коммиты ждут конца снимка - это видно в journal_mode отчёта.
+
+После копирования файл проверяется PRAGMA integrity_check и только потом получает
+итоговое имя (до этого пишется в <имя>.part).
+
+Запуск: задачей из POST /admin/backup (прогресс - в /jobs/<id>) или из командной строки:
+
+    python backup.py online [путь] [--pages 256] [--sleep 0.01]
+    python backup.py snapshot [путь]
+"""
+
+import argparse
+import datetime
+import os
+import sqlite3
+import time
+from typing import Any, Callable, Dict, Optional
+
+from models import db
+from jobs import job_type, write_result
+
+MODES = ("online", "snapshot")
+BACKUP_DIR = os.environ.get("ACADEMY_BACKUP_DIR", "backups")
+DEFAULT_PAGES = 256
+DEFAULT_SLEEP = 0.01
+
+# (скопировано страниц, всего страниц) -> None; исключение прерывает копирование
+ProgressCallback = Callable[[int, int], None]
+
+
+class BackupError(Exception):
+    """Копия не создана или не прошла проверку целостности."""
+
+
+def default_path(mode: str) -> str:
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    return os.path.join(BACKUP_DIR, f"academy_{stamp}_{mode}.db")
+
+
+def _source() -> sqlite3.Connection:
+    # Отдельное соединение: копирование не занимает соединение потока приложения
+    return sqlite3.connect(db.database, timeout=db.connect_params.get("timeout", 5.0))
+
+
+def _copy_online(dest: str, pages: int, sleep: float, progress: Optional[ProgressCallback]) -> int:
+    source = _source()
+    target = sqlite3.connect(dest)
+    total_pages = 0
+
+    def on_step(status: int, remaining: int, total: int) -> None:
+        nonlocal total_pages
+        total_pages = total
+        if progress is not None:
+            progress(total - remaining, total)
+        # sleep у Connection.backup срабатывает только при занятой базе - паузу между шагами делаем сами.
+        # Между шагами SQLite не держит блокировку источника
+        if remaining and sleep:
+            time.sleep(sleep)
+
+    try:
+        source.backup(target, pages=pages, progress=on_step)
+    finally:
+        target.close()
+        source.close()
+    return total_pages
+
+
+def _copy_snapshot(dest: str) -> int:
+    source = _source()
+    try:
+        source.execute("VACUUM INTO ?", (dest,))
+    finally:
+        source.close()
+    target = sqlite3.connect(dest)
+    try:
+        return target.execute("PRAGMA page_count").fetchone()[0]
+    finally:
+        target.close()
+
+
+def verify(path: str) -> None:
+    """
+    Проверяет файл базы PRAGMA integrity_check.
+
+    Raises:
+        BackupError: Если проверка нашла ошибки
+    """
+    connection = sqlite3.connect(path)
+    try:
+        problems = [row[0] for row in connection.execute("PRAGMA integrity_check")]
+    finally:
+        connection.close()
+    if problems != ["ok"]:
+        raise BackupError(f"Копия {path} не прошла проверку: {'; '.join(problems[:10])}")
+
+
+def create_backup(
+    mode: str = "online",
+    dest: Optional[str] = None,
+    pages: int = DEFAULT_PAGES,
+    sleep: float = DEFAULT_SLEEP,
+    progress: Optional[ProgressCallback] = None,
+) -> Dict[str, Any]:
+    """
+    Создаёт и проверяет резервную копию базы.
+
+    Args:
+        mode: online или snapshot
+        dest: Путь к файлу копии (по умолчанию - в BACKUP_DIR с отметкой времени)
+        pages: Сколько страниц копировать за шаг (online)
+        sleep: Пауза между шагами в секундах (online)
+        progress: Вызывается после каждого шага (online)
+
+    Returns:
+        Отчёт: путь, размер, страницы, время копирования и проверки, скорость
+
+    Raises:
+        ValueError: Неизвестный режим или неверные pages/sleep
+        BackupError: Копия не прошла проверку целостности
+    """
+    if mode not in MODES:
+        raise ValueError(f"Режим должен быть одним из: {', '.join(MODES)}")
+    if pages < 1 or sleep < 0:
+        raise ValueError("pages должен быть положительным, sleep - неотрицательным")
+
+    dest = dest or default_path(mode)
+    os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+    partial = f"{dest}.part"
+    if os.path.exists(partial):
+        os.remove(partial)
+
+    started = time.monotonic()
+    try:
+        if mode == "online":
+            page_count = _copy_online(partial, pages, sleep, progress)
+        else:
+            page_count = _copy_snapshot(partial)
+        copy_seconds = time.monotonic() - started
+        verify(partial)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    verify_seconds = time.monotonic() - started - copy_seconds
+    os.replace(partial, dest)
+
+    size = os.path.getsize(dest)
+    journal_mode = db.execute_sql("PRAGMA journal_mode").fetchone()[0]
+    return {
+        "mode": mode,
+        "path": dest,
+        "journal_mode": journal_mode,
+        "pages": page_count,
+        "bytes": size,
+        "copy_seconds": round(copy_seconds, 3),
+        "verify_seconds": round(verify_seconds, 3),
+        "mb_per_second": round(size / 1024 / 1024 / copy_seconds, 2) if copy_seconds else None,
+        "integrity_check": "ok",
+    }
+
+
+@job_type("backup", max_seconds=6 * 3600, max_parallel=1)
+def backup_job(ctx, params: Dict[str, Any]) -> str:
+    """
+    Фоновая задача резервного копирования.
+
+    params: mode, pages, sleep_ms (опционально)
+    """
+    mode = params.get("mode", "online")
+    pages = int(params.get("pages") or DEFAULT_PAGES)
+    sleep = float(params.get("sleep_ms", DEFAULT_SLEEP * 1000)) / 1000
+
+    def on_progress(done_pages: int, total_pages: int) -> None:
+        # Отмена и лимит времени проверяются между шагами копирования
+        ctx.check()
+        if ctx.total_units != total_pages:
+            ctx.set_total(total_pages)
+        ctx.advance(done_pages - ctx.done_units)
+
+    report = create_backup(mode, pages=pages, sleep=sleep, progress=on_progress)
+    ctx.total_units = ctx.done_units = report["pages"]
+    return write_result(ctx.job_id, report)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Резервная копия базы академии")
+    parser.add_argument("mode", choices=MODES)
+    parser.add_argument("dest", nargs="?", help="Путь к файлу копии")
+    parser.add_argument("--pages", type=int, default=DEFAULT_PAGES, help="Страниц за шаг (online)")
+    parser.add_argument("--sleep", type=float, default=DEFAULT_SLEEP, help="Пауза между шагами, с (online)")
+    args = parser.parse_args()
+
+    def print_progress(done_pages: int, total_pages: int) -> None:
+        print(f"\r{done_pages}/{total_pages} страниц", end="", flush=True)
+
+    report = create_backup(args.mode, args.dest, args.pages, args.sleep, print_progress)
+    print()
+    for key, value in report.items():
+        print(f"{key}: {value}")
@@ -0,0 +1,190 @@
+"""
+Модуль batch.py
+
+Выполнение набора операций из utils.py одной транзакцией (POST /batch/).
+
+Операция - словарь {"op": "create_group", "ref": "g1", "args": {...}}. В аргументах
+можно ссылаться на результаты предыдущих операций того же пакета: строка "$g1" - это
+id объекта, созданного операцией с ref "g1", "$g1.group_name" - его поле. Ссылки
+подставляются на любой глубине - в списках и вложенных словарях аргументов.
+
+Режимы:
+    atomic   - всё или ничего: первая ошибка откатывает весь пакет, а успешные до неё
+               операции возвращаются со статусом rolled_back и без результата;
+    continue - каждая операция в своей точке сохранения (SAVEPOINT), ошибочные
+               откатываются поодиночке, остальные фиксируются одним COMMIT.
+"""
+
+from typing import Any, Dict, List
+
+from peewee import DoesNotExist, IntegrityError, Model
+from models import db
+from admission import retry_on_locked
+from group_index import group_index
+import utils
+
+MODES = ("atomic", "continue")
+MAX_OPERATIONS = 500
+
+STUDENT_FIELDS = ("first_name", "last_name", "middle_name", "group_id", "notes")
+
+
+class BatchError(Exception):
+    """Ошибка в описании операции (неизвестная операция, битая ссылка, нет аргумента)."""
+
+
+def _student_fields(args: Dict[str, Any]) -> Dict[str, Any]:
+    unknown = set(args) - set(STUDENT_FIELDS) - {"student_id"}
+    if unknown:
+        raise BatchError(f"Неизвестные поля студента: {', '.join(sorted(unknown))}")
+    return {field: args[field] for field in STUDENT_FIELDS if field in args}
+
+
+# op -> (функция, обязательные аргументы, тип результата для сериализации)
+OPERATIONS: Dict[str, Dict[str, Any]] = {
+    "create_group": {
+        "call": lambda a: utils.create_group(a["group_name"]),
+        "required": ("group_name",),
+        "kind": "group",
+    },
+    "update_group": {
+        "call": lambda a: utils.update_group_id(a["group_id"], a["group_name"]),
+        "required": ("group_id", "group_name"),
+        "kind": "group",
+    },
+    "delete_group": {
+        "call": lambda a: utils.delete_group_id(a["group_id"]),
+        "required": ("group_id",),
+        "kind": None,
+    },
+    "create_student": {
+        "call": lambda a: utils.create_student(**_student_fields(a)),
+        "required": ("first_name", "last_name", "group_id"),
+        "kind": "student",
+    },
+    "update_student": {
+        "call": lambda a: utils.update_student_by_id(a["student_id"], **_student_fields(a)),
+        "required": ("student_id",),
+        "kind": "student",
+    },
+    "delete_student": {
+        "call": lambda a: utils.delete_student_by_id(a["student_id"]),
+        "required": ("student_id",),
+        "kind": None,
+    },
+}
+
+
+def _resolve(value: Any, refs: Dict[str, Any]) -> Any:
+    if isinstance(value, list):
+        return [_resolve(item, refs) for item in value]
+    if isinstance(value, dict):
+        return {key: _resolve(item, refs) for key, item in value.items()}
+    if not (isinstance(value, str) and value.startswith("$")):
+        return value
+
+    ref, _, field = value[1:].partition(".")
+    if ref not in refs:
+        raise BatchError(f"Ссылка {value} указывает на неизвестную или неуспешную операцию")
+    resolved = getattr(refs[ref], field or "id", None)
+    # Внешний ключ peewee отдаёт объектом - в аргументы нужен его id
+    if isinstance(resolved, Model):
+        resolved = resolved.id
+    return resolved
+
+
+def validate(operations: List[Dict[str, Any]]) -> None:
+    """
+    Проверяет описание пакета до начала транзакции.
+
+    Raises:
+        BatchError: Если пакет пустой, слишком большой или в нём неизвестные операции
+    """
+    if not operations:
+        raise BatchError("Пакет операций пуст")
+    if len(operations) > MAX_OPERATIONS:
+        raise BatchError(f"Не больше {MAX_OPERATIONS} операций в пакете")
+
+    seen_refs = set()
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict) or operation.get("op") not in OPERATIONS:
+            raise BatchError(f"Операция {index}: неизвестная операция {operation.get('op') if isinstance(operation, dict) else operation!r}")
+        ref = operation.get("ref")
+        if ref is not None:
+            if ref in seen_refs:
+                raise BatchError(f"Операция {index}: ref {ref} уже используется")
+            seen_refs.add(ref)
+
+
+def _run_one(operation: Dict[str, Any], refs: Dict[str, Any]) -> Any:
+    spec = OPERATIONS[operation["op"]]
+    args = {name: _resolve(value, refs) for name, value in (operation.get("args") or {}).items()}
+    missing = [name for name in spec["required"] if args.get(name) in (None, "")]
+    if missing:
+        raise BatchError(f"Не хватает аргументов: {', '.join(missing)}")
+    return spec["call"](args)
+
+
+def _error_text(error: Exception) -> str:
+    if isinstance(error, DoesNotExist):
+        return "Объект не найден"
+    if isinstance(error, IntegrityError):
+        return f"Нарушение ограничений БД: {error}"
+    return str(error)
+
+
+@retry_on_locked
+def execute_batch(operations: List[Dict[str, Any]], mode: str = "atomic") -> Dict[str, Any]:
+    """
+    Выполняет пакет операций в одной транзакции.
+
+    Returns:
+        {"committed": bool, "results": [{"index", "op", "ref", "status", "kind", "result", "error"}]}
+        В режиме atomic при ошибке committed=False, а операции до ошибки получают
+        status="rolled_back" без result: их изменения откатаны вместе с пакетом.
+    """
+    validate(operations)
+    results: List[Dict[str, Any]] = []
+    refs: Dict[str, Any] = {}
+
+    class _Rollback(Exception):
+        pass
+
+    try:
+        # IMMEDIATE - сразу берём блокировку записи, чтобы не упереться в неё посреди пакета
+        with db.atomic("IMMEDIATE"):
+            for index, operation in enumerate(operations):
+                entry = {
+                    "index": index,
+                    "op": operation["op"],
+                    "ref": operation.get("ref"),
+                    "kind": OPERATIONS[operation["op"]]["kind"],
+                }
+                try:
+                    if mode == "continue":
+                        with db.atomic():
+                            result = _run_one(operation, refs)
+                    else:
+                        result = _run_one(operation, refs)
+                except (BatchError, DoesNotExist, IntegrityError) as e:
+                    entry.update(status="error", error=_error_text(e))
+                    results.append(entry)
+                    if mode == "atomic":
+                        raise _Rollback()
+                    continue
+
+                entry.update(status="ok", result=result if entry["kind"] else None)
+                results.append(entry)
+                if operation.get("ref") is not None and entry["kind"]:
+                    refs[operation["ref"]] = result
+    except _Rollback:
+        for entry in results:
+            if entry["status"] == "ok":
+                # id и поля из result после отката ничему в базе не соответствуют
+                entry.update(status="rolled_back", result=None)
+        return {"committed": False, "results": results}
+
+    # Группы менялись внутри транзакции - индекс подсказок пересоберётся уже по закоммиченным данным
+    if any(entry["kind"] == "group" or entry["op"] == "delete_group" for entry in results):
+        group_index.invalidate()
+    return {"committed": True, "results": results}
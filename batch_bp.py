@@ -0,0 +1,82 @@
+from flask_restx import Namespace, Resource, fields, marshal
+from http import HTTPStatus
+from batch import execute_batch, BatchError, MODES, OPERATIONS, MAX_OPERATIONS
+from groups_bp import group_model
+from students_bp import student_model
+
+# Создаем экземпляр Namespace для пакетных операций
+batch_bp = Namespace("batch", description="Пакетное выполнение операций в одной транзакции")
+
+# Модель одной операции пакета
+operation_model = batch_bp.model(
+    "BatchOperation",
+    {
+        "op": fields.String(required=True, enum=list(OPERATIONS), description="Операция"),
+        "ref": fields.String(description="Имя результата для ссылок из следующих операций ($ref, $ref.поле)"),
+        "args": fields.Raw(description="Аргументы операции, например {\"group_name\": \"python414\"}"),
+    },
+)
+
+# Модель для входных данных пакета
+batch_input_model = batch_bp.model(
+    "BatchInput",
+    {
+        "mode": fields.String(
+            default="atomic", enum=list(MODES), description="atomic - всё или ничего, continue - пропускать ошибки"
+        ),
+        "operations": fields.List(
+            fields.Nested(operation_model), required=True, description=f"Операции по порядку (не больше {MAX_OPERATIONS})"
+        ),
+    },
+)
+
+# Модель результата одной операции
+operation_result_model = batch_bp.model(
+    "BatchOperationResult",
+    {
+        "index": fields.Integer(description="Номер операции в пакете"),
+        "op": fields.String(description="Операция"),
+        "ref": fields.String(description="Имя результата"),
+        "status": fields.String(description="ok, error или rolled_back (успешная операция откатанного пакета)"),
+        "result": fields.Raw(description="Созданный или изменённый объект"),
+        "error": fields.String(description="Текст ошибки"),
+    },
+)
+
+# Модель ответа пакета
+batch_result_model = batch_bp.model(
+    "BatchResult",
+    {
+        "mode": fields.String(description="Режим выполнения"),
+        "committed": fields.Boolean(description="Зафиксирована ли транзакция"),
+        "results": fields.List(fields.Nested(operation_result_model)),
+    },
+)
+
+RESULT_MODELS = {"group": group_model, "student": student_model}
+
+
+@batch_bp.route("/")
+@batch_bp.response(HTTPStatus.BAD_REQUEST, "Неверный пакет или (в режиме atomic) ошибка в одной из операций")
+class BatchResource(Resource):
+    @batch_bp.doc("execute_batch")
+    @batch_bp.expect(batch_input_model)
+    @batch_bp.marshal_with(batch_result_model)
+    def post(self):
+        """Выполнить набор операций одной транзакцией"""
+        data = batch_bp.payload or {}
+        mode = data.get("mode") or "atomic"
+        if mode not in MODES:
+            batch_bp.abort(HTTPStatus.BAD_REQUEST, f"Режим должен быть одним из: {', '.join(MODES)}")
+
+        try:
+            outcome = execute_batch(data.get("operations") or [], mode)
+        except BatchError as e:
+            batch_bp.abort(HTTPStatus.BAD_REQUEST, str(e))
+
+        for entry in outcome["results"]:
+            if entry.get("result") is not None:
+                entry["result"] = marshal(entry["result"], RESULT_MODELS[entry["kind"]])
+
+        status = HTTPStatus.OK if outcome["committed"] else HTTPStatus.BAD_REQUEST
+        return {"mode": mode, **outcome}, status
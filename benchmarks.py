@@ -0,0 +1,340 @@
+"""
+Модуль benchmarks.py
+
+Бенчмарки производительности. Запуск:
+
+    python benchmarks.py                 - все бенчмарки
+    python benchmarks.py statement_cache - только выбранный
+
+Бенчмарки работают на временных базах (в памяти или во временном каталоге),
+наполненных seed.py, рабочую базу academy_orm.db они не трогают.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict
+
+from peewee import SqliteDatabase
+from models import MODELS, Groups, Students
+from seed import seed_database
+
+
+def _per_call_us(func: Callable[[], object], repeat: int) -> float:
+    """Среднее время одного вызова в микросекундах (лучший из трёх прогонов)."""
+    best = float("inf")
+    for _ in range(3):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        best = min(best, time.perf_counter() - started)
+    return best / repeat * 1_000_000
+
+
+def bench_statement_cache(repeat: int = 5000) -> None:
+    """Накладные расходы на поиск группы/студента и список групп: peewee vs statement_cache."""
+    import utils
+
+    test_db = SqliteDatabase(":memory:")
+    with test_db.bind_ctx(MODELS):
+        test_db.create_tables(MODELS)
+        seed_database(groups=20, students_per_group=25)
+
+        # Старые версии функций из utils.py - запрос строится заново на каждый вызов
+        before: Dict[str, Callable[[], object]] = {
+            "get_group_by_id": lambda: Groups.get(Groups.id == 7),
+            "get_student_by_id": lambda: Students.select(Students, Groups)
+            .join(Groups)
+            .where(Students.id == 42)
+            .get(),
+            "get_groups_list": lambda: list(
+                Groups.select()
+                .where(Groups.group_name.contains("41"))
+                .order_by(Groups.group_name.asc())
+            ),
+        }
+        after: Dict[str, Callable[[], object]] = {
+            "get_group_by_id": lambda: utils.get_group_by_id(7),
+            "get_student_by_id": lambda: utils.get_student_by_id(42, expand_fields=["group"]),
+            "get_groups_list": lambda: utils.get_groups_list("asc", "41"),
+        }
+        # Только построение SQL, без выполнения - та часть, которую убирает кэш
+        compile_only: Dict[str, Callable[[], object]] = {
+            "get_group_by_id": lambda: Groups.select().where(Groups.id == 7).limit(1).sql(),
+            "get_student_by_id": lambda: Students.select(Students, Groups)
+            .join(Groups)
+            .where(Students.id == 42)
+            .limit(1)
+            .sql(),
+            "get_groups_list": lambda: Groups.select()
+            .where(Groups.group_name.contains("41"))
+            .order_by(Groups.group_name.asc())
+            .sql(),
+        }
+
+        for name in before:
+            expected, actual = before[name](), after[name]()
+            if isinstance(expected, list):
+                expected, actual = [row.id for row in expected], [row.id for row in actual]
+            else:
+                expected, actual = expected.id, actual.id
+            assert expected == actual, f"{name}: результаты с кэшем и без отличаются"
+
+        print("statement_cache: микросекунды на вызов (меньше - лучше)")
+        print(f"{'функция':<20}{'peewee':>10}{'кэш':>10}{'ускорение':>12}{'сборка SQL':>12}")
+        for name in before:
+            before_us = _per_call_us(before[name], repeat)
+            after_us = _per_call_us(after[name], repeat)
+            compile_us = _per_call_us(compile_only[name], repeat)
+            print(
+                f"{name:<20}{before_us:>10.1f}{after_us:>10.1f}"
+                f"{before_us / after_us:>11.2f}x{compile_us:>12.1f}"
+            )
+
+
+def _storage_probe(path: str, repeat: int) -> None:
+    """
+    Дочерний процесс bench_storage: режим хранения выбирается переменной окружения
+    при импорте models.py, поэтому каждый режим меряется в своём процессе.
+    """
+    import datetime
+    from models import HomeworksStudents as hs
+
+    test_db = SqliteDatabase(path)
+    with test_db.bind_ctx(MODELS):
+        test_db.create_tables(MODELS)
+        seed_database(groups=40, students_per_group=25, lessons_per_group=16)
+        test_db.execute_sql("VACUUM")
+
+        now = datetime.datetime.now()
+        queries: Dict[str, Callable[[], object]] = {
+            "submission_date between": lambda: hs.select(hs.id)
+            .where(hs.submission_date.between(now - datetime.timedelta(days=1), now))
+            .count(),
+            "status = принято": lambda: hs.select(hs.id).where(hs.status == "принято").count(),
+            "status in (...)": lambda: hs.select(hs.id)
+            .where(hs.status.in_(["принято", "проверено"]))
+            .count(),
+        }
+        result = {
+            "bytes": os.path.getsize(path),
+            "rows": hs.select().count(),
+            "counts": {name: query() for name, query in queries.items()},
+            "us": {name: _per_call_us(query, repeat) for name, query in queries.items()},
+        }
+    print(json.dumps(result))
+
+
+def bench_storage(repeat: int = 20) -> None:
+    """Размер файла базы и скорость выборок по диапазону: текстовое хранение vs компактное."""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for compact in ("0", "1"):
+            path = os.path.join(tmp, f"storage_{compact}.db")
+            output = subprocess.run(
+                [sys.executable, "-c", f"import benchmarks; benchmarks._storage_probe({path!r}, {repeat})"],
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                env={**os.environ, "ACADEMY_COMPACT_STORAGE": compact},
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout
+            results[compact] = json.loads(output.strip().splitlines()[-1])
+
+    text, compact = results["0"], results["1"]
+    assert text["counts"] == compact["counts"], "storage: результаты выборок в режимах отличаются"
+
+    print(f"storage: {text['rows']} сдач домашек, файл после VACUUM")
+    print(f"{'':<26}{'текст':>12}{'компактно':>12}{'выигрыш':>10}")
+    print(
+        f"{'размер, КБ':<26}{text['bytes'] / 1024:>12.0f}{compact['bytes'] / 1024:>12.0f}"
+        f"{text['bytes'] / compact['bytes']:>9.2f}x"
+    )
+    print("микросекунды на запрос (меньше - лучше)")
+    for name in text["us"]:
+        print(
+            f"{name:<26}{text['us'][name]:>12.1f}{compact['us'][name]:>12.1f}"
+            f"{text['us'][name] / compact['us'][name]:>9.2f}x"
+        )
+
+
+def _startup_probe(path: str) -> None:
+    """
+    Дочерний процесс bench_startup: импорт app, create_app(), первый и повторный запрос,
+    затем первый запрос в воркере, полученном через fork от уже собранного приложения.
+    """
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+    import app as app_module
+
+    timings["import app"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    application = app_module.create_app({"DATABASE": path})
+    timings["create_app()"] = time.perf_counter() - started
+
+    client = application.test_client()
+    for name in ("первый запрос", "повторный запрос"):
+        started = time.perf_counter()
+        client.get("/group/list/?with_counters=1")
+        timings[name] = time.perf_counter() - started
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        started = time.perf_counter()
+        client.get("/group/list/?with_counters=1")
+        os.write(write_fd, repr(time.perf_counter() - started).encode())
+        os._exit(0)
+    os.close(write_fd)
+    os.waitpid(pid, 0)
+    timings["первый запрос после fork"] = float(os.read(read_fd, 64))
+    print(json.dumps(timings))
+
+
+# Запуск "как в продакшене" от старта интерпретатора до ответа на первый запрос.
+# Только from app import app - так запускаются и старые версии без create_app()
+_COLD_START_PROBE = """
+from app import app
+response = app.test_client().get("/group/list/", headers={"X-API-KEY": "admin_api_key"})
+assert response.status_code == 200, response.status_code
+"""
+
+
+def _cold_start(source: str, seeded_db: str, runs: int) -> float:
+    """Медиана времени процесса целиком (с), база - свежая копия seeded_db в каждом запуске."""
+    durations = []
+    env = {**os.environ, "PYTHONPATH": source}
+    env.pop("ACADEMY_DB_PATH", None)
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as workdir:
+            shutil.copy(seeded_db, os.path.join(workdir, "academy_orm.db"))
+            started = time.perf_counter()
+            subprocess.run(
+                [sys.executable, "-c", _COLD_START_PROBE], cwd=workdir, env=env, capture_output=True, check=True
+            )
+            durations.append(time.perf_counter() - started)
+    return sorted(durations)[len(durations) // 2]
+
+
+def bench_startup(runs: int = 5) -> None:
+    """
+    Холодный старт: импорт app, сборка приложения фабрикой и задержка первого запроса.
+
+    Если задан ACADEMY_BENCH_BASELINE (ревизия git), тот же холодный старт от запуска
+    процесса до первого ответа измеряется и на этой ревизии - для сравнения "до/после".
+    """
+    runs_timings = []
+    source = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "startup.db")
+        test_db = SqliteDatabase(path)
+        with test_db.bind_ctx(MODELS):
+            test_db.create_tables(MODELS)
+            seed_database(groups=20, students_per_group=25)
+        test_db.close()
+
+        for _ in range(runs):
+            started = time.perf_counter()
+            output = subprocess.run(
+                [sys.executable, "-c", f"import benchmarks; benchmarks._startup_probe({path!r})"],
+                cwd=source,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout
+            timings = json.loads(output.strip().splitlines()[-1])
+            timings["процесс целиком"] = time.perf_counter() - started
+            runs_timings.append(timings)
+
+        cold = {"текущая версия": _cold_start(source, path, runs)}
+        baseline = os.environ.get("ACADEMY_BENCH_BASELINE")
+        if baseline:
+            worktree = os.path.join(tmp, "baseline")
+            subprocess.run(
+                ["git", "worktree", "add", "--detach", worktree, baseline],
+                cwd=source, capture_output=True, check=True,
+            )
+            try:
+                cold[baseline] = _cold_start(worktree, path, runs)
+            finally:
+                subprocess.run(["git", "worktree", "remove", "--force", worktree], cwd=source, capture_output=True)
+
+    print(f"startup: миллисекунды, медиана из {runs} запусков (меньше - лучше)")
+    for name in runs_timings[0]:
+        values = sorted(timings[name] for timings in runs_timings)
+        print(f"{name:<28}{values[len(values) // 2] * 1000:>10.1f}")
+    print("холодный старт до первого ответа (from app import app, процесс целиком):")
+    for name, seconds in cold.items():
+        print(f"    {name:<24}{seconds * 1000:>10.1f}")
+
+
+def bench_compression(repeat: int = 20) -> None:
+    """Сжатие ответов по эндпоинтам: сколько байтов экономит каждая кодировка и сколько это стоит CPU."""
+    import compression
+    from app import create_app
+
+    headers = {"X-API-KEY": "admin_api_key", "Accept-Encoding": "identity"}
+    endpoints = (
+        "/group/list/",
+        "/group/list/?with_counters=1",
+        "/lesson/schedule?from=2024-09-01&to=2024-11-30",
+        "/lesson/timetable/1?week=2024-09-02",
+        "/lesson/1/calendar.ics",
+        "/export/gradebook?format=csv",
+        "/swagger.json",
+        "/swaggerui/swagger-ui-bundle.js",
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "compression.db")
+        test_db = SqliteDatabase(path)
+        with test_db.bind_ctx(MODELS):
+            test_db.create_tables(MODELS)
+            seed_database(groups=40, students_per_group=25, lessons_per_group=16)
+        test_db.close()
+
+        # Несжатые тела: сжатие приложения выключено, swagger.json без gzip
+        client = create_app({"DATABASE": path, "COMPRESSION": False}).test_client()
+        bodies = {}
+        for endpoint in endpoints:
+            response = client.get(endpoint, headers=headers)
+            bodies[endpoint] = response.get_data()
+            response.close()
+
+    print(f"compression: порог {compression.MIN_SIZE} байт, кодировки: {', '.join(compression.ENCODINGS)}")
+    print(f"{'':<50}{'байт':>10}{'сжато':>9}{'мкс':>10}{'МБ/с':>8}{'КБ на мс CPU':>14}")
+    for endpoint, body in bodies.items():
+        print(f"{endpoint:<50}{len(body):>10}")
+        if len(body) < compression.MIN_SIZE:
+            print(f"{'':<4}меньше порога - отдаётся без сжатия")
+            continue
+        for encoding in compression.ENCODINGS:
+            size = len(compression.compress(body, encoding))
+            us = _per_call_us(lambda: compression.compress(body, encoding), repeat)
+            saved_kb_per_ms = (len(body) - size) / 1024 / (us / 1000)
+            print(
+                f"{'':<4}{encoding:<46}{size:>10}{size / len(body):>8.0%}{us:>10.0f}"
+                f"{len(body) / us:>8.0f}{saved_kb_per_ms:>14.0f}"
+            )
+
+
+BENCHMARKS: Dict[str, Callable[[], None]] = {
+    "statement_cache": bench_statement_cache,
+    "storage": bench_storage,
+    "startup": bench_startup,
+    "compression": bench_compression,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Неизвестный бенчмарк: {name}. Доступны: {', '.join(BENCHMARKS)}")
+            sys.exit(1)
+        BENCHMARKS[name]()
+        print()
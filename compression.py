@@ -0,0 +1,326 @@
+"""
+Модуль compression.py
+
+Сжатие ответов по Accept-Encoding: gzip и deflate всегда, br и zstd - если установлены
+необязательные пакеты brotli и zstandard. Из принимаемых клиентом кодировок выбирается
+та, у которой выше q, при равных q - в порядке PREFERENCE.
+
+Что сжимается:
+    - только текстовые типы (COMPRESSIBLE_TYPES: JSON, text/*, JavaScript, SVG ...);
+    - обычные ответы - если тело не меньше MIN_SIZE байт (ACADEMY_COMPRESS_MIN_SIZE),
+      мелкие ответы сжатие только удлиняет;
+    - потоковые ответы (генераторы) - на лету, с досылкой сжатого после каждого куска,
+      поэтому клиент получает данные по мере их готовности, а не в конце;
+    - файлы (send_file) - только небольшие, не больше MAX_FILE_SIZE байт
+      (ACADEMY_COMPRESS_MAX_FILE_SIZE, по умолчанию 2 МиБ - статика Swagger UI): сжатие
+      файла требует прочитать его в память целиком. Файлы больше порога или без
+      известной длины, а также запросы диапазона (Range относится к несжатым байтам)
+      отдаются как есть через file_wrapper/sendfile.
+
+Что не трогается: ответы, у которых уже есть Content-Encoding (swagger.json, выгрузка
+журнала в gzip), частичные (206), без тела (204, 304), с Cache-Control: no-transform.
+
+У ответа с ETag сжатые байты кэшируются (CACHE_MAX_BYTES, ACADEMY_COMPRESS_CACHE_BYTES):
+повторная отдача того же представления (расписание, статика Swagger UI) не сжимает его
+заново. ETag сжатого ответа получает суффикс кодировки ("<etag>-gzip") - байты другие.
+Клиент присылает в If-None-Match уже этот ETag, поэтому до обработчика к заголовку
+добавляется ETag без суффикса: обработчик сам отвечает 304 и не собирает ответ, а 304
+получает обратно ETag с суффиксом. Ко всем сжимаемым ответам добавляется
+Vary: Accept-Encoding.
+"""
+
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from flask import Response, g, request
+from werkzeug.http import parse_etags, quote_etag
+
+import metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MIN_SIZE = int(os.environ.get("ACADEMY_COMPRESS_MIN_SIZE", 1024))
+MAX_FILE_SIZE = int(os.environ.get("ACADEMY_COMPRESS_MAX_FILE_SIZE", 2 * 1024 * 1024))
+CACHE_MAX_BYTES = int(os.environ.get("ACADEMY_COMPRESS_CACHE_BYTES", 16 * 1024 * 1024))
+
+# Уровни подобраны под сжатие на каждый запрос: почти весь выигрыш в байтах при малой цене CPU
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+ZSTD_LEVEL = 3
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "text/",
+)
+# При равных q у кодировок в Accept-Encoding
+PREFERENCE = ("zstd", "br", "gzip", "deflate")
+
+
+class _ZlibCompressor:
+    def __init__(self, wbits: int):
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, wbits)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliCompressor:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _ZstdCompressor:
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+# Кодировка -> фабрика компрессора (gzip - zlib с заголовком gzip, deflate - поток zlib по RFC 9110)
+COMPRESSORS: Dict[str, Callable[[], object]] = {
+    "gzip": lambda: _ZlibCompressor(16 + zlib.MAX_WBITS),
+    "deflate": lambda: _ZlibCompressor(zlib.MAX_WBITS),
+}
+if brotli is not None:
+    COMPRESSORS["br"] = _BrotliCompressor
+if zstandard is not None:
+    COMPRESSORS["zstd"] = _ZstdCompressor
+
+ENCODINGS = tuple(encoding for encoding in PREFERENCE if encoding in COMPRESSORS)
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """Сжимает байты целиком в кодировке encoding (одной из ENCODINGS)."""
+    compressor = COMPRESSORS[encoding]()
+    return compressor.compress(data) + compressor.finish()
+
+
+def choose_encoding(accept_encodings) -> Optional[str]:
+    """Лучшая из ENCODINGS для Accept-Encoding клиента или None, если сжимать нельзя."""
+    best, best_quality = None, 0.0
+    for encoding in ENCODINGS:
+        # Порядок ENCODINGS - предпочтение сервера, поэтому при равных q остаётся первая
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class CompressedCache:
+    """LRU сжатых тел ответов с ETag, ограниченный суммарным размером в байтах."""
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.stats = {"hits": 0, "misses": 0}
+        self._items: "OrderedDict[Tuple[str, ...], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, ...]) -> Optional[bytes]:
+        with self._lock:
+            data = self._items.get(key)
+            if data is None:
+                self.stats["misses"] += 1
+                return None
+            self._items.move_to_end(key)
+            self.stats["hits"] += 1
+            return data
+
+    def put(self, key: Tuple[str, ...], data: bytes) -> None:
+        if len(data) > self.max_bytes // 4:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._items[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.size = 0
+
+
+compressed_cache = CompressedCache()
+
+
+def _count(encoding: str, raw: int, sent: int) -> None:
+    metrics.inc("academy_http_compression_bytes_total", raw, encoding=encoding, stage="raw")
+    metrics.inc("academy_http_compression_bytes_total", sent, encoding=encoding, stage="sent")
+
+
+def _compressible(response: Response) -> bool:
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return False
+    if "Content-Encoding" in response.headers or "Content-Range" in response.headers:
+        return False
+    if response.cache_control.no_transform:
+        return False
+    mimetype = response.mimetype or ""
+    return mimetype.startswith(COMPRESSIBLE_TYPES)
+
+
+def _stream(chunks: Iterable[bytes], source: Iterable, encoding: str) -> Iterator[bytes]:
+    compressor = COMPRESSORS[encoding]()
+    raw = sent = 0
+    try:
+        for chunk in chunks:
+            if not chunk:
+                continue
+            raw += len(chunk)
+            # Досылаем сжатое после каждого куска - иначе zlib/brotli держат его в буфере
+            data = compressor.compress(chunk) + compressor.flush()
+            sent += len(data)
+            yield data
+        data = compressor.finish()
+        sent += len(data)
+        yield data
+        _count(encoding, raw, sent)
+    finally:
+        if hasattr(source, "close"):
+            source.close()
+
+
+def _set_encoded_etag(response: Response, etag: Optional[str], weak: bool, encoding: str) -> None:
+    if etag is not None:
+        response.set_etag(f"{etag}-{encoding}", weak=weak)
+
+
+def _before_request():
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return None
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return None
+    suffix = f"-{encoding}"
+    etags = parse_etags(header)
+    stripped = {
+        etag[: -len(suffix)] for etag in etags.as_set(include_weak=True) if etag.endswith(suffix)
+    } - etags.as_set(include_weak=True)
+    if stripped:
+        # Исходные ETag остаются: ответы со своим сжатием (swagger.json) сравнивают с ними
+        request.environ["HTTP_IF_NONE_MATCH"] = ", ".join([header] + [quote_etag(etag) for etag in sorted(stripped)])
+        g.compression_stripped = (suffix, stripped)
+    return None
+
+
+def _restore_encoded_etag(response: Response) -> None:
+    """304 от обработчика несёт ETag несжатого ответа - клиент же хранит сжатый."""
+    suffix, stripped = g.pop("compression_stripped", (None, ()))
+    if suffix is None or "Content-Encoding" in response.headers:
+        return
+    etag, weak = response.get_etag()
+    if etag in stripped:
+        response.set_etag(f"{etag}{suffix}", weak=weak)
+        response.vary.add("Accept-Encoding")
+
+
+def _after_request(response: Response) -> Response:
+    if response.status_code == 304:
+        _restore_encoded_etag(response)
+        return response
+    if not _compressible(response):
+        return response
+    if response.direct_passthrough:
+        # Файл сжимается, только если его можно целиком прочитать в память (см. описание модуля)
+        length = response.content_length
+        if "Range" in request.headers or length is None or length > MAX_FILE_SIZE:
+            return response
+    if not response.is_streamed or response.direct_passthrough:
+        length = response.content_length
+        if length is not None and length < MIN_SIZE:
+            return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    etag, weak = response.get_etag()
+    if response.is_streamed and not response.direct_passthrough:
+        source = response.response
+        response.response = _stream(response.iter_encoded(), source, encoding)
+        response.headers.pop("Content-Length", None)
+        response.headers["Content-Encoding"] = encoding
+        _set_encoded_etag(response, etag, weak, encoding)
+        return response
+
+    key = None
+    body = None
+    if etag is not None:
+        key = (request.path, etag, response.content_type or "", encoding)
+        body = compressed_cache.get(key)
+    if body is None:
+        response.direct_passthrough = False
+        data = response.get_data()
+        if len(data) < MIN_SIZE:
+            return response
+        body = compress(data, encoding)
+        _count(encoding, len(data), len(body))
+        if key is not None:
+            compressed_cache.put(key, body)
+    else:
+        # Файл из кэша не читается - закрываем его. Только сам файл: response.close()
+        # вызвал бы и call_on_close (метрики, контроль допуска) раньше, чем отдан ответ
+        if hasattr(response.response, "close"):
+            response.response.close()
+        response.direct_passthrough = False
+
+    response.set_data(body)
+    response.headers["Content-Encoding"] = encoding
+    response.headers.pop("Accept-Ranges", None)
+    _set_encoded_etag(response, etag, weak, encoding)
+    if etag is not None:
+        return response.make_conditional(request)
+    return response
+
+
+def init_app(app) -> None:
+    """
+    Подключает сжатие ответов. Вызывать раньше остальных init_app с after_request:
+    Flask выполняет их в обратном порядке, и сжатие должно видеть окончательный ответ.
+    """
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    metrics.register_cache("compression", lambda: compressed_cache.stats)
@@ -0,0 +1,213 @@
+"""
+Модуль counters.py
+
+Денормализованные счётчики групп: студенты, занятия и непроверенные сдачи домашек.
+
+Счётчики лежат в отдельной таблице GroupCounters (строка на группу) и меняются
+триггерами SQLite на Groups, Students, OnlineLessons и HomeworksStudents. Поэтому они
+точны после любой записи - через utils.py, пакет /batch/, проверку домашек или
+прямой SQL, - и список групп со счётчиками не делает COUNT(*) по трём таблицам.
+
+Если счётчики всё-таки разошлись (триггеры создали на уже заполненной базе, данные
+правили с отключёнными триггерами и т.п.), расхождения находит и исправляет сверка:
+
+    python counters.py reconcile           # показать расхождения
+    python counters.py reconcile --repair  # исправить
+"""
+
+import sys
+from typing import Dict, List
+
+from peewee import fn
+from models import db, Groups, Students, OnlineLessons, HomeworksStudents, GroupCounters
+from db_fields import sql_literal
+
+# Статус сдачи, которая ждёт проверки
+PENDING_STATUS = "принято"
+COUNTER_FIELDS = ("students_count", "lessons_count", "pending_homeworks_count")
+
+_ADD = """
+    INSERT INTO {counters} (group_id, {column})
+    SELECT {group_id}, {delta} WHERE {group_id} IS NOT NULL
+    ON CONFLICT (group_id) DO UPDATE SET {column} = {column} + excluded.{column};
+"""
+
+
+def _triggers() -> Dict[str, str]:
+    counters = GroupCounters._meta.table_name
+    groups = Groups._meta.table_name
+    students = Students._meta.table_name
+    lessons = OnlineLessons._meta.table_name
+    submissions = HomeworksStudents._meta.table_name
+
+    def add(column: str, group_id: str, delta: str) -> str:
+        return _ADD.format(counters=counters, column=column, group_id=group_id, delta=delta)
+
+    # Статус в том виде, в каком он хранится (строка или код, см. db_fields.py)
+    pending = sql_literal(HomeworksStudents.status, PENDING_STATUS)
+
+    def pending_of(student_id: str) -> str:
+        return (
+            f"(SELECT COUNT(*) FROM {submissions} "
+            f"WHERE student_id = {student_id} AND status = {pending})"
+        )
+
+    def group_of(student_id: str) -> str:
+        return f"(SELECT group_id FROM {students} WHERE id = {student_id})"
+
+    def is_pending(row: str) -> str:
+        return f"({row}.status = {pending})"
+
+    return {
+        "trg_counters_group_insert": (
+            f"AFTER INSERT ON {groups} BEGIN "
+            f"INSERT OR IGNORE INTO {counters} (group_id) VALUES (NEW.id); END"
+        ),
+        "trg_counters_group_delete": (
+            f"AFTER DELETE ON {groups} BEGIN DELETE FROM {counters} WHERE group_id = OLD.id; END"
+        ),
+        # Сдачи студента считаются в его группе, поэтому переезжают вместе с ним
+        "trg_counters_student_insert": (
+            f"AFTER INSERT ON {students} BEGIN "
+            f"{add('students_count', 'NEW.group_id', '1')}"
+            f"{add('pending_homeworks_count', 'NEW.group_id', pending_of('NEW.id'))} END"
+        ),
+        # BEFORE: при включённых foreign_keys сдачи удаляются каскадом раньше AFTER-триггера,
+        # а их собственные триггеры группу уже удалённого студента не найдут
+        "trg_counters_student_delete": (
+            f"BEFORE DELETE ON {students} BEGIN "
+            f"{add('students_count', 'OLD.group_id', '-1')}"
+            f"{add('pending_homeworks_count', 'OLD.group_id', '-' + pending_of('OLD.id'))} END"
+        ),
+        "trg_counters_student_move": (
+            f"AFTER UPDATE OF group_id ON {students} WHEN OLD.group_id IS NOT NEW.group_id BEGIN "
+            f"{add('students_count', 'OLD.group_id', '-1')}"
+            f"{add('students_count', 'NEW.group_id', '1')}"
+            f"{add('pending_homeworks_count', 'OLD.group_id', '-' + pending_of('NEW.id'))}"
+            f"{add('pending_homeworks_count', 'NEW.group_id', pending_of('NEW.id'))} END"
+        ),
+        "trg_counters_lesson_insert": (
+            f"AFTER INSERT ON {lessons} BEGIN {add('lessons_count', 'NEW.group_id', '1')} END"
+        ),
+        "trg_counters_lesson_delete": (
+            f"AFTER DELETE ON {lessons} BEGIN {add('lessons_count', 'OLD.group_id', '-1')} END"
+        ),
+        "trg_counters_lesson_move": (
+            f"AFTER UPDATE OF group_id ON {lessons} WHEN OLD.group_id IS NOT NEW.group_id BEGIN "
+            f"{add('lessons_count', 'OLD.group_id', '-1')}"
+            f"{add('lessons_count', 'NEW.group_id', '1')} END"
+        ),
+        "trg_counters_submission_insert": (
+            f"AFTER INSERT ON {submissions} WHEN {is_pending('NEW')} BEGIN "
+            f"{add('pending_homeworks_count', group_of('NEW.student_id'), '1')} END"
+        ),
+        "trg_counters_submission_delete": (
+            f"AFTER DELETE ON {submissions} WHEN {is_pending('OLD')} BEGIN "
+            f"{add('pending_homeworks_count', group_of('OLD.student_id'), '-1')} END"
+        ),
+        "trg_counters_submission_update": (
+            f"AFTER UPDATE OF status, student_id ON {submissions} "
+            f"WHEN OLD.status IS NOT NEW.status OR OLD.student_id IS NOT NEW.student_id BEGIN "
+            f"{add('pending_homeworks_count', group_of('OLD.student_id'), '-' + is_pending('OLD'))}"
+            f"{add('pending_homeworks_count', group_of('NEW.student_id'), is_pending('NEW'))} END"
+        ),
+    }
+
+
+def init_counters() -> None:
+    """
+    Создаёт таблицу счётчиков и (пере)создаёт триггеры. Если таблица только что появилась
+    на заполненной базе, счётчики сразу заполняются сверкой.
+    """
+    is_new = not GroupCounters.table_exists()
+    with db.atomic():
+        db.create_tables([GroupCounters], safe=True)
+        # Пересоздаём каждый раз: в тексте триггеров статус в виде хранения, а он зависит от режима
+        for name, body in _triggers().items():
+            db.execute_sql(f"DROP TRIGGER IF EXISTS {name}")
+            db.execute_sql(f"CREATE TRIGGER {name} {body}")
+    if is_new:
+        reconcile(repair=True)
+
+
+def _actual_counts() -> Dict[int, Dict[str, int]]:
+    """Счётчики, посчитанные заново по таблицам (по одному GROUP BY на таблицу)."""
+    actual = {group.id: dict.fromkeys(COUNTER_FIELDS, 0) for group in Groups.select(Groups.id)}
+
+    queries = {
+        "students_count": Students.select(Students.group_id, fn.COUNT(Students.id)).group_by(
+            Students.group_id
+        ),
+        "lessons_count": OnlineLessons.select(
+            OnlineLessons.group_id, fn.COUNT(OnlineLessons.id)
+        ).group_by(OnlineLessons.group_id),
+        "pending_homeworks_count": HomeworksStudents.select(
+            Students.group_id, fn.COUNT(HomeworksStudents.id)
+        )
+        .join(Students, on=(HomeworksStudents.student_id == Students.id))
+        .where(HomeworksStudents.status == PENDING_STATUS)
+        .group_by(Students.group_id),
+    }
+    for field, query in queries.items():
+        for group_id, count in query.tuples():
+            if group_id in actual:
+                actual[group_id][field] = count
+    return actual
+
+
+def reconcile(repair: bool = False) -> List[Dict[str, object]]:
+    """
+    Сравнивает счётчики с реальными данными.
+
+    Args:
+        repair: Исправить расхождения (в той же транзакции, что и подсчёт)
+
+    Returns:
+        Расхождения: {"group_id", "field", "stored", "actual"}; stored=None - строки
+        счётчиков нет, actual=None - строка осталась от удалённой группы
+    """
+    # IMMEDIATE - пока считаем и исправляем, никто не пишет
+    with db.atomic("IMMEDIATE" if repair else None):
+        actual = _actual_counts()
+        stored = {row.group_id: row for row in GroupCounters.select()}
+
+        drift: List[Dict[str, object]] = []
+        for group_id, counts in actual.items():
+            row = stored.get(group_id)
+            for field, count in counts.items():
+                value = getattr(row, field) if row is not None else None
+                if value != count:
+                    drift.append({"group_id": group_id, "field": field, "stored": value, "actual": count})
+        orphans = sorted(set(stored) - set(actual))
+        for group_id in orphans:
+            drift.append({"group_id": group_id, "field": None, "stored": None, "actual": None})
+
+        if repair and drift:
+            broken = {item["group_id"] for item in drift} - set(orphans)
+            for group_id in sorted(broken):
+                GroupCounters.replace(group_id=group_id, **actual[group_id]).execute()
+            if orphans:
+                GroupCounters.delete().where(GroupCounters.group_id.in_(orphans)).execute()
+    return drift
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if not args or args[0] != "reconcile" or set(args[1:]) - {"--repair"}:
+        print("Использование: python counters.py reconcile [--repair]")
+        sys.exit(2)
+
+    repair = "--repair" in args
+    db.create_tables([GroupCounters], safe=True)
+    drift = reconcile(repair=repair)
+    for item in drift:
+        if item["field"] is None:
+            print(f"Группа {item['group_id']}: строка счётчиков без группы")
+        else:
+            print(f"Группа {item['group_id']}: {item['field']} = {item['stored']}, на самом деле {item['actual']}")
+    if not drift:
+        print("Расхождений нет")
+    elif repair:
+        print(f"Исправлено расхождений: {len(drift)}")
+    else:
+        sys.exit(1)
@@ -0,0 +1,109 @@
+"""
+Модуль db_fields.py
+
+Компактное хранение колонок (включается ACADEMY_COMPACT_STORAGE=1, см. models.py).
+
+    EnumCodeField     - статус хранится маленьким целым (индекс в списке значений),
+                        а в Python и API остаётся строкой: "обратная связь выдана" <-> 3.
+    EpochDateTimeField - дата-время хранится целым числом микросекунд от 1970-01-01
+                        (8 байт вместо ~26 символов текста), в Python - datetime.
+
+Оба поля переводят значения в обе стороны сами, поэтому запросы peewee (where, in_,
+update, insert_many) работают одинаково в обоих режимах. Там, где значение попадает
+в SQL в обход поля (VALUES, CASE, текст триггеров), его нужно переводить явно через
+field.db_value(...) - см. utils.grade_homework_submissions и counters.py.
+
+Перевести существующую базу в выбранный режим (и обратно): migrate_storage.py.
+"""
+
+import datetime
+import os
+from typing import Any, List, Optional, Sequence, Tuple
+
+from peewee import BigIntegerField, CharField, DateTimeField, Field, IntegerField, format_date_time
+
+COMPACT_STORAGE = os.environ.get("ACADEMY_COMPACT_STORAGE", "0") in ("1", "true")
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+_MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+class EnumCodeField(IntegerField):
+    """Строковое значение из фиксированного списка, в базе - его номер в списке."""
+
+    def __init__(self, values: Sequence[str], **kwargs):
+        self.values: Tuple[str, ...] = tuple(values)
+        self._codes = {value: code for code, value in enumerate(self.values)}
+        kwargs.setdefault("choices", [(value, value) for value in self.values])
+        super().__init__(**kwargs)
+
+    def db_value(self, value: Any) -> Optional[int]:
+        if value is None or isinstance(value, int):
+            return value
+        try:
+            return self._codes[value]
+        except KeyError:
+            raise ValueError(f"{self.name}: недопустимое значение {value!r}") from None
+
+    def python_value(self, value: Any) -> Optional[str]:
+        if value is None or isinstance(value, str):
+            return value
+        return self.values[value]
+
+
+class EpochDateTimeField(BigIntegerField):
+    """datetime, в базе - микросекунды от 1970-01-01 (наивное время, как у DateTimeField)."""
+
+    def db_value(self, value: Any) -> Optional[int]:
+        if value is None or isinstance(value, int):
+            return value
+        if isinstance(value, str):
+            value = format_date_time(value, DateTimeField.formats)
+        if isinstance(value, datetime.date) and not isinstance(value, datetime.datetime):
+            value = datetime.datetime.combine(value, datetime.time())
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return (value - _EPOCH) // _MICROSECOND
+
+    def python_value(self, value: Any) -> Optional[datetime.datetime]:
+        if value is None:
+            return None
+        if isinstance(value, str):
+            # Строка в колонке - база ещё не переведена (migrate_storage.py)
+            return format_date_time(value, DateTimeField.formats)
+        return _EPOCH + value * _MICROSECOND
+
+
+def enum_field(values: Sequence[str], **kwargs) -> Field:
+    """Поле статуса: EnumCodeField в компактном режиме, иначе CharField с choices."""
+    if COMPACT_STORAGE:
+        return EnumCodeField(values, **kwargs)
+    return CharField(choices=[(value, value) for value in values], **kwargs)
+
+
+def timestamp_field(**kwargs) -> Field:
+    """Поле даты-времени: EpochDateTimeField в компактном режиме, иначе DateTimeField."""
+    if COMPACT_STORAGE:
+        return EpochDateTimeField(**kwargs)
+    return DateTimeField(**kwargs)
+
+
+def is_compact(field: Field) -> bool:
+    return isinstance(field, (EnumCodeField, EpochDateTimeField))
+
+
+def sql_literal(field: Field, value: Any) -> str:
+    """Значение поля в виде SQL литерала (для текста триггеров)."""
+    value = field.db_value(value)
+    if value is None:
+        return "NULL"
+    if isinstance(value, (int, float)):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def enum_values(field: Field) -> List[str]:
+    """Значения поля статуса в порядке кодов (для обоих режимов)."""
+    if isinstance(field, EnumCodeField):
+        return list(field.values)
+    return [value for value, _ in field.choices]
@@ -0,0 +1,288 @@
+"""
+Модуль export.py
+
+Выгрузка журнала оценок (GET /export/gradebook) в CSV, Apache Arrow (IPC stream) или Parquet.
+
+Строка журнала - студент, колонки - оценки за занятия его группы и за домашки к ним:
+
+    student_id, last_name, first_name, middle_name, group_id, group_name,
+    lesson_1_mark, homework_1_mark, lesson_2_mark, homework_2_mark, ...
+
+где N в lesson_N - порядковый номер занятия в группе (по дате и времени). Колонок
+столько, сколько занятий у самой большой группы выгрузки; если к занятию несколько
+домашек, берётся лучшая оценка.
+
+Студенты читаются кусками по CHUNK_SIZE по ключу (group_id, id), без OFFSET, и оценки
+каждого куска разворачиваются в колонки одним запросом (MAX(CASE ...) ... GROUP BY).
+Наружу кусок уходит сразу: CSV - текстом, Arrow - RecordBatch, Parquet - row group,
+поэтому память не зависит от числа студентов. CSV и Arrow сжимаются gzip на лету,
+если клиент его принимает; Parquet сжат внутри файла.
+
+Arrow и Parquet требуют pyarrow (необязательная зависимость): без него доступен только CSV.
+Архивы учебных лет (archive.py) в выгрузку не попадают.
+"""
+
+import csv
+import importlib.util
+import io
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from peewee import SQL, Case, Tuple as RowValue, fn
+from models import Groups, Students, OnlineLessons, StudentsOnlineLessons, Homeworks, HomeworksStudents
+
+# pyarrow импортируется при первой выгрузке Arrow/Parquet, а не при старте приложения: импорт тяжёлый
+PYARROW_INSTALLED = importlib.util.find_spec("pyarrow") is not None
+
+FORMATS = ("csv", "arrow", "parquet")
+MIMETYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+CHUNK_SIZE = 1000
+
+STUDENT_COLUMNS = ("student_id", "last_name", "first_name", "middle_name", "group_id", "group_name")
+
+
+def format_available(export_format: str) -> bool:
+    return export_format == "csv" or PYARROW_INSTALLED
+
+
+def _pyarrow():
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+
+    return pyarrow
+
+
+def lesson_count(group_id: Optional[int] = None) -> int:
+    """Число занятий у самой большой группы выгрузки (= число пар колонок с оценками)."""
+    per_group = OnlineLessons.select(fn.COUNT(OnlineLessons.id).alias("lessons")).group_by(OnlineLessons.group_id)
+    if group_id is not None:
+        per_group = per_group.where(OnlineLessons.group_id == group_id)
+    subquery = per_group.alias("per_group")
+    return OnlineLessons.select(fn.MAX(subquery.c.lessons)).from_(subquery).scalar() or 0
+
+
+def columns(lessons: int) -> List[str]:
+    names = list(STUDENT_COLUMNS)
+    for number in range(1, lessons + 1):
+        names += [f"lesson_{number}_mark", f"homework_{number}_mark"]
+    return names
+
+
+def _student_chunks(group_id: Optional[int]) -> Iterator[List[Tuple[Any, ...]]]:
+    """Студенты кусками по CHUNK_SIZE в порядке (group_id, id) - по индексу students(group_id)."""
+    last_key: Optional[Tuple[int, int]] = None
+    while True:
+        query = (
+            Students.select(
+                Students.id,
+                Students.last_name,
+                Students.first_name,
+                Students.middle_name,
+                Groups.id,
+                Groups.group_name,
+            )
+            .join(Groups)
+            .order_by(Students.group_id, Students.id)
+            .limit(CHUNK_SIZE)
+        )
+        if group_id is not None:
+            query = query.where(Students.group_id == group_id)
+        if last_key is not None:
+            query = query.where(RowValue(Students.group_id, Students.id) > RowValue(*last_key))
+        rows = list(query.tuples())
+        if not rows:
+            return
+        yield rows
+        last_key = (rows[-1][4], rows[-1][0])
+
+
+def _chunk_marks(student_ids: List[int], group_ids: List[int], lessons: int) -> Dict[int, Tuple[Any, ...]]:
+    """student_id -> (lesson_1_mark, homework_1_mark, ...) для куска студентов."""
+    ol = OnlineLessons
+    numbered = (
+        ol.select(
+            ol.id,
+            fn.ROW_NUMBER()
+            .over(partition_by=[ol.group_id], order_by=[ol.lesson_date, ol.lesson_time, ol.id])
+            .alias("n"),
+        )
+        .where(ol.group_id.in_(group_ids))
+        .cte("numbered_lessons")
+    )
+
+    sol = StudentsOnlineLessons
+    lesson_marks = (
+        sol.select(
+            sol.student_id.alias("student_id"),
+            numbered.c.n.alias("n"),
+            sol.mark.alias("lesson_mark"),
+            SQL("NULL").alias("homework_mark"),
+        )
+        .join(numbered, on=(numbered.c.id == sol.online_lesson_id))
+        .where(sol.student_id.in_(student_ids))
+    )
+    hs = HomeworksStudents
+    homework_marks = (
+        hs.select(
+            hs.student_id,
+            numbered.c.n,
+            SQL("NULL"),
+            hs.mark,
+        )
+        .join(Homeworks, on=(Homeworks.id == hs.homework_id))
+        .join(numbered, on=(numbered.c.id == Homeworks.online_lesson_id))
+        .where(hs.student_id.in_(student_ids))
+    )
+    # UNION ALL (+), а не UNION: одинаковые строки оценок не должны схлопываться
+    marks = (lesson_marks + homework_marks).cte("marks", columns=("student_id", "n", "lesson_mark", "homework_mark"))
+
+    pivot = []
+    for number in range(1, lessons + 1):
+        pivot.append(fn.MAX(Case(marks.c.n, [(number, marks.c.lesson_mark)])))
+        pivot.append(fn.MAX(Case(marks.c.n, [(number, marks.c.homework_mark)])))
+
+    query = (
+        ol.select(marks.c.student_id, *pivot)
+        .from_(marks)
+        .with_cte(numbered, marks)
+        .group_by(marks.c.student_id)
+    )
+    return {row[0]: row[1:] for row in query.tuples()}
+
+
+def gradebook_rows(group_id: Optional[int], lessons: int) -> Iterator[List[Tuple[Any, ...]]]:
+    """Строки журнала кусками по CHUNK_SIZE."""
+    empty = (None,) * (2 * lessons)
+    for students in _student_chunks(group_id):
+        marks = _chunk_marks(
+            [student[0] for student in students],
+            sorted({student[4] for student in students}),
+            lessons,
+        )
+        yield [student + marks.get(student[0], empty) for student in students]
+
+
+# ========== ФОРМАТЫ ==========
+
+
+class _Drain:
+    """Файл для pyarrow, из которого после каждого куска забираются записанные байты."""
+
+    def __init__(self):
+        self.parts: List[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.parts.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def _csv_stream(group_id: Optional[int], lessons: int) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns(lessons))
+    for rows in gradebook_rows(group_id, lessons):
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def _arrow_schema(lessons: int):
+    pyarrow = _pyarrow()
+    fields = [
+        pyarrow.field("student_id", pyarrow.int64()),
+        pyarrow.field("last_name", pyarrow.string()),
+        pyarrow.field("first_name", pyarrow.string()),
+        pyarrow.field("middle_name", pyarrow.string()),
+        pyarrow.field("group_id", pyarrow.int64()),
+        pyarrow.field("group_name", pyarrow.string()),
+    ]
+    fields += [pyarrow.field(name, pyarrow.int8()) for name in columns(lessons)[len(STUDENT_COLUMNS):]]
+    return pyarrow.schema(fields)
+
+
+def _record_batch(rows: List[Tuple[Any, ...]], schema):
+    # Кусок разворачивается в колонки: из строк - в списки значений по колонкам
+    pyarrow = _pyarrow()
+    return pyarrow.RecordBatch.from_arrays(
+        [pyarrow.array(values, type=field.type) for values, field in zip(zip(*rows), schema)],
+        schema=schema,
+    )
+
+
+def _columnar_stream(export_format: str, group_id: Optional[int], lessons: int) -> Iterator[bytes]:
+    pyarrow = _pyarrow()
+    schema = _arrow_schema(lessons)
+    sink = _Drain()
+    if export_format == "parquet":
+        writer = pyarrow.parquet.ParquetWriter(sink, schema, compression="zstd")
+        write = writer.write_batch
+    else:
+        writer = pyarrow.ipc.new_stream(sink, schema)
+        write = writer.write_batch
+
+    for rows in gradebook_rows(group_id, lessons):
+        write(_record_batch(rows, schema))
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+
+def _gzip(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_gradebook(export_format: str, group_id: Optional[int] = None, use_gzip: bool = False) -> Iterator[bytes]:
+    """
+    Поток байтов выгрузки журнала.
+
+    Args:
+        export_format: csv, arrow или parquet
+        group_id: Только эта группа (по умолчанию - вся академия)
+        use_gzip: Сжимать поток gzip (для parquet игнорируется - он сжат внутри)
+
+    Raises:
+        ValueError: Если формат неизвестен или для него не установлен pyarrow
+    """
+    if export_format not in FORMATS:
+        raise ValueError(f"Формат должен быть одним из: {', '.join(FORMATS)}")
+    if not format_available(export_format):
+        raise ValueError(f"Формат {export_format} недоступен: не установлен pyarrow")
+
+    lessons = lesson_count(group_id)
+    if export_format == "csv":
+        chunks = _csv_stream(group_id, lessons)
+    else:
+        chunks = _columnar_stream(export_format, group_id, lessons)
+    if use_gzip and export_format != "parquet":
+        return _gzip(chunks)
+    return chunks
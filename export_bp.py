@@ -0,0 +1,43 @@
+from flask import Response, request, stream_with_context
+from flask_restx import Namespace, Resource
+from http import HTTPStatus
+from auth import require_role
+import export
+
+# Создаем экземпляр Namespace для выгрузок
+export_bp = Namespace("export", description="Выгрузки данных")
+
+
+@export_bp.route("/gradebook")
+@export_bp.param("group_id", "Только эта группа (по умолчанию - вся академия)")
+@export_bp.param("format", "csv, arrow или parquet (arrow и parquet - при установленном pyarrow)", default="csv")
+@export_bp.response(HTTPStatus.BAD_REQUEST, "Неверные параметры или формат недоступен на сервере")
+@export_bp.response(HTTPStatus.FORBIDDEN, "Доступ запрещен")
+class GradebookExportResource(Resource):
+    @export_bp.doc("export_gradebook")
+    @export_bp.produces(list(export.MIMETYPES.values()))
+    @require_role("admin")
+    def get(self):
+        """Выгрузить журнал оценок потоком (gzip - если клиент его принимает)"""
+        export_format = request.args.get("format", "csv")
+        group_id = request.args.get("group_id")
+        if export_format not in export.FORMATS:
+            export_bp.abort(HTTPStatus.BAD_REQUEST, f"Формат должен быть одним из: {', '.join(export.FORMATS)}")
+        if not export.format_available(export_format):
+            export_bp.abort(HTTPStatus.BAD_REQUEST, f"Формат {export_format} недоступен: не установлен pyarrow")
+        if group_id is not None:
+            try:
+                group_id = int(group_id)
+            except ValueError:
+                export_bp.abort(HTTPStatus.BAD_REQUEST, "group_id должен быть числом")
+
+        use_gzip = export_format != "parquet" and request.accept_encodings["gzip"] > 0
+        chunks = export.export_gradebook(export_format, group_id, use_gzip)
+
+        file_name = f"gradebook_{group_id if group_id is not None else 'all'}.{export_format}"
+        response = Response(stream_with_context(chunks), content_type=export.MIMETYPES[export_format])
+        response.headers["Content-Disposition"] = f"attachment; filename={file_name}"
+        response.vary.add("Accept-Encoding")
+        if use_gzip:
+            response.headers["Content-Encoding"] = "gzip"
+        return response
@@ -0,0 +1,157 @@
+"""
+Модуль group_index.py
+
+Индекс названий групп в памяти процесса для автодополнения (GET /group/suggest).
+
+Названия нормализуются (casefold, "ё" -> "е") и хранятся в двух отсортированных массивах:
+    - (название, id) - поиск по префиксу двоичным поиском;
+    - (суффикс названия, id) - суффиксный массив, поиск по подстроке тем же двоичным поиском.
+Запрос не ходит в базу и не сортирует таблицу, как name_filter с LIKE '%...%'.
+
+Индекс строится при старте и обновляется точечно из create_group/update_group_id/delete_group_id.
+Если изменение сделано внутри транзакции (например, пакет /batch/), она ещё может
+откатиться - тогда индекс просто помечается устаревшим и пересобирается при следующем
+запросе. Изменения из других процессов и прямого SQL подхватываются пересборкой раз в
+ACADEMY_GROUP_INDEX_TTL секунд.
+"""
+
+import bisect
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from models import db, Groups
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+INDEX_TTL = float(os.environ.get("ACADEMY_GROUP_INDEX_TTL", 60))
+
+
+def normalize(text: str) -> str:
+    """Приводит строку к виду для сравнения: без регистра, "ё" как "е"."""
+    return text.casefold().replace("ё", "е")
+
+
+class GroupNameIndex:
+    def __init__(self, ttl: float = INDEX_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._names: Dict[int, Tuple[str, str]] = {}  # id -> (нормализованное, исходное)
+        self._sorted: List[Tuple[str, int]] = []
+        self._suffixes: List[Tuple[str, int]] = []
+        self._built_at: Optional[float] = None
+        self.stats = {"queries": 0, "rebuilds": 0}
+
+    # ---------- построение ----------
+
+    def build(self, rows: List[Tuple[int, str]]) -> None:
+        names = {group_id: (normalize(name), name) for group_id, name in rows}
+        sorted_names = sorted((norm, group_id) for group_id, (norm, _) in names.items())
+        suffixes = sorted(
+            (norm[start:], group_id)
+            for group_id, (norm, _) in names.items()
+            for start in range(len(norm))
+        )
+        with self._lock:
+            self._names, self._sorted, self._suffixes = names, sorted_names, suffixes
+            self._built_at = time.monotonic()
+            self.stats["rebuilds"] += 1
+
+    def rebuild(self) -> None:
+        self.build(list(Groups.select(Groups.id, Groups.group_name).tuples()))
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._built_at = None
+
+    def _fresh(self) -> bool:
+        return self._built_at is not None and time.monotonic() - self._built_at < self.ttl
+
+    # ---------- точечные изменения ----------
+
+    def _remove_locked(self, group_id: int) -> None:
+        entry = self._names.pop(group_id, None)
+        if entry is None:
+            return
+        norm = entry[0]
+        for array, keys in ((self._sorted, [norm]), (self._suffixes, [norm[i:] for i in range(len(norm))])):
+            for key in keys:
+                position = bisect.bisect_left(array, (key, group_id))
+                if position < len(array) and array[position] == (key, group_id):
+                    del array[position]
+
+    def put(self, group_id: int, name: str) -> None:
+        """Добавляет группу или меняет её название."""
+        norm = normalize(name)
+        with self._lock:
+            self._remove_locked(group_id)
+            self._names[group_id] = (norm, name)
+            bisect.insort(self._sorted, (norm, group_id))
+            for start in range(len(norm)):
+                bisect.insort(self._suffixes, (norm[start:], group_id))
+
+    def remove(self, group_id: int) -> None:
+        with self._lock:
+            self._remove_locked(group_id)
+
+    # ---------- поиск ----------
+
+    def search(self, query: str, limit: int = DEFAULT_LIMIT) -> List[Dict[str, object]]:
+        """
+        Группы, название которых начинается с query или содержит его.
+
+        Сначала совпадения по префиксу, затем по подстроке, внутри - по алфавиту.
+        """
+        if not self._fresh():
+            self.rebuild()
+        query = normalize(query)
+        self.stats["queries"] += 1
+
+        with self._lock:
+            found: List[int] = []
+            position = bisect.bisect_left(self._sorted, (query,))
+            while len(found) < limit and position < len(self._sorted):
+                norm, group_id = self._sorted[position]
+                if not norm.startswith(query):
+                    break
+                found.append(group_id)
+                position += 1
+
+            if len(found) < limit and query:
+                seen = set(found)
+                others = set()
+                position = bisect.bisect_left(self._suffixes, (query,))
+                while position < len(self._suffixes):
+                    suffix, group_id = self._suffixes[position]
+                    if not suffix.startswith(query):
+                        break
+                    if group_id not in seen:
+                        others.add(group_id)
+                    position += 1
+                found.extend(sorted(others, key=lambda gid: self._names[gid][0])[: limit - len(found)])
+
+            return [{"id": group_id, "group_name": self._names[group_id][1]} for group_id in found]
+
+
+group_index = GroupNameIndex()
+
+
+def init_group_index() -> None:
+    """Строит индекс при старте приложения."""
+    group_index.rebuild()
+
+
+def group_changed(group_id: int, name: Optional[str]) -> None:
+    """
+    Отражает в индексе создание/переименование (name) или удаление (name=None) группы.
+
+    Внутри незавершённой транзакции изменение может откатиться, поэтому индекс
+    не правится, а помечается устаревшим.
+    """
+    if db.in_transaction():
+        group_index.invalidate()
+    elif name is None:
+        group_index.remove(group_id)
+    else:
+        group_index.put(group_id, name)
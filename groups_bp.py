@@ -1,5 +1,5 @@
 from flask import request
-from flask_restx import Namespace, Resource, fields
+from flask_restx import Namespace, Resource, fields, marshal
 from peewee import DoesNotExist, IntegrityError
 from utils import (
     get_group_by_id,
@@ -7,7 +7,9 @@ from utils import (
     create_group,
     update_group_id,
     delete_group_id,
+    suggest_groups,
 )
+from group_index import DEFAULT_LIMIT, MAX_LIMIT
 from http import HTTPStatus
 
 # Создаем экземпляр Namespace для групп
@@ -27,6 +29,26 @@ group_model = groups_bp.model(
     },
 )
 
+# Группа со счётчиками: только в /group/list/?with_counters=1, остальные ответы их не содержат
+group_counters_model = groups_bp.inherit(
+    "GroupWithCounters",
+    group_model,
+    {
+        "students_count": fields.Integer(description="Количество студентов"),
+        "lessons_count": fields.Integer(description="Количество занятий"),
+        "pending_homeworks_count": fields.Integer(description="Сдачи домашек, ожидающие проверки"),
+    },
+)
+
+# Модель подсказки при выборе группы
+group_suggestion_model = groups_bp.model(
+    "GroupSuggestion",
+    {
+        "id": fields.Integer(description="Уникальный идентификатор группы"),
+        "group_name": fields.String(description="Название группы"),
+    },
+)
+
 # Модель для входных данных при создании/обновлении группы
 group_input_model = groups_bp.model(
     "GroupInput",
@@ -57,20 +79,42 @@ class GroupResource(Resource):
     "sort_direction", "Направление сортировки (asc или desc)", default="asc"
 )
 @groups_bp.param("name_filter", "Фильтр по названию группы")
+@groups_bp.param("with_counters", "Добавить счётчики студентов, занятий и непроверенных домашек (1/0)", default="0")
+@groups_bp.response(HTTPStatus.OK, "Список групп (со счётчиками при with_counters=1)", [group_counters_model])
 @groups_bp.response(HTTPStatus.BAD_REQUEST, "Неверное направление сортировки")
 class GroupListResource(Resource):
     @groups_bp.doc("list_groups")
-    @groups_bp.marshal_list_with(group_model)
     def get(self):
         """Получить список всех групп"""
         sort_direction = request.args.get("sort_direction", "asc")
         name_filter = request.args.get("name_filter")
+        with_counters = request.args.get("with_counters", "0") in ("1", "true")
 
         if sort_direction not in ["asc", "desc"]:
             groups_bp.abort(HTTPStatus.BAD_REQUEST, "Неверное направление сортировки")
 
-        groups = get_groups_list(sort_direction, name_filter)
-        return groups
+        groups = get_groups_list(sort_direction, name_filter, with_counters)
+        return marshal(groups, group_counters_model if with_counters else group_model)
+
+
+@groups_bp.route("/suggest")
+@groups_bp.param("q", "Начало или часть названия группы (без учёта регистра)")
+@groups_bp.param("limit", f"Сколько подсказок вернуть (не больше {MAX_LIMIT})", default=DEFAULT_LIMIT)
+@groups_bp.response(HTTPStatus.BAD_REQUEST, "Неверный limit")
+class GroupSuggestResource(Resource):
+    @groups_bp.doc("suggest_groups")
+    @groups_bp.marshal_list_with(group_suggestion_model)
+    def get(self):
+        """Подсказки названий групп для автодополнения"""
+        query = request.args.get("q", "")
+        try:
+            limit = int(request.args.get("limit", DEFAULT_LIMIT))
+        except ValueError:
+            groups_bp.abort(HTTPStatus.BAD_REQUEST, "limit должен быть числом")
+        if not 1 <= limit <= MAX_LIMIT:
+            groups_bp.abort(HTTPStatus.BAD_REQUEST, f"limit должен быть от 1 до {MAX_LIMIT}")
+
+        return suggest_groups(query, limit)
 
 
 @groups_bp.route("/create/")
@@ -0,0 +1,107 @@
+"""
+Модуль homework_files.py
+
+Файлы сдач домашних заданий: потоковая запись на диск и хранение по содержимому.
+
+Тело запроса читается кусками по CHUNK_SIZE байт и сразу пишется во временный файл,
+sha256 считается по ходу записи - в памяти никогда не лежит больше одного куска,
+каким бы большим ни был файл. Готовый файл получает имя по хэшу содержимого:
+
+    FILES_DIR/ab/abcdef...   (первые два символа хэша - подкаталог)
+
+Одинаковый архив, сданный повторно (или другим студентом), второй раз не хранится:
+временный файл удаляется, а в HomeworksStudents.file_path записывается тот же адрес.
+Формат file_path: "<sha256>/<имя файла для скачивания>".
+
+Файлы не удаляются вместе со сдачей: на один файл могут ссылаться несколько сдач,
+в том числе из архивов учебных лет (archive.py).
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+from typing import BinaryIO, Optional, Tuple
+
+FILES_DIR = os.environ.get("ACADEMY_HOMEWORK_FILES_DIR", "homework_files")
+CHUNK_SIZE = 64 * 1024
+MAX_FILE_SIZE = int(os.environ.get("ACADEMY_HOMEWORK_MAX_FILE_SIZE", 50 * 1024 * 1024))
+MAX_NAME_LENGTH = 200
+DEFAULT_NAME = "homework.bin"
+
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class FileTooLarge(ValueError):
+    """Файл больше MAX_FILE_SIZE."""
+
+
+def clean_name(name: Optional[str]) -> str:
+    """Имя файла для скачивания: без каталогов и управляющих символов, не длиннее MAX_NAME_LENGTH."""
+    name = os.path.basename((name or "").replace("\\", "/"))
+    name = "".join(char for char in name if char.isprintable()).strip()
+    return name[-MAX_NAME_LENGTH:] or DEFAULT_NAME
+
+
+def blob_path(digest: str) -> str:
+    return os.path.join(FILES_DIR, digest[:2], digest)
+
+
+def file_path_value(digest: str, name: str) -> str:
+    """Значение HomeworksStudents.file_path для файла с хэшем digest."""
+    return f"{digest}/{name}"
+
+
+def parse_file_path(file_path: Optional[str]) -> Optional[Tuple[str, str]]:
+    """(sha256, имя) из HomeworksStudents.file_path или None, если файл не загружался через API."""
+    digest, _, name = (file_path or "").partition("/")
+    if not _DIGEST_RE.match(digest):
+        return None
+    return digest, name or DEFAULT_NAME
+
+
+def store_stream(stream: BinaryIO, max_size: int = MAX_FILE_SIZE) -> Tuple[str, int, bool]:
+    """
+    Записывает поток в хранилище, считая sha256 по ходу записи.
+
+    Returns:
+        (sha256, размер в байтах, был ли такой файл уже в хранилище)
+
+    Raises:
+        FileTooLarge: Если поток длиннее max_size (временный файл удаляется)
+    """
+    tmp_dir = os.path.join(FILES_DIR, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise FileTooLarge(f"Файл больше {max_size} байт")
+                digest.update(chunk)
+                tmp.write(chunk)
+            tmp.flush()
+            os.fsync(tmp.fileno())
+
+        hexdigest = digest.hexdigest()
+        final_path = blob_path(hexdigest)
+        if os.path.exists(final_path):
+            os.remove(tmp_path)
+            return hexdigest, size, True
+
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        # Одинаковые загрузки могут финишировать одновременно - replace атомарен,
+        # а содержимое у них всё равно одно и то же
+        os.replace(tmp_path, final_path)
+        return hexdigest, size, False
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
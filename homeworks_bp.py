@@ -0,0 +1,200 @@
+import mimetypes
+import os
+from flask import request, send_file
+from flask_restx import Namespace, Resource, fields
+from peewee import DoesNotExist
+from http import HTTPStatus
+from auth import require_role
+from utils import (
+    grade_homework_submissions,
+    get_homework_submission,
+    attach_homework_file,
+    GradingError,
+    HOMEWORK_STATUS_ORDER,
+    FILE_ACCEPTING_STATUSES,
+)
+from homework_files import (
+    FileTooLarge,
+    MAX_FILE_SIZE,
+    blob_path,
+    clean_name,
+    file_path_value,
+    parse_file_path,
+    store_stream,
+)
+
+# Сколько секунд клиент может не перепроверять скачанный файл (содержимое по адресу-хэшу не меняется)
+FILE_MAX_AGE = 3600
+
+# Создаем экземпляр Namespace для домашних заданий
+homeworks_bp = Namespace("homework", description="Операции с домашними заданиями")
+
+# Модель сдачи домашнего задания
+submission_model = homeworks_bp.model(
+    "HomeworkSubmission",
+    {
+        "id": fields.Integer(readonly=True, description="Уникальный идентификатор сдачи"),
+        "student_id": fields.Integer(
+            attribute=lambda submission: submission.__data__.get("student_id"), description="ID студента"
+        ),
+        "status": fields.String(enum=list(HOMEWORK_STATUS_ORDER), description="Статус сдачи"),
+        "mark": fields.Integer(description="Оценка (1-12)"),
+        "feedback_text": fields.String(description="Отзыв преподавателя"),
+        "checked_date": fields.DateTime(dt_format="rfc822", description="Дата первой проверки"),
+        "updated_at": fields.DateTime(dt_format="rfc822", description="Дата изменения"),
+    },
+)
+
+# Модель оценки одного студента
+grade_input_model = homeworks_bp.model(
+    "HomeworkGradeInput",
+    {
+        "student_id": fields.Integer(required=True, description="ID студента"),
+        "status": fields.String(
+            enum=list(HOMEWORK_STATUS_ORDER), description="Новый статус (только вперёд по порядку)"
+        ),
+        "mark": fields.Integer(description="Оценка (1-12), null - убрать оценку"),
+        "feedback_text": fields.String(description="Отзыв, null - убрать отзыв"),
+    },
+)
+
+# Модель для входных данных проверки
+grading_input_model = homeworks_bp.model(
+    "HomeworkGradingInput",
+    {
+        "submissions": fields.List(fields.Nested(grade_input_model), required=True, description="Оценки студентов"),
+    },
+)
+
+# Модель ответа: только изменившиеся сдачи
+grading_result_model = homeworks_bp.model(
+    "HomeworkGradingResult",
+    {
+        "homework_id": fields.Integer(description="ID домашнего задания"),
+        "changed": fields.List(fields.Nested(submission_model), description="Изменившиеся сдачи"),
+    },
+)
+
+# Модель ответа на загрузку файла сдачи
+file_upload_model = homeworks_bp.model(
+    "HomeworkFileUpload",
+    {
+        "homework_id": fields.Integer(description="ID домашнего задания"),
+        "student_id": fields.Integer(description="ID студента"),
+        "status": fields.String(enum=list(HOMEWORK_STATUS_ORDER), description="Статус сдачи"),
+        "file_name": fields.String(description="Имя файла для скачивания"),
+        "sha256": fields.String(description="Хэш содержимого"),
+        "size": fields.Integer(description="Размер в байтах"),
+        "deduplicated": fields.Boolean(description="Такой файл уже был в хранилище, место не занято"),
+        "submission_date": fields.DateTime(dt_format="rfc822", description="Дата сдачи"),
+    },
+)
+
+
+@homeworks_bp.route("/<int:homework_id>/submissions")
+@homeworks_bp.param("homework_id", "Уникальный идентификатор домашнего задания")
+@homeworks_bp.response(HTTPStatus.NOT_FOUND, "Домашнее задание не найдено")
+@homeworks_bp.response(HTTPStatus.BAD_REQUEST, "Неверные данные")
+@homeworks_bp.response(HTTPStatus.CONFLICT, "Сдачи не найдены или статус нельзя вернуть назад")
+class HomeworkSubmissionsResource(Resource):
+    @homeworks_bp.doc("grade_homework_submissions")
+    @homeworks_bp.expect(grading_input_model)
+    @homeworks_bp.marshal_with(grading_result_model)
+    @require_role("admin", "moderator")
+    def patch(self, homework_id):
+        """Выставить статусы, оценки и отзывы по сдачам домашнего задания одной транзакцией"""
+        submissions = (homeworks_bp.payload or {}).get("submissions")
+        if not isinstance(submissions, list) or not submissions:
+            homeworks_bp.abort(HTTPStatus.BAD_REQUEST, "Нужен непустой список submissions")
+        if not all(isinstance(item, dict) for item in submissions):
+            homeworks_bp.abort(HTTPStatus.BAD_REQUEST, "Каждая оценка - объект со student_id")
+
+        try:
+            changed = grade_homework_submissions(homework_id, submissions)
+        except DoesNotExist:
+            homeworks_bp.abort(HTTPStatus.NOT_FOUND, "Домашнее задание не найдено")
+        except GradingError as e:
+            if e.conflicts:
+                homeworks_bp.abort(HTTPStatus.CONFLICT, str(e), conflicts=e.conflicts)
+            homeworks_bp.abort(HTTPStatus.BAD_REQUEST, str(e))
+
+        return {"homework_id": homework_id, "changed": changed}
+
+
+@homeworks_bp.route("/<int:homework_id>/submissions/<int:student_id>/file")
+@homeworks_bp.param("homework_id", "Уникальный идентификатор домашнего задания")
+@homeworks_bp.param("student_id", "ID студента")
+@homeworks_bp.response(HTTPStatus.UNAUTHORIZED, "Требуется API-ключ")
+@homeworks_bp.response(HTTPStatus.NOT_FOUND, "Сдача или файл не найдены")
+class HomeworkSubmissionFileResource(Resource):
+    @homeworks_bp.doc("upload_homework_file", params={"filename": "Имя файла для скачивания"})
+    @homeworks_bp.marshal_with(file_upload_model, code=HTTPStatus.CREATED)
+    @homeworks_bp.response(HTTPStatus.CONFLICT, "Сдача уже проверена")
+    @homeworks_bp.response(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Файл больше {MAX_FILE_SIZE} байт")
+    @require_role()
+    def put(self, homework_id, student_id):
+        """Загрузить файл сдачи: тело запроса - содержимое файла, оно пишется на диск потоком"""
+        if request.content_length is not None and request.content_length > MAX_FILE_SIZE:
+            homeworks_bp.abort(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Файл больше {MAX_FILE_SIZE} байт")
+        # Проверяем сдачу до чтения тела, чтобы не писать файл впустую
+        try:
+            submission = get_homework_submission(homework_id, student_id)
+        except DoesNotExist:
+            homeworks_bp.abort(HTTPStatus.NOT_FOUND, "Сдача не найдена")
+        if submission.status not in FILE_ACCEPTING_STATUSES:
+            homeworks_bp.abort(HTTPStatus.CONFLICT, f"Сдача уже в статусе '{submission.status}', файл заменить нельзя")
+
+        try:
+            digest, size, deduplicated = store_stream(request.stream)
+        except FileTooLarge as e:
+            homeworks_bp.abort(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, str(e))
+
+        file_name = clean_name(request.args.get("filename"))
+        try:
+            submission = attach_homework_file(homework_id, student_id, file_path_value(digest, file_name))
+        except DoesNotExist:
+            homeworks_bp.abort(HTTPStatus.NOT_FOUND, "Сдача не найдена")
+        except GradingError as e:
+            homeworks_bp.abort(HTTPStatus.CONFLICT, str(e))
+
+        return {
+            "homework_id": homework_id,
+            "student_id": student_id,
+            "status": submission.status,
+            "file_name": file_name,
+            "sha256": digest,
+            "size": size,
+            "deduplicated": deduplicated,
+            "submission_date": submission.submission_date,
+        }, HTTPStatus.CREATED
+
+    @homeworks_bp.doc("download_homework_file")
+    @homeworks_bp.produces(["application/octet-stream"])
+    @require_role()
+    def get(self, homework_id, student_id):
+        """Скачать файл сдачи (поддерживаются Range, If-None-Match и If-Modified-Since)"""
+        try:
+            submission = get_homework_submission(homework_id, student_id)
+        except DoesNotExist:
+            homeworks_bp.abort(HTTPStatus.NOT_FOUND, "Сдача не найдена")
+
+        stored = parse_file_path(submission.file_path)
+        if stored is None or not os.path.exists(blob_path(stored[0])):
+            homeworks_bp.abort(HTTPStatus.NOT_FOUND, "Файл не загружен")
+        digest, file_name = stored
+
+        # send_file с путём отдаёт файл через wsgi.file_wrapper (sendfile у gunicorn),
+        # conditional=True - ответы 206 на Range и 304 на условные запросы
+        response = send_file(
+            os.path.abspath(blob_path(digest)),
+            mimetype=mimetypes.guess_type(file_name)[0] or "application/octet-stream",
+            as_attachment=True,
+            download_name=file_name,
+            conditional=True,
+            etag=digest,
+            max_age=FILE_MAX_AGE,
+        )
+        # Файл доступен только по ключу - общим кэшам его хранить нельзя
+        response.cache_control.public = False
+        response.cache_control.private = True
+        return response
@@ -0,0 +1,362 @@
+"""
+Модуль jobs.py
+
+Фоновые задачи внутри процесса приложения: ограниченный пул потоков, таблица Jobs
+со статусом и прогрессом, отмена и лимиты на задачу.
+
+Задача регистрируется декоратором job_type(), ставится в очередь через enqueue_job(),
+а её состояние читается из таблицы Jobs (поэтому опрашивать статус можно из любого воркера).
+
+Устройство:
+    - _coordinators - небольшой пул, в котором крутятся сами задачи (не больше MAX_ACTIVE_JOBS одновременно);
+    - _workers - общий пул для частей задачи (например, по одной группе), задача раздаёт их через ctx.map().
+      SQLite отпускает GIL на время выполнения запроса, поэтому агрегаты по разным группам
+      действительно выполняются параллельно на разных ядрах.
+"""
+
+import datetime
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from models import db, Jobs
+
+JOB_WORKERS = int(os.environ.get("ACADEMY_JOB_WORKERS", min(8, os.cpu_count() or 2)))
+MAX_ACTIVE_JOBS = int(os.environ.get("ACADEMY_MAX_ACTIVE_JOBS", 2))
+RESULTS_DIR = os.environ.get("ACADEMY_JOB_RESULTS_DIR", "job_results")
+
+FINISHED_STATUSES = ("done", "failed", "cancelled")
+
+# job_type -> {"handler": ..., "max_seconds": ..., "max_parallel": ..., "max_units": ...}
+_job_types: Dict[str, Dict[str, Any]] = {}
+# job_id -> JobContext для задач, запущенных в этом процессе
+_active: Dict[int, "JobContext"] = {}
+_lock = threading.Lock()
+_coordinators: Optional[ThreadPoolExecutor] = None
+_workers: Optional[ThreadPoolExecutor] = None
+
+
+class JobCancelled(Exception):
+    """Задача отменена пользователем."""
+
+
+class JobLimitExceeded(Exception):
+    """Задача вышла за свои лимиты (время, объём работы)."""
+
+
+def job_type(
+    name: str,
+    max_seconds: int = 600,
+    max_parallel: int = JOB_WORKERS,
+    max_units: Optional[int] = None,
+):
+    """
+    Регистрирует обработчик задачи.
+
+    Args:
+        name: Тип задачи (хранится в Jobs.job_type)
+        max_seconds: Лимит времени выполнения задачи
+        max_parallel: Сколько частей задачи может одновременно выполняться в общем пуле
+        max_units: Максимальный объём работы (например, число групп), None - без ограничения
+    """
+
+    def decorator(handler: Callable[["JobContext", Dict[str, Any]], Optional[str]]):
+        _job_types[name] = {
+            "handler": handler,
+            "max_seconds": max_seconds,
+            "max_parallel": max(1, min(max_parallel, JOB_WORKERS)),
+            "max_units": max_units,
+        }
+        return handler
+
+    return decorator
+
+
+class JobContext:
+    """
+    То, что видит обработчик задачи: прогресс, отмена, лимиты и параллельный map.
+    """
+
+    # Не пишем прогресс в базу чаще, чем раз в PROGRESS_INTERVAL секунд
+    PROGRESS_INTERVAL = 0.5
+
+    def __init__(self, job_id: int, limits: Dict[str, Any]):
+        self.job_id = job_id
+        self.limits = limits
+        self.cancel_event = threading.Event()
+        self.deadline = time.monotonic() + limits["max_seconds"]
+        self.total_units = 0
+        self.done_units = 0
+        self._last_flush = 0.0
+
+    def check(self) -> None:
+        """Прерывает задачу, если её отменили или вышло время."""
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+        if time.monotonic() > self.deadline:
+            raise JobLimitExceeded(
+                f"Превышен лимит времени задачи ({self.limits['max_seconds']} с)"
+            )
+
+    def set_total(self, total_units: int) -> None:
+        max_units = self.limits["max_units"]
+        if max_units is not None and total_units > max_units:
+            raise JobLimitExceeded(
+                f"Слишком большой объём работы: {total_units} > {max_units}"
+            )
+        self.total_units = total_units
+        self._flush(force=True)
+
+    def advance(self, units: int = 1) -> None:
+        self.done_units += units
+        self._flush()
+
+    def _flush(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last_flush < self.PROGRESS_INTERVAL:
+            return
+        self._last_flush = now
+        Jobs.update(
+            total_units=self.total_units,
+            done_units=self.done_units,
+            updated_at=datetime.datetime.now(),
+        ).where(Jobs.id == self.job_id).execute()
+        # Отмену могли запросить из другого воркера - она видна только через базу
+        cancel_requested = (
+            Jobs.select(Jobs.cancel_requested)
+            .where(Jobs.id == self.job_id)
+            .scalar()
+        )
+        if cancel_requested:
+            self.cancel_event.set()
+
+    def map(self, func: Callable[..., Any], items: Iterable[Any], *args) -> List[Any]:
+        """
+        Выполняет func(item, *args) для каждого элемента в общем пуле воркеров.
+
+        Одновременно выполняется не больше limits["max_parallel"] частей, после каждой
+        завершённой части обновляется прогресс и проверяется отмена. При отмене
+        ещё не начатые части снимаются с очереди.
+
+        Returns:
+            Результаты в порядке items
+        """
+        items = list(items)
+        results: List[Any] = [None] * len(items)
+        pending = {}
+        next_index = 0
+        try:
+            while next_index < len(items) or pending:
+                self.check()
+                while next_index < len(items) and len(pending) < self.limits["max_parallel"]:
+                    future = _get_workers().submit(_in_worker, func, items[next_index], *args)
+                    pending[future] = next_index
+                    next_index += 1
+
+                done, _ = wait(pending, timeout=1.0, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = pending.pop(future)
+                    results[index] = future.result()
+                    self.advance()
+        finally:
+            for future in pending:
+                future.cancel()
+        self._flush(force=True)
+        return results
+
+
+def _in_worker(func: Callable[..., Any], *args) -> Any:
+    try:
+        return func(*args)
+    finally:
+        # У потока пула своё соединение (peewee хранит его по потокам) - не держим его открытым
+        if not db.is_closed():
+            db.close()
+
+
+def _reset_after_fork() -> None:
+    # Потоки пулов не переживают fork: потомок создаст свои пулы при первой задаче
+    global _lock, _coordinators, _workers
+    _lock = threading.Lock()
+    _coordinators = None
+    _workers = None
+    _active.clear()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _get_coordinators() -> ThreadPoolExecutor:
+    global _coordinators
+    with _lock:
+        if _coordinators is None:
+            _coordinators = ThreadPoolExecutor(
+                max_workers=MAX_ACTIVE_JOBS, thread_name_prefix="job"
+            )
+        return _coordinators
+
+
+def _get_workers() -> ThreadPoolExecutor:
+    global _workers
+    with _lock:
+        if _workers is None:
+            _workers = ThreadPoolExecutor(
+                max_workers=JOB_WORKERS, thread_name_prefix="job-worker"
+            )
+        return _workers
+
+
+def _finish(job_id: int, status: str, **fields) -> None:
+    now = datetime.datetime.now()
+    Jobs.update(status=status, finished_at=now, updated_at=now, **fields).where(
+        Jobs.id == job_id
+    ).execute()
+
+
+def _run_job(job_id: int) -> None:
+    job = Jobs.get_or_none(Jobs.id == job_id)
+    if job is None or job.status != "queued":
+        return
+    if job.cancel_requested:
+        _finish(job_id, "cancelled")
+        return
+
+    limits = _job_types[job.job_type]
+    ctx = JobContext(job_id, limits)
+    with _lock:
+        _active[job_id] = ctx
+
+    now = datetime.datetime.now()
+    Jobs.update(
+        status="running", started_at=now, updated_at=now, worker_pid=os.getpid()
+    ).where(Jobs.id == job_id).execute()
+
+    try:
+        result_path = limits["handler"](ctx, json.loads(job.params or "{}"))
+        _finish(
+            job_id,
+            "done",
+            result_path=result_path,
+            done_units=ctx.done_units,
+            total_units=ctx.total_units,
+        )
+    except JobCancelled:
+        _finish(job_id, "cancelled", done_units=ctx.done_units)
+    except Exception as e:
+        print(f"Задача {job_id} ({job.job_type}) завершилась с ошибкой: {e}")
+        _finish(job_id, "failed", error=str(e), done_units=ctx.done_units)
+    finally:
+        with _lock:
+            _active.pop(job_id, None)
+        # Потоки пула живут долго, не держим соединение, пока они простаивают
+        if not db.is_closed():
+            db.close()
+
+
+def init_jobs() -> None:
+    """
+    Создаёт таблицу Jobs и разбирает задачи, чей процесс больше не существует:
+    выполнявшиеся помечаются упавшими, а стоявшие в очереди ставятся в очередь этого процесса.
+    """
+    db.create_tables([Jobs], safe=True)
+    # list(): не держим курсор чтения открытым, пока пишем в ту же таблицу
+    orphaned = list(
+        Jobs.select(Jobs.id, Jobs.job_type, Jobs.status, Jobs.worker_pid).where(
+            Jobs.status.in_(["queued", "running"])
+        )
+    )
+    for job in orphaned:
+        if job.worker_pid and _pid_alive(job.worker_pid):
+            continue
+        if job.status == "running":
+            _finish(job.id, "failed", error="Процесс воркера завершился во время выполнения")
+        elif job.job_type not in _job_types:
+            _finish(job.id, "failed", error=f"Неизвестный тип задачи: {job.job_type}")
+        elif _claim(job):
+            _get_coordinators().submit(_run_job, job.id)
+
+
+def _claim(job: Jobs) -> bool:
+    """Забирает задачу из очереди упавшего процесса. False - её уже забрал другой воркер."""
+    owner = Jobs.worker_pid.is_null() if job.worker_pid is None else Jobs.worker_pid == job.worker_pid
+    claimed = (
+        Jobs.update(worker_pid=os.getpid(), updated_at=datetime.datetime.now())
+        .where((Jobs.id == job.id) & (Jobs.status == "queued") & owner)
+        .execute()
+    )
+    return claimed == 1
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def enqueue_job(job_type_name: str, params: Dict[str, Any]) -> Jobs:
+    """
+    Сохраняет задачу в таблицу Jobs и ставит её в очередь пула.
+
+    Raises:
+        KeyError: Если тип задачи не зарегистрирован
+    """
+    if job_type_name not in _job_types:
+        raise KeyError(f"Неизвестный тип задачи: {job_type_name}")
+
+    # worker_pid у задачи в очереди - процесс, в пуле которого она стоит (см. init_jobs)
+    job = Jobs.create(
+        job_type=job_type_name,
+        params=json.dumps(params, default=str),
+        worker_pid=os.getpid(),
+    )
+    _get_coordinators().submit(_run_job, job.id)
+    return job
+
+
+def get_job(job_id: int) -> Jobs:
+    """
+    Возвращает задачу по ID.
+
+    Raises:
+        DoesNotExist: Если задача не найдена
+    """
+    return Jobs.get(Jobs.id == job_id)
+
+
+def cancel_job(job_id: int) -> Jobs:
+    """
+    Запрашивает отмену задачи. Выполняющаяся задача остановится после текущей части работы.
+
+    Raises:
+        DoesNotExist: Если задача не найдена
+    """
+    job = Jobs.get(Jobs.id == job_id)
+    if job.status in FINISHED_STATUSES:
+        return job
+
+    Jobs.update(cancel_requested=True, updated_at=datetime.datetime.now()).where(
+        Jobs.id == job_id
+    ).execute()
+    with _lock:
+        ctx = _active.get(job_id)
+    if ctx is not None:
+        ctx.cancel_event.set()
+    return Jobs.get(Jobs.id == job_id)
+
+
+def write_result(job_id: int, data: Any) -> str:
+    """
+    Сохраняет результат задачи в JSON файл в RESULTS_DIR и возвращает путь к нему.
+    """
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"job_{job_id}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, default=str, indent=2)
+    return path
@@ -0,0 +1,121 @@
+import datetime
+from flask_restx import Namespace, Resource, fields
+from peewee import DoesNotExist
+from http import HTTPStatus
+from auth import require_role
+from jobs import enqueue_job, get_job, cancel_job
+import reports  # noqa: F401 - регистрирует типы задач
+
+# Создаем экземпляр Namespace для фоновых задач
+jobs_bp = Namespace("jobs", description="Фоновые задачи (тяжёлые отчёты)")
+
+# Модель для ответа задачи
+job_model = jobs_bp.model(
+    "Job",
+    {
+        "id": fields.Integer(readonly=True, description="Уникальный идентификатор задачи"),
+        "job_type": fields.String(description="Тип задачи"),
+        "status": fields.String(
+            description="Статус: queued, running, done, failed, cancelled"
+        ),
+        "progress": fields.Float(description="Доля выполненной работы от 0 до 1"),
+        "done_units": fields.Integer(description="Выполнено частей задачи"),
+        "total_units": fields.Integer(description="Всего частей задачи"),
+        "cancel_requested": fields.Boolean(description="Запрошена отмена"),
+        "result_path": fields.String(description="Где лежит результат задачи"),
+        "error": fields.String(description="Текст ошибки для упавшей задачи"),
+        "created_at": fields.DateTime(dt_format="rfc822", description="Дата постановки в очередь"),
+        "started_at": fields.DateTime(dt_format="rfc822", description="Дата запуска"),
+        "finished_at": fields.DateTime(dt_format="rfc822", description="Дата завершения"),
+    },
+)
+
+# Модель для входных данных задачи генерации отзывов
+reviews_job_input_model = jobs_bp.model(
+    "StudentsReviewsJobInput",
+    {
+        "review_start_date": fields.Date(required=True, description="Начало периода (YYYY-MM-DD)"),
+        "review_end_date": fields.Date(required=True, description="Конец периода (YYYY-MM-DD)"),
+        "group_ids": fields.List(
+            fields.Integer, description="ID групп (по умолчанию - все группы)"
+        ),
+        "is_published": fields.Boolean(default=False, description="Сразу опубликовать отзывы"),
+    },
+)
+
+
+@jobs_bp.route("/reviews/")
+@jobs_bp.response(HTTPStatus.BAD_REQUEST, "Неверные параметры задачи")
+@jobs_bp.response(HTTPStatus.FORBIDDEN, "Доступ запрещен")
+class StudentsReviewsJobResource(Resource):
+    @jobs_bp.doc("enqueue_students_reviews")
+    @jobs_bp.expect(reviews_job_input_model)
+    @jobs_bp.marshal_with(job_model, code=HTTPStatus.ACCEPTED)
+    @require_role("admin", "moderator")
+    def post(self):
+        """Поставить в очередь генерацию отзывов по студентам за период"""
+        data = jobs_bp.payload or {}
+
+        try:
+            review_start_date = datetime.date.fromisoformat(data.get("review_start_date", ""))
+            review_end_date = datetime.date.fromisoformat(data.get("review_end_date", ""))
+        except (TypeError, ValueError):
+            jobs_bp.abort(HTTPStatus.BAD_REQUEST, "Даты периода обязательны в формате YYYY-MM-DD")
+
+        if review_end_date < review_start_date:
+            jobs_bp.abort(HTTPStatus.BAD_REQUEST, "Конец периода раньше начала")
+
+        # Без group_ids - все группы; если указаны, то непустым списком ID
+        group_ids = data.get("group_ids", [])
+        if "group_ids" in data and (
+            not isinstance(group_ids, list)
+            or not group_ids
+            or not all(isinstance(group_id, int) and not isinstance(group_id, bool) for group_id in group_ids)
+        ):
+            jobs_bp.abort(HTTPStatus.BAD_REQUEST, "group_ids должен быть непустым списком целых ID групп")
+        if len(group_ids) > reports.MAX_GROUPS_PER_JOB:
+            jobs_bp.abort(
+                HTTPStatus.BAD_REQUEST,
+                f"Не больше {reports.MAX_GROUPS_PER_JOB} групп за одну задачу",
+            )
+
+        job = enqueue_job(
+            "students_reviews",
+            {
+                "review_start_date": review_start_date.isoformat(),
+                "review_end_date": review_end_date.isoformat(),
+                "group_ids": group_ids,
+                "is_published": bool(data.get("is_published", False)),
+            },
+        )
+        return job, HTTPStatus.ACCEPTED
+
+
+@jobs_bp.route("/<int:job_id>")
+@jobs_bp.param("job_id", "Уникальный идентификатор задачи")
+@jobs_bp.response(HTTPStatus.NOT_FOUND, "Задача не найдена")
+class JobResource(Resource):
+    @jobs_bp.doc("get_job")
+    @jobs_bp.marshal_with(job_model)
+    def get(self, job_id):
+        """Получить статус и прогресс задачи"""
+        try:
+            return get_job(job_id)
+        except DoesNotExist:
+            jobs_bp.abort(HTTPStatus.NOT_FOUND, "Задача не найдена")
+
+
+@jobs_bp.route("/<int:job_id>/cancel")
+@jobs_bp.param("job_id", "Уникальный идентификатор задачи")
+@jobs_bp.response(HTTPStatus.NOT_FOUND, "Задача не найдена")
+@jobs_bp.response(HTTPStatus.FORBIDDEN, "Доступ запрещен")
+class JobCancelResource(Resource):
+    @jobs_bp.doc("cancel_job")
+    @jobs_bp.marshal_with(job_model)
+    @require_role("admin", "moderator")
+    def post(self, job_id):
+        """Отменить задачу"""
+        try:
+            return cancel_job(job_id)
+        except DoesNotExist:
+            jobs_bp.abort(HTTPStatus.NOT_FOUND, "Задача не найдена")
@@ -0,0 +1,161 @@
+import datetime
+from flask import request, make_response
+from flask_restx import Namespace, Resource, fields
+from peewee import DoesNotExist
+from utils import get_lessons_schedule, get_group_by_id
+from timetable import get_week, get_weeks, build_calendar
+from http import HTTPStatus
+
+# Создаем экземпляр Namespace для занятий
+lessons_bp = Namespace("lesson", description="Расписание онлайн занятий")
+
+# Самый длинный период, который можно запросить одним запросом
+MAX_SCHEDULE_DAYS = 366
+# Сколько недель попадает в iCalendar ленту по умолчанию и максимум
+DEFAULT_WEEKS_BACK = 4
+DEFAULT_WEEKS_AHEAD = 12
+MAX_CALENDAR_WEEKS = 60
+
+# Модель для ответа занятия
+lesson_model = lessons_bp.model(
+    "Lesson",
+    {
+        "id": fields.Integer(readonly=True, description="Уникальный идентификатор занятия"),
+        "group_id": fields.Integer(attribute=lambda lesson: _group_id(lesson), description="ID группы"),
+        "group_name": fields.String(attribute="group_id.group_name", description="Название группы"),
+        "lesson_date": fields.Date(description="Дата занятия"),
+        "lesson_time": fields.String(description="Время начала занятия"),
+        "academic_hours": fields.Integer(description="Длительность в академических часах"),
+        "lesson_theme": fields.String(description="Тема занятия"),
+        "telegram_record_link": fields.String(description="Ссылка на запись занятия"),
+    },
+)
+
+# Модель для недельного расписания группы
+timetable_model = lessons_bp.model(
+    "WeekTimetable",
+    {
+        "group_id": fields.Integer(description="ID группы"),
+        "week_start": fields.Date(description="Понедельник недели"),
+        "version": fields.Integer(description="Версия расписания недели"),
+        "lessons": fields.List(fields.Nested(lesson_model, skip_none=True)),
+    },
+)
+
+
+def _group_id(lesson):
+    # В кэше расписания занятия хранятся словарями, у моделей берём сырое значение внешнего ключа
+    if isinstance(lesson, dict):
+        return lesson["group_id"]
+    return lesson.__data__.get("group_id")
+
+
+def _parse_date(name: str, default: datetime.date = None) -> datetime.date:
+    value = request.args.get(name)
+    if not value:
+        if default is None:
+            lessons_bp.abort(HTTPStatus.BAD_REQUEST, f"Параметр {name} обязателен (YYYY-MM-DD)")
+        return default
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        lessons_bp.abort(HTTPStatus.BAD_REQUEST, f"Неверная дата в параметре {name}")
+
+
+def _parse_int(name: str, default: int = None) -> int:
+    value = request.args.get(name)
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        lessons_bp.abort(HTTPStatus.BAD_REQUEST, f"Параметр {name} должен быть целым числом")
+
+
+def _include_archived() -> bool:
+    return request.args.get("include_archived", "0") in ("1", "true")
+
+
+def _conditional(response, etag: str):
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+
+@lessons_bp.route("/schedule")
+@lessons_bp.param("from", "Начало периода (YYYY-MM-DD)")
+@lessons_bp.param("to", "Конец периода (YYYY-MM-DD)")
+@lessons_bp.param("group_id", "ID группы (опционально)")
+@lessons_bp.param("include_archived", "Добавить занятия из архивов прошлых учебных лет (1/0)", default="0")
+@lessons_bp.response(HTTPStatus.BAD_REQUEST, "Неверный период")
+class LessonScheduleResource(Resource):
+    @lessons_bp.doc("lesson_schedule")
+    @lessons_bp.marshal_list_with(lesson_model)
+    def get(self):
+        """Получить занятия за период"""
+        date_from = _parse_date("from")
+        date_to = _parse_date("to")
+        group_id = _parse_int("group_id")
+        include_archived = _include_archived()
+
+        if date_to < date_from:
+            lessons_bp.abort(HTTPStatus.BAD_REQUEST, "Конец периода раньше начала")
+        if (date_to - date_from).days > MAX_SCHEDULE_DAYS:
+            lessons_bp.abort(
+                HTTPStatus.BAD_REQUEST, f"Период не может быть длиннее {MAX_SCHEDULE_DAYS} дней"
+            )
+
+        return get_lessons_schedule(date_from, date_to, group_id, include_archived)
+
+
+@lessons_bp.route("/timetable/<int:group_id>")
+@lessons_bp.param("group_id", "Уникальный идентификатор группы")
+@lessons_bp.param("week", "Любая дата недели (YYYY-MM-DD), по умолчанию - текущая неделя")
+@lessons_bp.param("include_archived", "Добавить занятия из архива учебного года недели (1/0)", default="0")
+@lessons_bp.response(HTTPStatus.NOT_FOUND, "Группа не найдена")
+@lessons_bp.response(HTTPStatus.NOT_MODIFIED, "Расписание не изменилось")
+class WeekTimetableResource(Resource):
+    @lessons_bp.doc("week_timetable")
+    @lessons_bp.response(HTTPStatus.OK, "Расписание группы на неделю", timetable_model)
+    def get(self, group_id):
+        """Получить расписание группы на неделю (из кэша)"""
+        try:
+            get_group_by_id(group_id)
+        except DoesNotExist:
+            lessons_bp.abort(HTTPStatus.NOT_FOUND, "Группа не найдена")
+
+        week = get_week(group_id, _parse_date("week", datetime.date.today()), _include_archived())
+        response = make_response(lessons_bp.marshal(week._asdict(), timetable_model))
+        return _conditional(response, week.etag)
+
+
+@lessons_bp.route("/<int:group_id>/calendar.ics")
+@lessons_bp.param("group_id", "Уникальный идентификатор группы")
+@lessons_bp.param("weeks_back", f"Сколько прошедших недель включить (по умолчанию {DEFAULT_WEEKS_BACK})")
+@lessons_bp.param("weeks_ahead", f"Сколько будущих недель включить (по умолчанию {DEFAULT_WEEKS_AHEAD})")
+@lessons_bp.param("include_archived", "Добавить занятия из архивов прошлых учебных лет (1/0)", default="0")
+@lessons_bp.response(HTTPStatus.NOT_FOUND, "Группа не найдена")
+@lessons_bp.response(HTTPStatus.NOT_MODIFIED, "Календарь не изменился")
+class GroupCalendarResource(Resource):
+    @lessons_bp.doc("group_calendar")
+    @lessons_bp.produces(["text/calendar"])
+    def get(self, group_id):
+        """Получить iCalendar ленту занятий группы"""
+        try:
+            group = get_group_by_id(group_id)
+        except DoesNotExist:
+            lessons_bp.abort(HTTPStatus.NOT_FOUND, "Группа не найдена")
+
+        weeks_back = _parse_int("weeks_back", DEFAULT_WEEKS_BACK)
+        weeks_ahead = _parse_int("weeks_ahead", DEFAULT_WEEKS_AHEAD)
+        if weeks_back < 0 or weeks_ahead < 0 or weeks_back + weeks_ahead > MAX_CALENDAR_WEEKS:
+            lessons_bp.abort(
+                HTTPStatus.BAD_REQUEST, f"Не больше {MAX_CALENDAR_WEEKS} недель в календаре"
+            )
+
+        calendar, etag = build_calendar(
+            group.group_name, get_weeks(group_id, weeks_back, weeks_ahead, include_archived=_include_archived())
+        )
+        response = make_response(calendar)
+        response.mimetype = "text/calendar"
+        return _conditional(response, etag)
@@ -0,0 +1,521 @@
+"""
+Модуль metrics.py
+
+Метрики приложения в текстовом формате Prometheus (эндпоинт /metrics).
+
+Что собирается:
+    - academy_http_requests_total{method, route, status} и гистограмма длительности
+      academy_http_request_duration_seconds{method, route} по каждому ресурсу flask_restx;
+    - academy_http_requests_in_flight - запросы, которые обрабатываются прямо сейчас;
+    - academy_db_query_duration_seconds{statement} - количество и длительность SQL запросов;
+    - academy_db_connect_duration_seconds - ожидание открытия соединения с SQLite;
+    - academy_cache_requests_total{cache, result} и academy_cache_hit_ratio{cache} - кэши приложения;
+    - academy_sqlite_* - размер базы и WAL, страничный кэш (PRAGMA cache_spill, cache_size и т.д.).
+
+Несколько воркеров: если задана переменная окружения ACADEMY_METRICS_DIR, каждый процесс
+раз в FLUSH_INTERVAL секунд сохраняет свой снимок в ACADEMY_METRICS_DIR/metrics_<pid>_<старт>.json
+(время старта в имени - чтобы процесс с повторно выданным pid не затёр снимок умершего),
+а /metrics в любом воркере суммирует снимки всех процессов. Счётчики и гистограммы
+завершившихся процессов переносятся в metrics_retired.json, а их снимки удаляются: итоговые
+значения не уменьшаются, а каталог не растёт. In-flight учитывается только у живых процессов.
+Очистка каталога при перезапуске сервиса сбрасывает счётчики.
+"""
+
+import fcntl
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from flask import Response, g, request
+
+METRICS_DIR = os.environ.get("ACADEMY_METRICS_DIR")
+FLUSH_INTERVAL = float(os.environ.get("ACADEMY_METRICS_FLUSH_INTERVAL", 1.0))
+
+# Границы корзин гистограмм в секундах
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+HELP = {
+    "academy_http_requests_total": ("counter", "Количество HTTP запросов"),
+    "academy_http_request_duration_seconds": ("histogram", "Длительность обработки HTTP запроса"),
+    "academy_http_requests_in_flight": ("gauge", "HTTP запросы в обработке"),
+    "academy_db_query_duration_seconds": ("histogram", "Длительность SQL запросов"),
+    "academy_db_connect_duration_seconds": ("histogram", "Время открытия соединения с базой"),
+    "academy_cache_requests_total": ("counter", "Обращения к кэшам приложения"),
+    "academy_cache_hit_ratio": ("gauge", "Доля попаданий в кэш"),
+    "academy_http_compression_bytes_total": ("counter", "Байты ответов до сжатия (raw) и после (sent)"),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_lock = threading.Lock()
+# name -> labels -> значение
+_counters: Dict[str, Dict[Labels, float]] = {}
+_gauges: Dict[str, Dict[Labels, float]] = {}
+# name -> labels -> [счётчики корзин..., сумма, количество]
+_histograms: Dict[str, Dict[Labels, List[float]]] = {}
+_buckets: Dict[str, Tuple[float, ...]] = {}
+# Сборщики кэшей: имя кэша -> функция, возвращающая словарь {"hits": ..., "misses": ...}
+_cache_collectors: Dict[str, Callable[[], Dict[str, int]]] = {}
+_database = None
+_flusher: Optional[threading.Thread] = None
+_flusher_pid: Optional[int] = None
+# (pid, время старта) процесса, которому принадлежит файл снимка
+_process: Tuple[Optional[int], float] = (None, 0.0)
+
+RETIRED_FILE = "metrics_retired.json"
+LOCK_FILE = "metrics.lock"
+
+
+def _labels(**labels) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def inc(name: str, value: float = 1, **labels) -> None:
+    """Увеличивает счётчик."""
+    key = _labels(**labels)
+    with _lock:
+        series = _counters.setdefault(name, {})
+        series[key] = series.get(key, 0) + value
+    _ensure_flusher()
+
+
+def gauge_add(name: str, value: float, **labels) -> None:
+    """Изменяет значение gauge на value (может быть отрицательным)."""
+    key = _labels(**labels)
+    with _lock:
+        series = _gauges.setdefault(name, {})
+        series[key] = series.get(key, 0) + value
+
+
+def observe(name: str, value: float, buckets: Tuple[float, ...] = HTTP_BUCKETS, **labels) -> None:
+    """Добавляет наблюдение в гистограмму."""
+    key = _labels(**labels)
+    with _lock:
+        _buckets.setdefault(name, buckets)
+        series = _histograms.setdefault(name, {})
+        data = series.get(key)
+        if data is None:
+            data = series[key] = [0.0] * (len(buckets) + 2)
+        for index, bound in enumerate(buckets):
+            if value <= bound:
+                data[index] += 1
+                break
+        data[-2] += value
+        data[-1] += 1
+    _ensure_flusher()
+
+
+def register_cache(name: str, stats_getter: Callable[[], Dict[str, int]]) -> None:
+    """
+    Регистрирует кэш, у которого есть счётчики попаданий/промахов.
+
+    stats_getter возвращает словарь с ключами hits и misses (накопленные значения процесса).
+    """
+    _cache_collectors[name] = stats_getter
+
+
+# ========== СНИМКИ И МНОГОПРОЦЕССНЫЙ РЕЖИМ ==========
+
+
+def _encode(series: Dict[str, Dict[Labels, object]]) -> Dict[str, list]:
+    return {
+        name: [[list(map(list, labels)), value] for labels, value in values.items()]
+        for name, values in series.items()
+    }
+
+
+def _snapshot() -> dict:
+    with _lock:
+        counters = {name: dict(values) for name, values in _counters.items()}
+        snapshot = {
+            "pid": os.getpid(),
+            "started": _process_started(),
+            "gauges": _encode(_gauges),
+            "histograms": _encode({n: {k: list(v) for k, v in s.items()} for n, s in _histograms.items()}),
+            "buckets": {name: list(bounds) for name, bounds in _buckets.items()},
+        }
+    caches = counters.setdefault("academy_cache_requests_total", {})
+    for cache_name, getter in _cache_collectors.items():
+        stats = getter()
+        for stats_key, result in (("hits", "hit"), ("misses", "miss")):
+            caches[_labels(cache=cache_name, result=result)] = stats.get(stats_key, 0)
+    snapshot["counters"] = _encode(counters)
+    return snapshot
+
+
+def _process_started() -> float:
+    """Время старта процесса (после fork - время первого обращения в потомке)."""
+    global _process
+    if _process[0] != os.getpid():
+        _process = (os.getpid(), time.time())
+    return _process[1]
+
+
+def _write_json(path: str, data: dict) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: str) -> Optional[dict]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        # Файл могли заменить прямо во время чтения - возьмём его в следующий раз
+        return None
+
+
+def _flush() -> None:
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    started = _process_started()
+    _write_json(os.path.join(METRICS_DIR, f"metrics_{os.getpid()}_{int(started * 1000)}.json"), _snapshot())
+
+
+def _flush_loop() -> None:
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        if METRICS_DIR is None:
+            return
+        try:
+            _flush()
+        except OSError as e:
+            print(f"Не удалось сохранить метрики: {e}")
+
+
+def _ensure_flusher() -> None:
+    """Запускает поток сохранения снимков (заново - в процессе, появившемся через fork)."""
+    global _flusher, _flusher_pid
+    if METRICS_DIR is None or _flusher_pid == os.getpid():
+        return
+    with _lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+        _flusher = threading.Thread(target=_flush_loop, name="metrics-flush", daemon=True)
+        _flusher.start()
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _load_snapshots() -> List[dict]:
+    """Снимки для суммирования; у каждого ключ alive - жив ли процесс, которому он принадлежит."""
+    if METRICS_DIR is None:
+        return [dict(_snapshot(), alive=True)]
+
+    _flush()
+    # Перенос снимков умерших процессов - под блокировкой, чтобы воркеры не сделали его дважды
+    with open(os.path.join(METRICS_DIR, LOCK_FILE), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            return _collect_snapshots()
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _collect_snapshots() -> List[dict]:
+    files: Dict[str, dict] = {}
+    for file_name in os.listdir(METRICS_DIR):
+        if file_name == RETIRED_FILE or not (file_name.startswith("metrics_") and file_name.endswith(".json")):
+            continue
+        snapshot = _read_json(os.path.join(METRICS_DIR, file_name))
+        if snapshot is not None:
+            files[file_name] = snapshot
+
+    retired_path = os.path.join(METRICS_DIR, RETIRED_FILE)
+    retired = _read_json(retired_path) or {"counters": {}, "histograms": {}, "buckets": {}, "absorbed": []}
+    # Снимки, уже перенесённые в retired, но не удалённые (например, упали между записью и удалением)
+    absorbed = set(retired.get("absorbed", [])) & set(files)
+
+    # У одного pid живым может быть только самый свежий снимок: более старые - от умерших процессов
+    newest: Dict[int, float] = {}
+    for snapshot in files.values():
+        newest[snapshot["pid"]] = max(newest.get(snapshot["pid"], 0.0), snapshot.get("started", 0.0))
+
+    live, dead = [], []
+    for file_name, snapshot in files.items():
+        if file_name in absorbed:
+            dead.append(file_name)
+            continue
+        pid = snapshot["pid"]
+        snapshot["alive"] = snapshot.get("started", 0.0) == newest[pid] and (pid == os.getpid() or _pid_alive(pid))
+        if snapshot["alive"]:
+            live.append(snapshot)
+        else:
+            dead.append(file_name)
+            absorbed.add(file_name)
+            counters, _, histograms, buckets = _merge([dict(retired, alive=False), snapshot])
+            retired = {
+                "counters": _encode(counters),
+                "histograms": _encode(histograms),
+                "buckets": {name: list(bounds) for name, bounds in buckets.items()},
+                "absorbed": [],
+            }
+
+    if dead:
+        retired["absorbed"] = sorted(absorbed)
+        _write_json(retired_path, retired)
+        for file_name in dead:
+            try:
+                os.remove(os.path.join(METRICS_DIR, file_name))
+            except OSError:
+                pass
+    return [dict(retired, alive=False)] + live
+
+
+def _merge(snapshots: List[dict]):
+    counters: Dict[str, Dict[Labels, float]] = {}
+    gauges: Dict[str, Dict[Labels, float]] = {}
+    histograms: Dict[str, Dict[Labels, List[float]]] = {}
+    buckets: Dict[str, Tuple[float, ...]] = {}
+
+    for snapshot in snapshots:
+        for name, values in snapshot["counters"].items():
+            series = counters.setdefault(name, {})
+            for labels, value in values:
+                key = tuple(map(tuple, labels))
+                series[key] = series.get(key, 0) + value
+        if snapshot["alive"]:
+            for name, values in snapshot["gauges"].items():
+                series = gauges.setdefault(name, {})
+                for labels, value in values:
+                    key = tuple(map(tuple, labels))
+                    series[key] = series.get(key, 0) + value
+        for name, bounds in snapshot["buckets"].items():
+            buckets[name] = tuple(bounds)
+        for name, values in snapshot["histograms"].items():
+            series = histograms.setdefault(name, {})
+            for labels, data in values:
+                key = tuple(map(tuple, labels))
+                if key in series:
+                    series[key] = [a + b for a, b in zip(series[key], data)]
+                else:
+                    series[key] = list(data)
+    return counters, gauges, histograms, buckets
+
+
+# ========== ФОРМАТ PROMETHEUS ==========
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    items = tuple(labels) + extra
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in items) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+def _header(lines: List[str], name: str, metric_type: str = None, help_text: str = None) -> None:
+    default_type, default_help = HELP.get(name, ("gauge", name))
+    lines.append(f"# HELP {name} {help_text or default_help}")
+    lines.append(f"# TYPE {name} {metric_type or default_type}")
+
+
+def _sqlite_metrics(lines: List[str]) -> None:
+    if _database is None:
+        return
+    pragmas = {
+        "page_count": "Количество страниц в файле базы",
+        "page_size": "Размер страницы в байтах",
+        "freelist_count": "Свободные страницы в файле базы",
+        "cache_size": "Размер страничного кэша соединения (PRAGMA cache_size)",
+        "cache_spill": "Порог сброса страничного кэша на диск (PRAGMA cache_spill)",
+    }
+    for pragma, help_text in pragmas.items():
+        try:
+            value = _database.execute_sql(f"PRAGMA {pragma}").fetchone()[0]
+        except Exception as e:
+            print(f"Не удалось прочитать PRAGMA {pragma}: {e}")
+            continue
+        name = f"academy_sqlite_{pragma}"
+        _header(lines, name, "gauge", help_text)
+        lines.append(f"{name} {_format_value(value)}")
+
+    path = _database.database
+    for suffix, name, help_text in (
+        ("", "academy_sqlite_file_size_bytes", "Размер файла базы"),
+        ("-wal", "academy_sqlite_wal_size_bytes", "Размер WAL файла"),
+    ):
+        try:
+            size = os.path.getsize(path + suffix)
+        except OSError:
+            size = 0
+        _header(lines, name, "gauge", help_text)
+        lines.append(f"{name} {size}")
+
+
+def render() -> str:
+    """Все метрики в текстовом формате Prometheus 0.0.4."""
+    counters, gauges, histograms, buckets = _merge(_load_snapshots())
+    lines: List[str] = []
+
+    for name, series in sorted(counters.items()):
+        _header(lines, name)
+        for labels, value in sorted(series.items()):
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+    caches = counters.get("academy_cache_requests_total", {})
+    if caches:
+        _header(lines, "academy_cache_hit_ratio")
+        for cache_name in sorted({dict(labels)["cache"] for labels in caches}):
+            hits = caches.get(_labels(cache=cache_name, result="hit"), 0)
+            misses = caches.get(_labels(cache=cache_name, result="miss"), 0)
+            ratio = hits / (hits + misses) if hits + misses else 0
+            lines.append(f'academy_cache_hit_ratio{{cache="{_escape(cache_name)}"}} {_format_value(ratio)}')
+
+    gauges.setdefault("academy_http_requests_in_flight", {}).setdefault((), 0)
+    for name, series in sorted(gauges.items()):
+        _header(lines, name)
+        for labels, value in sorted(series.items()):
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+    for name, series in sorted(histograms.items()):
+        _header(lines, name)
+        bounds = buckets[name]
+        for labels, data in sorted(series.items()):
+            cumulative = 0.0
+            for bound, count in zip(bounds, data):
+                cumulative += count
+                le = (("le", _format_value(bound)),)
+                lines.append(f"{name}_bucket{_format_labels(labels, le)} {_format_value(cumulative)}")
+            lines.append(f"{name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {_format_value(data[-1])}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {repr(data[-2])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {_format_value(data[-1])}")
+
+    _sqlite_metrics(lines)
+    return "\n".join(lines) + "\n"
+
+
+# ========== ПОДКЛЮЧЕНИЕ К ПРИЛОЖЕНИЮ И БАЗЕ ==========
+
+
+def _statement_type(sql: str) -> str:
+    keyword = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ""
+    if keyword in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "PRAGMA"):
+        return keyword.lower()
+    return "other"
+
+
+def instrument_database(database) -> None:
+    """Оборачивает execute_sql и connect базы peewee, чтобы считать запросы и соединения."""
+    global _database
+    if getattr(database, "_metrics_installed", False):
+        _database = database
+        return
+    _database = database
+    execute_sql = database.execute_sql
+    connect = database.connect
+
+    def instrumented_execute_sql(sql, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return execute_sql(sql, *args, **kwargs)
+        finally:
+            observe(
+                "academy_db_query_duration_seconds",
+                time.perf_counter() - started,
+                DB_BUCKETS,
+                statement=_statement_type(sql),
+            )
+
+    def instrumented_connect(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return connect(*args, **kwargs)
+        finally:
+            observe("academy_db_connect_duration_seconds", time.perf_counter() - started, DB_BUCKETS)
+
+    database.execute_sql = instrumented_execute_sql
+    database.connect = instrumented_connect
+    database._metrics_installed = True
+
+
+def _route() -> str:
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+
+def call_when_sent(response: Response, callback: Callable[[], None]) -> Callable[[], None]:
+    """
+    Вызывает callback, когда ответ отдан: WSGI сервер закрывает ответ после тела.
+    teardown для этого не годится - у потокового ответа (stream_with_context) первый
+    teardown выполняется до того, как сгенерировано тело.
+
+    Файлы (direct_passthrough) werkzeug отдаёт без ClosingIterator, и call_on_close у них
+    не срабатывает: для них возвращённую функцию нужно вызвать в teardown.
+    Вызывается callback в любом случае один раз.
+    """
+    called = []
+
+    def once():
+        if not called:
+            called.append(True)
+            callback()
+
+    response.call_on_close(once)
+    return once
+
+
+def _before_request():
+    g.metrics_started = time.perf_counter()
+    g.metrics_in_flight = True
+    gauge_add("academy_http_requests_in_flight", 1)
+
+
+def _finish(method: str, route: str, status: int, started: float) -> None:
+    inc("academy_http_requests_total", method=method, route=route, status=status)
+    observe("academy_http_request_duration_seconds", time.perf_counter() - started, method=method, route=route)
+    gauge_add("academy_http_requests_in_flight", -1)
+
+
+def _after_request(response):
+    if not g.pop("metrics_in_flight", False):
+        return response
+    # Запрос выполняется, пока не отдано всё тело (см. call_when_sent)
+    method, route, started = request.method, _route(), g.metrics_started
+    status = response.status_code
+    g.metrics_sent = (response, call_when_sent(response, lambda: _finish(method, route, status, started)))
+    return response
+
+
+def _teardown_request(exc):
+    # Если ответ так и не сформировался (after_request не дошёл до нас), считаем запрос упавшим
+    if g.pop("metrics_in_flight", False):
+        _finish(request.method, _route(), 500, g.metrics_started)
+        return
+    response, finish = g.pop("metrics_sent", (None, None))
+    if response is not None and response.direct_passthrough:
+        finish()
+
+
+def metrics_view():
+    return Response(render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+
+def init_app(app, database) -> None:
+    """Подключает сбор метрик к приложению и базе и регистрирует /metrics."""
+    instrument_database(database)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.add_url_rule("/metrics", "metrics", metrics_view)
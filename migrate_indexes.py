@@ -0,0 +1,135 @@
+"""
+Модуль migrate_indexes.py
+
+Строит на существующей базе индексы, объявленные в Meta моделей (models.py), и удаляет
+индексы, которые ими заменены (REPLACED_INDEXES). Новая база получает индексы сразу
+из create_tables, миграция нужна для уже работающей.
+
+SQLite строит индекс под блокировкой записи и по частям этого делать не умеет, поэтому
+миграция старается, чтобы блокировка была короткой и писатели приложения ждали меньше:
+
+    - индексы строятся по одному, каждый в своей транзакции, а не все разом;
+    - перед транзакцией нужные колонки таблицы прочитываются без блокировки - под
+      блокировкой страницы уже в кэше, остаётся в основном сортировка;
+    - сортировка в памяти (temp_store = MEMORY и увеличенный cache_size на время миграции);
+    - транзакция BEGIN IMMEDIATE с повторами (admission.retry_on_locked): если база занята,
+      миграция ждёт свободного окна, а не становится в очередь перед писателями;
+    - между индексами пауза --pause секунд, в которую проходят накопившиеся записи.
+
+    python migrate_indexes.py [--dry-run] [--pause 0.5]
+
+Повторный запуск ничего не делает. По окончании полезно прогнать query_plans.py.
+"""
+
+import argparse
+import time
+from typing import Dict, List, Tuple
+
+from peewee import ModelIndex
+from admission import retry_on_locked
+from models import db, MODELS, Jobs
+
+# Удаляемый индекс -> индекс, который его заменяет (удаляется только если замена уже есть)
+REPLACED_INDEXES = {
+    "onlinelessons_lesson_date": "onlinelessons_lesson_date_lesson_time",
+    "onlinelessons_group_id_lesson_date": "onlinelessons_group_id_lesson_date_lesson_time",
+    # Сортировка внутри группы по имени и дате - без своих индексов (см. models.Students)
+    "students_group_id_first_name": "students_group_id",
+    "students_group_id_created_at": "students_group_id",
+}
+
+DEFAULT_PAUSE = 0.5
+# Страничный кэш на время миграции, КиБ (отрицательное значение в PRAGMA cache_size)
+CACHE_SIZE_KIB = 256 * 1024
+
+
+def _existing_indexes() -> set:
+    return {row[0] for row in db.execute_sql("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+
+def pending_indexes() -> List[ModelIndex]:
+    """Объявленные в моделях индексы, которых ещё нет в базе."""
+    existing = _existing_indexes()
+    tables = set(db.get_tables())
+    pending = []
+    for model in MODELS + [Jobs]:
+        if model._meta.table_name not in tables:
+            continue
+        pending.extend(index for index in model._meta.fields_to_index() if index._name not in existing)
+    # Одинаковые имена бывают у индекса внешнего ключа и такого же индекса из Meta
+    return list({index._name: index for index in pending}.values())
+
+
+def _warm(index: ModelIndex) -> None:
+    """Читает колонки индекса без блокировки записи, чтобы прогреть кэш перед построением."""
+    for _ in index._model.select(*index._expressions).tuples().iterator():
+        pass
+
+
+@retry_on_locked(attempts=20, base_delay=0.1, max_delay=2.0)
+def _build(index: ModelIndex) -> float:
+    """Строит индекс в отдельной транзакции. Возвращает, сколько секунд держалась блокировка."""
+    with db.atomic("IMMEDIATE"):
+        started = time.perf_counter()
+        db.execute(index._model._schema._create_index(index, safe=True))
+        return time.perf_counter() - started
+
+
+@retry_on_locked(attempts=20, base_delay=0.1, max_delay=2.0)
+def _drop(name: str) -> None:
+    db.execute_sql(f'DROP INDEX IF EXISTS "{name}"')
+
+
+def migrate(pause: float = DEFAULT_PAUSE, dry_run: bool = False) -> Dict[str, Tuple[str, float]]:
+    """
+    Строит недостающие индексы и удаляет заменённые.
+
+    Returns:
+        Имя индекса -> ("created" или "dropped", секунд под блокировкой записи)
+    """
+    report: Dict[str, Tuple[str, float]] = {}
+    pending = pending_indexes()
+    replaced = [
+        name for name, replacement in REPLACED_INDEXES.items()
+        if name in _existing_indexes()
+        and (replacement in _existing_indexes() or replacement in {index._name for index in pending})
+    ]
+    if dry_run:
+        report.update({index._name: ("created", 0.0) for index in pending})
+        report.update({name: ("dropped", 0.0) for name in replaced})
+        return report
+
+    db.execute_sql("PRAGMA temp_store = MEMORY")
+    cache_size = db.execute_sql("PRAGMA cache_size").fetchone()[0]
+    db.execute_sql(f"PRAGMA cache_size = {-CACHE_SIZE_KIB}")
+    try:
+        for number, index in enumerate(pending):
+            if number:
+                time.sleep(pause)
+            _warm(index)
+            report[index._name] = ("created", _build(index))
+
+        for name in replaced:
+            started = time.perf_counter()
+            _drop(name)
+            report[name] = ("dropped", time.perf_counter() - started)
+    finally:
+        db.execute_sql(f"PRAGMA cache_size = {cache_size}")
+        db.execute_sql("PRAGMA temp_store = DEFAULT")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Построение индексов из models.py на существующей базе")
+    parser.add_argument("--dry-run", action="store_true", help="Только показать, что будет сделано")
+    parser.add_argument("--pause", type=float, default=DEFAULT_PAUSE, help="Пауза между индексами, с")
+    args = parser.parse_args()
+
+    report = migrate(args.pause, args.dry_run)
+    for name, (action, locked) in report.items():
+        if args.dry_run:
+            print(f"{name}: будет {'создан' if action == 'created' else 'удалён'}")
+        else:
+            print(f"{name}: {'создан' if action == 'created' else 'удалён'}, блокировка записи {locked * 1000:.1f} мс")
+    if not report:
+        print("Все индексы из моделей уже есть")
@@ -0,0 +1,143 @@
+"""
+Модуль migrate_storage.py
+
+Переводит существующую базу в режим хранения, выбранный ACADEMY_COMPACT_STORAGE
+(см. db_fields.py): статусы - строки <-> коды, даты-время - текст <-> микросекунды от 1970.
+
+    ACADEMY_COMPACT_STORAGE=1 python migrate_storage.py   # в компактный режим
+    python migrate_storage.py                             # обратно в текстовый
+
+Текущий вид колонки определяется по объявленному типу в схеме таблицы, поэтому
+повторный запуск ничего не делает. Таблица перестраивается целиком (SQLite не умеет
+менять тип колонки): старая переименовывается, создаётся новая по модели, данные
+копируются одним INSERT ... SELECT с преобразованием в SQL, старая удаляется.
+Каждая таблица - отдельная транзакция. Приложение на время миграции лучше остановить.
+"""
+
+import sys
+from typing import Dict, List
+
+from peewee import DateTimeField, Field
+from db_fields import EpochDateTimeField, is_compact, enum_values
+from models import db, MODELS
+import counters
+import timetable
+
+_COMPACT_TYPES = ("INT", "BIGINT", "SMALLINT", "INTEGER")
+
+
+def _declared_types(table: str) -> Dict[str, str]:
+    return {row[1]: row[2].upper() for row in db.execute_sql(f'PRAGMA table_info("{table}")')}
+
+
+def _convertible(field: Field) -> bool:
+    # Поля статусов (CharField с choices или EnumCodeField) и даты-время
+    return isinstance(field, (EpochDateTimeField, DateTimeField)) or bool(field.choices)
+
+
+def _conversion(field: Field, stored_compact: bool) -> str:
+    """SQL выражение, переводящее колонку из текущего вида в вид модели."""
+    column = f'"{field.column_name}"'
+    if field.choices:
+        pairs = list(enumerate(enum_values(field)))
+        if stored_compact:
+            whens = " ".join(f"WHEN {code} THEN '{value}'" for code, value in pairs)
+        else:
+            whens = " ".join(f"WHEN '{value}' THEN {code}" for code, value in pairs)
+        return f"CASE {column} {whens} END"
+
+    if stored_compact:
+        # Микросекунды -> 'YYYY-MM-DD HH:MM:SS[.ffffff]' (как str(datetime))
+        return (
+            f"CASE WHEN {column} IS NULL THEN NULL ELSE "
+            f"strftime('%Y-%m-%d %H:%M:%S', {column} / 1000000, 'unixepoch') || "
+            f"CASE WHEN {column} % 1000000 THEN printf('.%06d', {column} % 1000000) ELSE '' END END"
+        )
+    # Текст -> микросекунды: секунды через strftime('%s'), дробная часть - из хвоста строки
+    return (
+        f"CASE WHEN {column} IS NULL THEN NULL ELSE "
+        f"CAST(strftime('%s', substr({column}, 1, 19)) AS INTEGER) * 1000000 + "
+        f"CAST(substr({column} || '.000000', 21, 6) AS INTEGER) END"
+    )
+
+
+def _pending_columns(model) -> List[Field]:
+    declared = _declared_types(model._meta.table_name)
+    pending = []
+    for field in model._meta.sorted_fields:
+        if not _convertible(field) or field.column_name not in declared:
+            continue
+        stored_compact = declared[field.column_name].startswith(_COMPACT_TYPES)
+        if stored_compact != is_compact(field):
+            pending.append(field)
+    return pending
+
+
+def _rebuild(model, fields: List[Field]) -> int:
+    table = model._meta.table_name
+    old = f"{table}__old"
+    declared = _declared_types(table)
+    columns = [field.column_name for field in model._meta.sorted_fields if field.column_name in declared]
+    # Сравнение полей peewee через == строит выражение, поэтому сверяем по именам
+    converted = {field.name for field in fields}
+    select = [
+        _conversion(field, declared[field.column_name].startswith(_COMPACT_TYPES)) if field.name in converted
+        else f'"{field.column_name}"'
+        for field in model._meta.sorted_fields
+        if field.column_name in declared
+    ]
+
+    with db.atomic():
+        db.execute_sql(f'ALTER TABLE "{table}" RENAME TO "{old}"')
+        # Индексы старой таблицы сохранили имена - убираем, иначе новые не создадутся
+        for (name,) in db.execute_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (old,)
+        ).fetchall():
+            db.execute_sql(f'DROP INDEX "{name}"')
+        db.create_tables([model])
+        column_list = ", ".join(f'"{column}"' for column in columns)
+        cursor = db.execute_sql(
+            f'INSERT INTO "{table}" ({column_list}) SELECT {", ".join(select)} FROM "{old}"'
+        )
+        db.execute_sql(f'DROP TABLE "{old}"')
+    return cursor.rowcount
+
+
+def migrate() -> Dict[str, int]:
+    """
+    Перестраивает таблицы, у которых вид колонок не совпадает с моделями.
+
+    Returns:
+        Таблица -> сколько строк перенесено
+    """
+    moved = {}
+    # Внешние ключи не должны проверяться и переписываться на время подмены таблиц:
+    # legacy_alter_table - RENAME не трогает ссылки на таблицу в других таблицах
+    db.execute_sql("PRAGMA foreign_keys = OFF")
+    db.execute_sql("PRAGMA legacy_alter_table = ON")
+    try:
+        for model in MODELS:
+            fields = _pending_columns(model)
+            if fields:
+                moved[model._meta.table_name] = _rebuild(model, fields)
+    finally:
+        db.execute_sql("PRAGMA legacy_alter_table = OFF")
+
+    if moved:
+        # Триггеры удалились вместе со старыми таблицами
+        timetable.init_timetable()
+        counters.init_counters()
+    return moved
+
+
+if __name__ == "__main__":
+    if sys.argv[1:]:
+        print(__doc__)
+        sys.exit(2)
+    moved = migrate()
+    for table, count in moved.items():
+        print(f"{table}: перестроена, строк: {count}")
+    if not moved:
+        print("База уже в выбранном режиме хранения")
+    else:
+        db.execute_sql("VACUUM")
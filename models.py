@@ -1,14 +1,43 @@
 from peewee import *
+from db_fields import enum_field, timestamp_field
 import datetime
+import os
 
-db = SqliteDatabase("academy_orm.db")
+# timeout - сколько ждать блокировку SQLite перед "database is locked".
+# Держим его коротким: дальше работают повторы с задержкой (admission.retry_on_locked).
+# Соединение peewee открывает при первом запросе, приложение перепривязывает базу
+# к своему файлу через configure_db (см. app.create_app) с таймаутом DATABASE_TIMEOUT
+DB_TIMEOUT = float(os.environ.get("ACADEMY_DB_BUSY_TIMEOUT", 1.0))
+
+db = SqliteDatabase(os.environ.get("ACADEMY_DB_PATH", "academy_orm.db"), timeout=DB_TIMEOUT)
+
+
+def configure_db(path: str, timeout: float) -> tuple:
+    """
+    Привязывает db к файлу базы. Открытое соединение закрывается, новое откроется при первом запросе.
+
+    Returns:
+        Прежняя привязка (path, timeout) - чтобы вернуть её (см. query_plans.run)
+    """
+    previous = (db.database, db._timeout)
+    db.init(path, timeout=timeout)
+    return previous
+
+
+def _forget_connection_after_fork() -> None:
+    # Соединение SQLite нельзя использовать в двух процессах: потомок не закрывает
+    # унаследованное (это сняло бы блокировки родителя), а просто забывает его
+    db._state.reset()
+
+
+os.register_at_fork(after_in_child=_forget_connection_after_fork)
 
 # Группы
 class Groups(Model):
     id = AutoField()
     group_name = CharField(unique=True, null=False, max_length=50)
-    created_at = DateTimeField(default=datetime.datetime.now)
-    updated_at = DateTimeField(default=datetime.datetime.now)
+    created_at = timestamp_field(default=datetime.datetime.now)
+    updated_at = timestamp_field(default=datetime.datetime.now)
 
     def __str__(self):
         return str(self.group_name)
@@ -25,17 +54,25 @@ class Students(Model):
     last_name = CharField(max_length=50)
     group_id = ForeignKeyField(Groups, backref="students", on_delete="RESTRICT")
     notes = TextField(null=True)
-    created_at = DateTimeField(default=datetime.datetime.now)
-    updated_at = DateTimeField(default=datetime.datetime.now)
+    created_at = timestamp_field(default=datetime.datetime.now)
+    updated_at = timestamp_field(default=datetime.datetime.now)
 
     def __str__(self):
         return f"{self.first_name} {self.middle_name or ''} {self.last_name} {self.group_id.group_name}"
 
     class Meta:
         database = db
+        # Под сортировки get_students_list и get_students_by_group_name (см. query_plans.py):
+        # id в конце любого индекса SQLite есть неявно (rowid), отдельно его не указываем.
+        # Внутри группы индекс есть только у сортировки по умолчанию (фамилия): группу по
+        # имени или дате сортирует SQLite - это десятки строк, а каждый лишний индекс
+        # удорожает каждую запись студента (см. ALLOWED_GROUP_SORT в query_plans.py)
         indexes = (
             (("group_id",), False),
             (("last_name",), False),
+            (("first_name",), False),
+            (("created_at",), False),
+            (("group_id", "last_name", "first_name"), False),
         )
 
 
@@ -48,14 +85,17 @@ class OnlineLessons(Model):
     telegram_record_link = CharField(null=True, max_length=300)
     lesson_theme = CharField(max_length=200)
     lesson_notes = TextField(null=True)
-    created_at = DateTimeField(default=datetime.datetime.now)
-    updated_at = DateTimeField(default=datetime.datetime.now)
+    created_at = timestamp_field(default=datetime.datetime.now)
+    updated_at = timestamp_field(default=datetime.datetime.now)
 
     class Meta:
         database = db
         indexes = (
             (("group_id",), False),
-            (("lesson_date",), False),
+            # Расписание за период (и группы за период) - один проход по диапазону индекса,
+            # уже в порядке (lesson_date, lesson_time), без сортировки
+            (("lesson_date", "lesson_time"), False),
+            (("group_id", "lesson_date", "lesson_time"), False),
         )
         constraints = [Check("academic_hours > 0 AND academic_hours <= 8")]
 
@@ -71,8 +111,8 @@ class StudentsOnlineLessons(Model):
     mark = IntegerField(default=6)
     is_active = BooleanField(default=False)
     attendance_notes = TextField(null=True)
-    created_at = DateTimeField(default=datetime.datetime.now)
-    updated_at = DateTimeField(default=datetime.datetime.now)
+    created_at = timestamp_field(default=datetime.datetime.now)
+    updated_at = timestamp_field(default=datetime.datetime.now)
 
     class Meta:
         database = db
@@ -95,10 +135,10 @@ class Homeworks(Model):
     summary = TextField()
     homework_text = TextField()
     homework_date = DateField(default=datetime.date.today)
-    deadline_date = DateField(constraints=[SQL("DEFAULT DATE('now', '+7 days')")])
+    deadline_date = DateField(constraints=[SQL("DEFAULT (DATE('now', '+7 days'))")])
     is_active = BooleanField(default=True)
-    created_at = DateTimeField(default=datetime.datetime.now)
-    updated_at = DateTimeField(default=datetime.datetime.now)
+    created_at = timestamp_field(default=datetime.datetime.now)
+    updated_at = timestamp_field(default=datetime.datetime.now)
 
     class Meta:
         database = db
@@ -120,21 +160,14 @@ class HomeworksStudents(Model):
     homework_text = TextField()
     file_path = CharField(null=True, max_length=400)
 
-    status = CharField(
-        # Первый элемент - то что будет храниться в базе, второй - то что будет отображаться в интерфейсе
-        choices=[
-            ("не сдано", "не сдано"),
-            ("принято", "принято"),
-            ("проверено", "проверено"),
-            ("обратная связь выдана", "обратная связь выдана"),
-        ]
-    )
+    # Порядок значений важен: в компактном режиме в базе хранится номер значения (см. db_fields.py)
+    status = enum_field(["не сдано", "принято", "проверено", "обратная связь выдана"])
     mark = IntegerField(null=True)
-    submission_date = DateTimeField(default=datetime.datetime.now)
-    checked_date = DateTimeField(null=True)
+    submission_date = timestamp_field(default=datetime.datetime.now)
+    checked_date = timestamp_field(null=True)
     feedback_text = TextField(null=True)
-    created_at = DateTimeField(default=datetime.datetime.now)
-    updated_at = DateTimeField(default=datetime.datetime.now)
+    created_at = timestamp_field(default=datetime.datetime.now)
+    updated_at = timestamp_field(default=datetime.datetime.now)
 
     class Meta:
         database = db
@@ -157,8 +190,8 @@ class StudentsReviews(Model):
     review_start_date = DateField()
     review_end_date = DateField()
     is_published = BooleanField(default=False)
-    created_at = DateTimeField(default=datetime.datetime.now)
-    updated_at = DateTimeField(default=datetime.datetime.now)
+    created_at = timestamp_field(default=datetime.datetime.now)
+    updated_at = timestamp_field(default=datetime.datetime.now)
 
     class Meta:
         database = db
@@ -168,3 +201,73 @@ class StudentsReviews(Model):
             Check("is_published IN (0, 1)"),
             Check("review_end_date IS NULL OR review_end_date >= review_start_date"),
         ]
+
+
+# jobs - фоновые задачи (тяжёлые отчёты и т.п.), см. jobs.py
+class Jobs(Model):
+    id = AutoField()
+    job_type = CharField(max_length=50)
+    # queued -> running -> done / failed / cancelled
+    status = CharField(max_length=20, default="queued")
+    params = TextField(null=True)  # JSON с параметрами задачи
+    total_units = IntegerField(default=0)
+    done_units = IntegerField(default=0)
+    cancel_requested = BooleanField(default=False)
+    worker_pid = IntegerField(null=True)
+    result_path = CharField(null=True, max_length=400)
+    error = TextField(null=True)
+    created_at = DateTimeField(default=datetime.datetime.now)
+    started_at = DateTimeField(null=True)
+    finished_at = DateTimeField(null=True)
+    updated_at = DateTimeField(default=datetime.datetime.now)
+
+    @property
+    def progress(self) -> float:
+        if not self.total_units:
+            return 0.0
+        return round(self.done_units / self.total_units, 4)
+
+    class Meta:
+        database = db
+        indexes = ((("status",), False),)
+        constraints = [
+            Check(
+                "status IN ('queued', 'running', 'done', 'failed', 'cancelled')"
+            ),
+        ]
+
+
+# timetable_versions - версии недельного расписания группы, их увеличивают триггеры на OnlineLessons (см. timetable.py)
+class TimetableVersions(Model):
+    group_id = IntegerField()
+    week_start = DateField()  # Понедельник недели
+    version = IntegerField(default=1)
+
+    class Meta:
+        database = db
+        primary_key = CompositeKey("group_id", "week_start")
+
+
+# group_counters - счётчики группы, их поддерживают триггеры (см. counters.py)
+class GroupCounters(Model):
+    group_id = IntegerField(primary_key=True)
+    # DEFAULT в самой таблице: строки вставляют триггеры, а не peewee
+    students_count = IntegerField(default=0, constraints=[SQL("DEFAULT 0")])
+    lessons_count = IntegerField(default=0, constraints=[SQL("DEFAULT 0")])
+    # Сдачи в статусе "принято" (ждут проверки)
+    pending_homeworks_count = IntegerField(default=0, constraints=[SQL("DEFAULT 0")])
+
+    class Meta:
+        database = db
+
+
+# Основные таблицы академии в порядке создания (сначала те, на кого ссылаются)
+MODELS = [
+    Groups,
+    Students,
+    OnlineLessons,
+    StudentsOnlineLessons,
+    Homeworks,
+    HomeworksStudents,
+    StudentsReviews,
+]
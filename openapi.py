@@ -0,0 +1,142 @@
+"""
+Модуль openapi.py
+
+Готовая спецификация OpenAPI (swagger.json) вместо генерации flask_restx на каждый запрос.
+
+Спецификация собирается один раз - при старте приложения (или при первом запросе,
+если PRELOAD выключен) либо заранее, при сборке релиза, в файл:
+
+    python openapi.py build [swagger.json]
+
+и тогда при старте только читается из SWAGGER_SPEC_FILE (ACADEMY_SWAGGER_SPEC_FILE).
+
+Отдача:
+    /swagger.json           - ETag из sha256 содержимого, Cache-Control на SPEC_MAX_AGE
+                              секунд, Content-Location указывает на версионный адрес;
+    /swagger.<версия>.json  - та же спецификация по адресу с хэшем, кэшируется навсегда (immutable);
+    если клиент принимает gzip - заранее сжатые байты, с If-None-Match - 304 без тела.
+
+Статика Swagger UI (/swaggerui/...) отдаётся с Cache-Control на ASSETS_MAX_AGE секунд.
+Сам UI выключается настройкой SWAGGER_UI=False (ACADEMY_SWAGGER_UI=0), спецификация
+при этом остаётся.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+
+from flask import Response, abort, request, url_for
+
+SPEC_MAX_AGE = int(os.environ.get("ACADEMY_SPEC_MAX_AGE", 3600))
+ASSETS_MAX_AGE = int(os.environ.get("ACADEMY_SWAGGER_ASSETS_MAX_AGE", 86400))
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+ASSETS_PREFIX = "/swaggerui/"
+
+
+class Spec:
+    """Сериализованная спецификация, её сжатая версия и хэш содержимого."""
+
+    def __init__(self, body: bytes):
+        self.body = body
+        # mtime=0 - одинаковые байты при одинаковой спецификации
+        self.gzipped = gzip.compress(body, compresslevel=9, mtime=0)
+        self.digest = hashlib.sha256(body).hexdigest()
+
+    @property
+    def version(self) -> str:
+        return self.digest[:12]
+
+
+def render_spec(app, api) -> bytes:
+    """
+    Генерирует спецификацию flask_restx и сериализует её детерминированно.
+
+    Raises:
+        RuntimeError: Если flask_restx не смог построить спецификацию
+    """
+    with app.test_request_context():
+        schema = api.__schema__
+    if "swagger" not in schema:
+        raise RuntimeError(f"Не удалось построить спецификацию: {schema.get('error')}")
+    return json.dumps(schema, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def load_spec(app, api) -> Spec:
+    """Спецификация из SWAGGER_SPEC_FILE, а если файла нет - сгенерированная."""
+    spec_file = app.config.get("SWAGGER_SPEC_FILE")
+    if spec_file and os.path.exists(spec_file):
+        with open(spec_file, "rb") as f:
+            return Spec(f.read())
+    return Spec(render_spec(app, api))
+
+
+def _spec_response(spec: Spec, max_age: int, immutable: bool = False) -> Response:
+    use_gzip = request.accept_encodings["gzip"] > 0
+    response = Response(spec.gzipped if use_gzip else spec.body, mimetype="application/json")
+    if use_gzip:
+        response.headers["Content-Encoding"] = "gzip"
+    response.vary.add("Accept-Encoding")
+    # У сжатого и несжатого представления разные байты - и разные ETag
+    response.set_etag(f"{spec.digest}-gzip" if use_gzip else spec.digest)
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    if immutable:
+        response.cache_control.immutable = True
+    response.headers["Content-Location"] = url_for("versioned_specs", version=spec.version)
+    return response.make_conditional(request)
+
+
+def _cache_assets(response: Response) -> Response:
+    if request.path.startswith(ASSETS_PREFIX) and response.status_code == 200:
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = ASSETS_MAX_AGE
+    return response
+
+
+def init_app(app, api) -> None:
+    """Подменяет /swagger.json flask_restx готовой спецификацией и добавляет версионный адрес."""
+    state = {"spec": None}
+
+    def get_spec() -> Spec:
+        if state["spec"] is None:
+            state["spec"] = load_spec(app, api)
+        return state["spec"]
+
+    def specs_view():
+        return _spec_response(get_spec(), SPEC_MAX_AGE)
+
+    def versioned_specs_view(version: str):
+        spec = get_spec()
+        if version != spec.version:
+            abort(404)
+        return _spec_response(spec, IMMUTABLE_MAX_AGE, immutable=True)
+
+    app.view_functions[api.endpoint("specs")] = specs_view
+    app.add_url_rule("/swagger.<version>.json", "versioned_specs", versioned_specs_view)
+    if app.config.get("SWAGGER_UI", True):
+        app.after_request(_cache_assets)
+    else:
+        # Статику UI flask_restx регистрирует всегда - без UI она не нужна
+        app.view_functions["restx_doc.static"] = lambda filename: abort(404)
+
+    if app.config.get("PRELOAD"):
+        get_spec()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Спецификация OpenAPI академии")
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("path", nargs="?", default="swagger.json", help="Куда записать спецификацию")
+    args = parser.parse_args()
+
+    from app import create_app
+
+    # Базу для сборки спецификации не трогаем
+    application = create_app({"INIT_DATABASE": False, "PRELOAD": False, "SWAGGER_SPEC_FILE": None})
+    body = render_spec(application, application.extensions["academy_api"])
+    with open(args.path, "wb") as f:
+        f.write(body)
+    print(f"{args.path}: {len(body)} байт, версия {Spec(body).version}")
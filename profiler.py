@@ -0,0 +1,262 @@
+"""
+Модуль profiler.py
+
+Профилирование запросов по требованию, без передеплоя.
+
+Администратор включает съём профиля на следующие N запросов и/или T секунд
+(по желанию - только для маршрутов с заданным префиксом), профили всех
+попавших запросов складываются вместе и отдаются в виде, готовом для анализа.
+Дольше MAX_SECONDS съём не длится, даже если задано только число запросов:
+
+    mode="cprofile" - детерминированный cProfile, результат в формате pstats
+                      (pstats.Stats(файл), snakeviz) или текстовой сводкой;
+    mode="sample"   - сэмплирование стеков потоков-обработчиков отдельным потоком
+                      с заданным интервалом, результат - collapsed stacks
+                      (flamegraph.pl, speedscope). Накладные расходы почти нулевые.
+
+Пока съём выключен, хуки запроса сводятся к одной проверке глобальной переменной,
+а cProfile и pstats даже не импортируются - это происходит при первом съёме cprofile.
+Профиль собирается в пределах одного процесса: при нескольких воркерах он покрывает
+только запросы, попавшие в воркер, принявший команду.
+
+cProfile профилирует один запрос за раз: начиная с Python 3.12 второй одновременно
+включённый профилировщик падает с ValueError. Запросы, пришедшие, пока идёт профилируемый,
+обрабатываются как обычно и в лимит requests не засчитываются.
+"""
+
+import io
+import marshal
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+
+from flask import g, request
+
+MODES = ("cprofile", "sample")
+DEFAULT_SAMPLE_INTERVAL_MS = 5
+MAX_REQUESTS = 10000
+MAX_SECONDS = 600
+
+
+class ProfileCapture:
+    """Один сеанс съёма профиля."""
+
+    def __init__(
+        self,
+        mode: str,
+        requests: Optional[int] = None,
+        seconds: Optional[float] = None,
+        route: Optional[str] = None,
+        interval_ms: float = DEFAULT_SAMPLE_INTERVAL_MS,
+    ):
+        self.mode = mode
+        self.requests_left = requests
+        # Без seconds съём всё равно ограничен MAX_SECONDS: иначе при requests, до которых
+        # так и не дошло, поток-сэмплер работал бы бесконечно
+        self.deadline = time.monotonic() + min(seconds or MAX_SECONDS, MAX_SECONDS)
+        self.route = route
+        self.interval = interval_ms / 1000
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.requests_profiled = 0
+        self.samples = 0
+        self.stats: Optional["pstats.Stats"] = None
+        self.stacks: Counter = Counter()
+        self._lock = threading.Lock()
+        # Занят, пока идёт запрос под cProfile (см. описание модуля)
+        self._cprofile_lock = threading.Lock()
+        # Потоки, которые сейчас обрабатывают профилируемый запрос (ident -> True)
+        self._threads: Dict[int, bool] = {}
+        self._sampler: Optional[threading.Thread] = None
+        if mode == "sample":
+            self._sampler = threading.Thread(
+                target=self._sample_loop, name="profiler-sampler", daemon=True
+            )
+            self._sampler.start()
+
+    @property
+    def active(self) -> bool:
+        if self.finished_at is not None:
+            return False
+        if time.monotonic() > self.deadline:
+            self.finish()
+            return False
+        return True
+
+    def finish(self) -> None:
+        if self.finished_at is None:
+            self.finished_at = time.time()
+
+    def wants(self, path: str) -> bool:
+        """Нужно ли профилировать запрос и, если да, занимает под него место в лимите."""
+        if not self.active:
+            return False
+        if self.route and not path.startswith(self.route):
+            return False
+        if self.mode == "cprofile" and not self._cprofile_lock.acquire(blocking=False):
+            return False
+        with self._lock:
+            if self.requests_left is not None:
+                if self.requests_left <= 0:
+                    if self.mode == "cprofile":
+                        self._cprofile_lock.release()
+                    return False
+                self.requests_left -= 1
+        return True
+
+    def request_started(self) -> Any:
+        if self.mode == "cprofile":
+            import cProfile
+
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Профилировщик уже включён не нами (отладчик, другой инструмент) - запрос не профилируем
+                with self._lock:
+                    if self.requests_left is not None:
+                        self.requests_left += 1
+                self._cprofile_lock.release()
+                return None
+            return profile
+        with self._lock:
+            self._threads[threading.get_ident()] = True
+        return None
+
+    def request_finished(self, token: Any) -> None:
+        if self.mode == "cprofile":
+            import pstats
+
+            if token is None:
+                return
+            token.disable()
+            self._cprofile_lock.release()
+            with self._lock:
+                if self.stats is None:
+                    self.stats = pstats.Stats(token)
+                else:
+                    self.stats.add(token)
+        else:
+            with self._lock:
+                self._threads.pop(threading.get_ident(), None)
+
+        with self._lock:
+            self.requests_profiled += 1
+            if self.requests_left is not None and self.requests_left <= 0 and not self._threads:
+                self.finish()
+
+    def _sample_loop(self) -> None:
+        while self.active:
+            with self._lock:
+                idents = list(self._threads)
+            if idents:
+                frames = sys._current_frames()
+                for ident in idents:
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        self._record_stack(frame)
+            time.sleep(self.interval)
+
+    def _record_stack(self, frame) -> None:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}")
+            frame = frame.f_back
+        with self._lock:
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "active": self.active,
+            "route": self.route,
+            "requests_left": self.requests_left,
+            "requests_profiled": self.requests_profiled,
+            "samples": self.samples,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+    def collapsed(self) -> str:
+        """Стеки в формате collapsed: 'кадр;кадр;кадр количество' построчно."""
+        with self._lock:
+            return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def pstats_bytes(self) -> bytes:
+        """Профиль в бинарном формате pstats (как у Stats.dump_stats)."""
+        with self._lock:
+            if self.stats is None:
+                return marshal.dumps({})
+            return marshal.dumps(self.stats.stats)
+
+    def text(self, limit: int = 50) -> str:
+        if self.mode == "sample":
+            # Самые "тяжёлые" листья стеков
+            leaves: Counter = Counter()
+            with self._lock:
+                for stack, count in self.stacks.items():
+                    leaves[stack.rsplit(";", 1)[-1]] += count
+            return "".join(f"{count:>8} {leaf}\n" for leaf, count in leaves.most_common(limit))
+
+        output = io.StringIO()
+        with self._lock:
+            if self.stats is None:
+                return ""
+            self.stats.stream = output
+            self.stats.sort_stats("cumulative").print_stats(limit)
+        return output.getvalue()
+
+
+# Текущий сеанс. None - профилирование выключено
+_capture: Optional[ProfileCapture] = None
+
+
+def start_capture(**options) -> ProfileCapture:
+    """Начинает новый сеанс съёма (предыдущий, если был, останавливается)."""
+    global _capture
+    if _capture is not None:
+        _capture.finish()
+    _capture = ProfileCapture(**options)
+    return _capture
+
+
+def stop_capture() -> Optional[ProfileCapture]:
+    """Останавливает съём, результаты остаются доступны до reset_capture()."""
+    if _capture is not None:
+        _capture.finish()
+    return _capture
+
+
+def reset_capture() -> None:
+    global _capture
+    stop_capture()
+    _capture = None
+
+
+def get_capture() -> Optional[ProfileCapture]:
+    return _capture
+
+
+def _before_request():
+    capture = _capture
+    if capture is None or capture.finished_at is not None:
+        return
+    if capture.wants(request.path):
+        g.profile_capture = capture
+        g.profile_token = capture.request_started()
+
+
+def _teardown_request(exc):
+    capture = g.pop("profile_capture", None)
+    if capture is not None:
+        capture.request_finished(g.pop("profile_token", None))
+
+
+def init_app(app) -> None:
+    """Подключает хуки профилировщика к приложению."""
+    app.before_request(_before_request)
+    app.teardown_request(_teardown_request)
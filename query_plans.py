@@ -0,0 +1,288 @@
+"""
+Модуль query_plans.py
+
+Проверка планов запросов: каждая форма запроса из utils.py выполняется на временной
+базе, наполненной seed.py, для всех её SQL-запросов снимается EXPLAIN QUERY PLAN,
+и проверка падает, если в плане есть
+
+    SCAN <таблица>  - полный проход по таблице или индексу (кроме явно разрешённых ниже);
+    USE TEMP B-TREE - сортировка/группировка во временном B-дереве вместо порядка индекса
+                      (кроме форм, где сортировка явно разрешена).
+
+Запуск (код возврата 1 - есть нарушения):
+
+    python query_plans.py            - только нарушения и итог
+    python query_plans.py --verbose  - планы всех запросов
+
+Разрешённые проходы перечислены у формы вместе с причиной: например, поиск по подстроке
+(LIKE '%...%') индекс использовать не может, а список всех групп читает таблицу целиком
+по определению. Новая форма запроса в utils.py должна появиться здесь же - и чтения,
+и записи (создание, изменение, удаление), и запросы к архивам (archive.py).
+
+Рабочую базу academy_orm.db проверка не трогает: db на время проверки привязывается
+к временной базе, а потом возвращается к прежнему файлу.
+"""
+
+import datetime
+import os
+import re
+import sys
+import tempfile
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from models import db, configure_db, DB_TIMEOUT, MODELS, Groups, HomeworksStudents, OnlineLessons
+from seed import seed_database
+from group_index import group_index
+import archive
+import counters
+
+SEED = {"groups": 20, "students_per_group": 25, "lessons_per_group": 8}
+# Учебный год, занятия которого лежат в архиве (seed.py ставит занятия с 2024-09-02)
+ARCHIVE_YEAR = 2023
+
+SUBSTRING_FILTER = "поиск по подстроке (LIKE '%...%') не может использовать индекс"
+WHOLE_TABLE = "запрос возвращает всю таблицу"
+GRADES_INPUT = "VALUES с оценками - входные данные"
+# Индексы (group_id, first_name) и (group_id, created_at) убраны: на 50 000 студентов
+# в группах по ~27 они удорожали вставку студента на ~40% (39 -> 55 мкс) и базу на треть,
+# а сортировка ~27 строк одной группы без них стоит ~10 мкс на запрос
+ALLOWED_GROUP_SORT = "сортировка студентов одной группы (десятки строк) дешевле лишнего индекса"
+
+_ALIAS_RE = re.compile(r'"(\w+)" AS "(\w+)"')
+_SCAN_RE = re.compile(r"^SCAN (\S+)")
+_EXPLAINED = ("SELECT", "WITH", "UPDATE", "DELETE")
+
+
+class Shape:
+    """Форма запроса: вызов функции utils.py и разрешённые в её планах полные проходы."""
+
+    def __init__(
+        self,
+        name: str,
+        call: Callable[[], Any],
+        allowed_scans: Optional[Dict[str, str]] = None,
+        allowed_sort: Optional[str] = None,
+        archive_years: Optional[List[int]] = None,
+    ):
+        self.name = name
+        self.call = call
+        self.allowed_scans = allowed_scans or {}
+        # Причина, по которой допустима сортировка во временном B-дереве (None - не допустима)
+        self.allowed_sort = allowed_sort
+        # Архивы, которые читает форма: план её запросов снимается с подключёнными архивами
+        self.archive_years = archive_years
+
+
+def shapes() -> List[Shape]:
+    import utils
+
+    group = Groups.get(Groups.group_name == "python415")
+    submission = HomeworksStudents.select().where(HomeworksStudents.status == "не сдано").first()
+    homework_id = submission.__data__["homework_id"]
+    student_id = submission.__data__["student_id"]
+    date_from = datetime.date(2024, 9, 1)
+    date_to = datetime.date(2024, 10, 1)
+    # Период, захватывающий и архивный учебный год (см. _archive_group)
+    archived_from = archive.year_bounds(ARCHIVE_YEAR)[1] - datetime.timedelta(days=30)
+    # Записи идут по очереди и работают с тем, что создали предыдущие
+    created: Dict[str, Any] = {}
+
+    result = [
+        Shape("get_group_by_id", lambda: utils.get_group_by_id(group.id)),
+        Shape("get_student_by_id", lambda: utils.get_student_by_id(5)),
+        Shape("get_student_by_id expand=group", lambda: utils.get_student_by_id(5, ["group"])),
+        Shape(
+            "get_students_by_group_name",
+            lambda: utils.get_students_by_group_name(group.group_name),
+        ),
+        Shape(
+            "get_lessons_schedule",
+            lambda: utils.get_lessons_schedule(date_from, date_to),
+        ),
+        Shape(
+            "get_lessons_schedule group_id",
+            lambda: utils.get_lessons_schedule(date_from, date_to, group.id),
+        ),
+        Shape(
+            "get_homework_submission",
+            lambda: utils.get_homework_submission(homework_id, student_id),
+        ),
+        Shape(
+            "grade_homework_submissions",
+            lambda: utils.grade_homework_submissions(
+                homework_id, [{"student_id": student_id, "status": "принято", "mark": 10}]
+            ),
+            {"grades": GRADES_INPUT},
+        ),
+        Shape(
+            "attach_homework_file",
+            lambda: utils.attach_homework_file(homework_id, student_id, "ab/abcdef.bin"),
+        ),
+        Shape(
+            "create_group",
+            lambda: created.setdefault("group", utils.create_group("query_plans")),
+        ),
+        Shape(
+            "update_group_id",
+            lambda: utils.update_group_id(created["group"].id, "query_plans_renamed"),
+        ),
+        Shape(
+            "create_student",
+            lambda: created.setdefault(
+                "student", utils.create_student("Анна", "Планова", created["group"].id)
+            ),
+        ),
+        Shape(
+            "update_student_by_id",
+            lambda: utils.update_student_by_id(created["student"].id, last_name="Пересаженная", group_id=group.id),
+        ),
+        Shape("delete_student_by_id", lambda: utils.delete_student_by_id(created["student"].id)),
+        Shape("delete_group_id", lambda: utils.delete_group_id(created["group"].id)),
+    ]
+
+    for group_id in (None, group.id):
+        result.append(
+            Shape(
+                f"get_lessons_schedule include_archived group_id={group_id is not None}",
+                lambda g=group_id: utils.get_lessons_schedule(archived_from, date_to, g, include_archived=True),
+                archive_years=[ARCHIVE_YEAR],
+            )
+        )
+
+    for direction in ("asc", "desc"):
+        for name_filter in (None, "41"):
+            for with_counters in (False, True):
+                result.append(
+                    Shape(
+                        f"get_groups_list {direction} filter={bool(name_filter)} counters={with_counters}",
+                        lambda d=direction, f=name_filter, c=with_counters: utils.get_groups_list(d, f, c),
+                        {"groups": SUBSTRING_FILTER if name_filter else WHOLE_TABLE},
+                    )
+                )
+
+    for group_id in (None, group.id):
+        for name_filter in (None, "ов"):
+            for sort_by in ("last_name", "first_name", "created_at"):
+                for direction in ("asc", "desc"):
+                    for expand in (None, ["group"]):
+                        allowed = {}
+                        if group_id is None:
+                            allowed["students"] = SUBSTRING_FILTER if name_filter else WHOLE_TABLE
+                        group_sort = group_id is not None and sort_by != "last_name"
+                        result.append(
+                            Shape(
+                                f"get_students_list group={group_id is not None} filter={bool(name_filter)}"
+                                f" sort={sort_by} {direction} expand={bool(expand)}",
+                                lambda g=group_id, f=name_filter, s=sort_by, d=direction, e=expand: (
+                                    utils.get_students_list(g, f, s, d, e, limit=20, offset=0)
+                                ),
+                                allowed,
+                                ALLOWED_GROUP_SORT if group_sort else None,
+                            )
+                        )
+    return result
+
+
+def _capture(call: Callable[[], Any]) -> List[Tuple[str, tuple]]:
+    """SQL-запросы (и их параметры), которые выполнил вызов."""
+    statements: List[Tuple[str, tuple]] = []
+    execute_sql = db.execute_sql
+
+    def recording_execute_sql(sql, params=None, *args, **kwargs):
+        if sql.lstrip().split(None, 1)[0].upper() in _EXPLAINED:
+            statements.append((sql, tuple(params or ())))
+        return execute_sql(sql, params, *args, **kwargs)
+
+    db.execute_sql = recording_execute_sql
+    try:
+        call()
+    finally:
+        db.execute_sql = execute_sql
+    return statements
+
+
+def check_plan(
+    sql: str,
+    params: tuple,
+    allowed_scans: Dict[str, str],
+    tables: set,
+    allowed_sort: Optional[str] = None,
+) -> Tuple[List[str], List[str]]:
+    """
+    План запроса и найденные в нём нарушения.
+
+    Returns:
+        (строки плана, нарушения)
+    """
+    aliases = {alias: table for table, alias in _ALIAS_RE.findall(sql)}
+    plan = [row[3] for row in db.execute_sql(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+    problems = []
+    for detail in plan:
+        if "USE TEMP B-TREE" in detail:
+            if not (allowed_sort and detail == "USE TEMP B-TREE FOR ORDER BY"):
+                problems.append(detail)
+            continue
+        match = _SCAN_RE.match(detail)
+        if match is None:
+            continue
+        name = match.group(1)
+        table = aliases.get(name, name)
+        # Проходы по CTE и подзапросам - это проходы по уже отобранным строкам
+        if table in tables and table not in allowed_scans:
+            problems.append(detail)
+    return plan, problems
+
+
+def _archive_group() -> None:
+    """Группа с занятиями в архивном учебном году, перенесённая в архив, как это делает archive.py."""
+    end = archive.year_bounds(ARCHIVE_YEAR)[1]
+    group = Groups.create(group_name="query_plans_archived")
+    OnlineLessons.insert_many(
+        [
+            {"group_id": group.id, "lesson_date": end - datetime.timedelta(weeks=week), "lesson_theme": "Архив"}
+            for week in range(8)
+        ]
+    ).execute()
+    # Остальные группы занимаются и после конца года - в архив уходит только эта
+    archive.archive_year(ARCHIVE_YEAR, today=end + datetime.timedelta(days=1))
+
+
+def run(verbose: bool = False) -> int:
+    """Проверяет все формы запросов. Возвращает число нарушений."""
+    failures = 0
+    archive_dir = archive.ARCHIVE_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        previous = configure_db(os.path.join(tmp, "query_plans.db"), DB_TIMEOUT)
+        archive.ARCHIVE_DIR = os.path.join(tmp, "archive")
+        try:
+            db.create_tables(MODELS)
+            counters.init_counters()
+            seed_database(**SEED)
+            _archive_group()
+            tables = set(db.get_tables())
+
+            for shape in shapes():
+                statements = _capture(shape.call)
+                with archive.attached(shape.archive_years) if shape.archive_years else nullcontext():
+                    for sql, params in statements:
+                        plan, problems = check_plan(sql, params, shape.allowed_scans, tables, shape.allowed_sort)
+                        if problems or verbose:
+                            print(f"{'FAIL' if problems else 'ok  '} {shape.name}")
+                            print(f"     {sql}")
+                            for detail in plan:
+                                print(f"     {'!' if detail in problems else ' '} {detail}")
+                        failures += len(problems)
+        finally:
+            db.close()
+            configure_db(*previous)
+            archive.ARCHIVE_DIR = archive_dir
+            # Записи форм попали в индекс названий групп этого процесса
+            group_index.invalidate()
+
+    print(f"Нарушений: {failures}")
+    return failures
+
+
+if __name__ == "__main__":
+    sys.exit(1 if run(verbose="--verbose" in sys.argv[1:]) else 0)
@@ -0,0 +1,198 @@
+"""
+Модуль reports.py
+
+Тяжёлые отчёты, которые выполняются фоновыми задачами (см. jobs.py).
+
+students_reviews - массовая генерация StudentsReviews за период review_start_date..review_end_date:
+для каждого студента считаются посещаемость и оценки за занятия и домашние задания.
+Работа делится по группам, каждая группа - отдельная часть задачи в пуле воркеров.
+Отзывы записываются только после того, как посчитаны все группы: отменённая задача
+не оставляет после себя отзывы части групп.
+"""
+
+import datetime
+import threading
+from typing import Any, Dict, List
+
+from peewee import fn
+from models import (
+    db,
+    Groups,
+    Students,
+    OnlineLessons,
+    StudentsOnlineLessons,
+    Homeworks,
+    HomeworksStudents,
+    StudentsReviews,
+)
+from admission import retry_on_locked
+from jobs import job_type, write_result
+
+# Статусы домашки, при которых она считается сданной
+COMPLETED_HOMEWORK_STATUSES = ("принято", "проверено", "обратная связь выдана")
+
+# Больше групп за одну задачу не берём
+MAX_GROUPS_PER_JOB = 1000
+
+# Агрегаты групп считаются параллельно, а записываются по одной группе за раз:
+# писатель в SQLite всё равно один, а параллельные транзакции (других задач) только ждали бы блокировку
+_write_lock = threading.Lock()
+
+
+def _format_review(attendance: Dict[str, Any], homework: Dict[str, Any]) -> str:
+    parts = [f"Посещено занятий: {attendance.get('lessons', 0)}"]
+    if attendance.get("avg_mark") is not None:
+        parts.append(f"средняя оценка за занятия: {attendance['avg_mark']:.1f}")
+    parts.append(f"активность на занятиях: {attendance.get('active') or 0}")
+    parts.append(
+        f"домашних заданий сдано: {homework.get('completed') or 0} из {homework.get('total', 0)}"
+    )
+    if homework.get("avg_mark") is not None:
+        parts.append(f"средняя оценка за домашние задания: {homework['avg_mark']:.1f}")
+    return ", ".join(parts) + "."
+
+
+def build_group_reviews(
+    group_id: int,
+    review_start_date: datetime.date,
+    review_end_date: datetime.date,
+    is_published: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Считает агрегаты по студентам группы за период и готовит строки их отзывов
+    (записывает их save_group_reviews()).
+
+    Агрегаты считаются двумя GROUP BY запросами на всю группу, а не запросами на студента.
+
+    Returns:
+        Строки StudentsReviews, по одной на студента группы
+    """
+    attendance_query = (
+        StudentsOnlineLessons.select(
+            StudentsOnlineLessons.student_id.alias("student_id"),
+            fn.COUNT(StudentsOnlineLessons.id).alias("lessons"),
+            fn.AVG(StudentsOnlineLessons.mark).alias("avg_mark"),
+            fn.SUM(StudentsOnlineLessons.is_active).alias("active"),
+        )
+        .join(OnlineLessons)
+        .where(
+            (OnlineLessons.group_id == group_id)
+            & (OnlineLessons.lesson_date.between(review_start_date, review_end_date))
+        )
+        .group_by(StudentsOnlineLessons.student_id)
+        .dicts()
+    )
+    attendance = {row["student_id"]: row for row in attendance_query}
+
+    homework_query = (
+        HomeworksStudents.select(
+            HomeworksStudents.student_id.alias("student_id"),
+            fn.COUNT(HomeworksStudents.id).alias("total"),
+            fn.SUM(
+                HomeworksStudents.status.in_(COMPLETED_HOMEWORK_STATUSES).cast("INTEGER")
+            ).alias("completed"),
+            fn.AVG(HomeworksStudents.mark).alias("avg_mark"),
+        )
+        .join(Homeworks)
+        .join(OnlineLessons)
+        .where(
+            (OnlineLessons.group_id == group_id)
+            & (Homeworks.homework_date.between(review_start_date, review_end_date))
+        )
+        .group_by(HomeworksStudents.student_id)
+        .dicts()
+    )
+    homework = {row["student_id"]: row for row in homework_query}
+
+    student_ids = [
+        student.id
+        for student in Students.select(Students.id).where(Students.group_id == group_id)
+    ]
+    now = datetime.datetime.now()
+    return [
+        {
+            "student_id": student_id,
+            "review_text": _format_review(
+                attendance.get(student_id, {}), homework.get(student_id, {})
+            ),
+            "review_start_date": review_start_date,
+            "review_end_date": review_end_date,
+            "is_published": is_published,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for student_id in student_ids
+    ]
+
+
+def save_group_reviews(
+    rows: List[Dict[str, Any]], review_start_date: datetime.date, review_end_date: datetime.date
+) -> int:
+    """
+    Пересоздаёт неопубликованные отзывы студентов группы за период.
+
+    Returns:
+        Количество созданных отзывов
+    """
+    if not rows:
+        return 0
+    student_ids = [row["student_id"] for row in rows]
+    with _write_lock:
+        _replace_reviews(student_ids, review_start_date, review_end_date, rows)
+    return len(rows)
+
+
+@retry_on_locked(attempts=10, max_delay=2.0)
+def _replace_reviews(
+    student_ids: List[int],
+    review_start_date: datetime.date,
+    review_end_date: datetime.date,
+    rows: List[Dict[str, Any]],
+) -> None:
+    # Короткая транзакция на группу: не держим блокировку записи на всю задачу.
+    # IMMEDIATE - блокировка берётся сразу, и при занятой базе повторяется транзакция целиком
+    with db.atomic("IMMEDIATE"):
+        StudentsReviews.delete().where(
+            (StudentsReviews.student_id.in_(student_ids))
+            & (StudentsReviews.review_start_date == review_start_date)
+            & (StudentsReviews.review_end_date == review_end_date)
+            & (StudentsReviews.is_published == False)
+        ).execute()
+        for batch in range(0, len(rows), 100):
+            StudentsReviews.insert_many(rows[batch : batch + 100]).execute()
+
+
+@job_type("students_reviews", max_seconds=3600, max_units=MAX_GROUPS_PER_JOB)
+def generate_students_reviews(ctx, params: Dict[str, Any]) -> str:
+    """
+    Фоновая задача: отзывы для всех студентов выбранных групп (или всех групп).
+
+    params: review_start_date, review_end_date (ISO даты), group_ids (опционально), is_published
+    """
+    review_start_date = datetime.date.fromisoformat(params["review_start_date"])
+    review_end_date = datetime.date.fromisoformat(params["review_end_date"])
+    group_ids: List[int] = params.get("group_ids") or [
+        group.id for group in Groups.select(Groups.id).order_by(Groups.id)
+    ]
+
+    ctx.set_total(len(group_ids))
+    group_rows = ctx.map(
+        build_group_reviews,
+        group_ids,
+        review_start_date,
+        review_end_date,
+        bool(params.get("is_published", False)),
+    )
+    # Последняя точка отмены: дальше отзывы записываются для всех групп
+    ctx.check()
+    counts = [save_group_reviews(rows, review_start_date, review_end_date) for rows in group_rows]
+
+    return write_result(
+        ctx.job_id,
+        {
+            "review_start_date": review_start_date,
+            "review_end_date": review_end_date,
+            "groups": dict(zip(group_ids, counts)),
+            "reviews_created": sum(counts),
+        },
+    )
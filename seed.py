@@ -0,0 +1,109 @@
+"""
+Модуль seed.py
+
+Наполняет базу тестовыми данными для бенчмарков и проверок запросов.
+
+Работает с той базой, к которой сейчас привязаны модели, поэтому удобно
+использовать вместе с временной базой:
+
+    test_db = SqliteDatabase(":memory:")
+    with test_db.bind_ctx(MODELS):
+        test_db.create_tables(MODELS)
+        seed_database(groups=20)
+"""
+
+import datetime
+import random
+
+from models import (
+    Groups,
+    Students,
+    OnlineLessons,
+    StudentsOnlineLessons,
+    Homeworks,
+    HomeworksStudents,
+)
+
+FIRST_NAMES = ["Иван", "Пётр", "Анна", "Мария", "Олег", "Елена", "Сергей", "Ольга", "Никита", "Дарья"]
+LAST_NAMES = ["Иванов", "Петров", "Сидоров", "Смирнов", "Кузнецов", "Попов", "Васильев", "Соколов", "Михайлов", "Новиков"]
+STATUSES = ["не сдано", "принято", "проверено", "обратная связь выдана"]
+
+
+def seed_database(
+    groups: int = 10,
+    students_per_group: int = 25,
+    lessons_per_group: int = 8,
+    start_date: datetime.date = datetime.date(2024, 9, 2),
+    random_seed: int = 413,
+) -> None:
+    """
+    Создаёт группы со студентами, занятиями, посещаемостью и домашками.
+
+    Args:
+        groups: Количество групп
+        students_per_group: Студентов в группе
+        lessons_per_group: Занятий (и домашек) в группе, по одному в неделю
+        start_date: Дата первого занятия
+        random_seed: Зерно генератора, чтобы данные были одинаковыми между запусками
+    """
+    rnd = random.Random(random_seed)
+    database = Groups._meta.database
+    now = datetime.datetime.now()
+
+    with database.atomic():
+        for group_number in range(groups):
+            group = Groups.create(group_name=f"python{413 + group_number}")
+            Students.insert_many(
+                [
+                    {
+                        "first_name": rnd.choice(FIRST_NAMES),
+                        "last_name": f"{rnd.choice(LAST_NAMES)}-{group_number}-{number}",
+                        "group_id": group.id,
+                        "created_at": now - datetime.timedelta(minutes=rnd.randint(0, 100000)),
+                    }
+                    for number in range(students_per_group)
+                ]
+            ).execute()
+            student_ids = [
+                student.id
+                for student in Students.select(Students.id).where(Students.group_id == group.id)
+            ]
+
+            for lesson_number in range(lessons_per_group):
+                lesson_date = start_date + datetime.timedelta(weeks=lesson_number, days=group_number % 5)
+                lesson = OnlineLessons.create(
+                    group_id=group.id,
+                    lesson_date=lesson_date,
+                    lesson_time=datetime.time(19, 0),
+                    lesson_theme=f"Занятие {lesson_number + 1}",
+                )
+                homework = Homeworks.create(
+                    online_lesson_id=lesson.id,
+                    summary=f"Домашка {lesson_number + 1}",
+                    homework_text="Решить задачи",
+                    homework_date=lesson_date,
+                    deadline_date=lesson_date + datetime.timedelta(days=7),
+                )
+                StudentsOnlineLessons.insert_many(
+                    [
+                        {
+                            "student_id": student_id,
+                            "online_lesson_id": lesson.id,
+                            "mark": rnd.randint(1, 12),
+                            "is_active": rnd.random() < 0.5,
+                        }
+                        for student_id in student_ids
+                    ]
+                ).execute()
+                HomeworksStudents.insert_many(
+                    [
+                        {
+                            "student_id": student_id,
+                            "homework_id": homework.id,
+                            "homework_text": "Решение",
+                            "status": rnd.choice(STATUSES),
+                            "mark": rnd.randint(1, 12),
+                        }
+                        for student_id in student_ids
+                    ]
+                ).execute()
@@ -0,0 +1,159 @@
+"""
+Модуль statement_cache.py
+
+Кэш скомпилированных SQL запросов для горячих выборок из utils.py.
+
+Peewee на каждый вызов заново строит дерево запроса и генерирует из него строку SQL,
+хотя у запроса меняются только параметры. Для выборки одной строки это дороже,
+чем сам запрос в SQLite. Здесь запрос строится один раз на "форму" (какие фильтры есть,
+направление сортировки, какие связи раскрываются), а дальше выполняется готовый SQL
+с подставленными параметрами. Одинаковая строка SQL к тому же попадает в кэш
+подготовленных выражений модуля sqlite3.
+
+Форма запроса описывается функцией-построителем и кортежем shape:
+
+    def _groups_list_query(p, sort_direction, has_filter):
+        query = Groups.select()
+        if has_filter:
+            query = query.where(Groups.group_name.contains(p.name_filter))
+        ...
+
+    groups = statement_cache.select(_groups_list_query, (sort_direction, bool(name_filter)), name_filter=name_filter)
+
+Вместо параметров построитель получает метки (p.name_filter), по которым потом
+находятся позиции параметров в скомпилированном запросе.
+"""
+
+import threading
+from typing import Any, Callable, Dict, List, Tuple
+
+# Метки для целых чисел: значения, которых не бывает среди реальных параметров
+_INT_MARKER_BASE = -7_300_000_000_000
+
+
+def _like_escape(value: str) -> str:
+    # Так peewee экранирует значение в contains/startswith/endswith
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class _Markers:
+    """Выдаёт построителю запроса метки вместо значений параметров."""
+
+    def __init__(self, params: Dict[str, Any]):
+        self.markers: Dict[str, Any] = {}
+        for index, (name, value) in enumerate(sorted(params.items())):
+            if isinstance(value, int) and not isinstance(value, bool):
+                self.markers[name] = _INT_MARKER_BASE - index
+            else:
+                # % в метке нужен, чтобы увидеть, экранировал ли peewee значение для LIKE
+                self.markers[name] = f"\x00%{index}\x00"
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self.markers[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+class _Statement:
+    """Скомпилированный запрос: SQL, схема параметров и исходный запрос для сборки моделей."""
+
+    __slots__ = ("query", "sql", "bindings")
+
+    def __init__(self, query, markers: _Markers):
+        self.query = query
+        self.sql, template_params = query.sql()
+        # Для каждой позиции параметра: ("param", name) - подставить значение как есть,
+        # ("text", name, parts, escaped) - подставить внутрь строки (например, '%value%' у contains),
+        # экранировав значение для LIKE, если так сделал peewee,
+        # ("const", value) - константа, зашитая в сам запрос
+        self.bindings: List[Tuple[Any, ...]] = []
+        for value in template_params:
+            self.bindings.append(self._binding(value, markers))
+
+    @staticmethod
+    def _binding(value: Any, markers: _Markers) -> Tuple[Any, ...]:
+        for name, marker in markers.markers.items():
+            if value == marker and type(value) is type(marker):
+                return ("param", name)
+            if isinstance(value, str) and isinstance(marker, str):
+                if marker in value:
+                    return ("text", name, value.split(marker), False)
+                if _like_escape(marker) in value:
+                    return ("text", name, value.split(_like_escape(marker)), True)
+        return ("const", value)
+
+    def params(self, values: Dict[str, Any]) -> List[Any]:
+        result = []
+        for binding in self.bindings:
+            kind = binding[0]
+            if kind == "param":
+                result.append(values[binding[1]])
+            elif kind == "text":
+                value = str(values[binding[1]])
+                if binding[3]:
+                    value = _like_escape(value)
+                result.append(value.join(binding[2]))
+            else:
+                result.append(binding[1])
+        return result
+
+    def execute(self, values: Dict[str, Any]) -> list:
+        # База берётся в момент выполнения: модели могут быть перепривязаны (bind_ctx)
+        database = self.query.model._meta.database
+        cursor = database.execute_sql(self.sql, self.params(values))
+        return list(self.query._get_cursor_wrapper(cursor))
+
+
+class StatementCache:
+    def __init__(self):
+        self._statements: Dict[Tuple[Any, ...], _Statement] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def _statement(
+        self, builder: Callable, shape: Tuple[Any, ...], params: Dict[str, Any], single: bool
+    ) -> _Statement:
+        # Типы параметров тоже часть формы: от них зависят метки
+        key = (builder, shape, single, tuple(sorted((n, type(v)) for n, v in params.items())))
+        statement = self._statements.get(key)
+        if statement is not None:
+            self.stats["hits"] += 1
+            return statement
+
+        self.stats["misses"] += 1
+        markers = _Markers(params)
+        query = builder(markers, *shape)
+        if single:
+            query = query.limit(1)
+        statement = _Statement(query, markers)
+        with self._lock:
+            self._statements[key] = statement
+        return statement
+
+    def select(self, builder: Callable, shape: Tuple[Any, ...] = (), **params) -> list:
+        """Выполняет запрос формы (builder, shape) и возвращает список строк/моделей."""
+        return self._statement(builder, shape, params, single=False).execute(params)
+
+    def get(self, builder: Callable, shape: Tuple[Any, ...] = (), **params):
+        """
+        Как select(), но возвращает одну строку.
+
+        Raises:
+            DoesNotExist: Если ничего не найдено (исключение модели, как у Model.get)
+        """
+        statement = self._statement(builder, shape, params, single=True)
+        rows = statement.execute(params)
+        if not rows:
+            raise statement.query.model.DoesNotExist(
+                f"{statement.query.model.__name__} не найден: {params}"
+            )
+        return rows[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._statements.clear()
+
+
+# Общий кэш для utils.py
+statement_cache = StatementCache()
@@ -1,5 +1,5 @@
 from flask_restx import Namespace, Resource, fields
-from peewee import DoesNotExist
+from peewee import DoesNotExist, IntegrityError
 from utils import get_student_by_id, create_student
 from http import HTTPStatus
 
@@ -14,7 +14,7 @@ student_model = students_bp.model(
         "first_name": fields.String(required=True, description="Имя студента"),
         "middle_name": fields.String(description="Отчество студента"),
         "last_name": fields.String(required=True, description="Фамилия студента"),
-        "group_id": fields.Integer(required=True, description="ID группы"),
+        "group_id": fields.Integer(attribute="group_id.id", required=True, description="ID группы"),
         "group_name": fields.String(attribute="group_id.group_name", description="Название группы"),
         "notes": fields.String(description="Заметки о студенте"),
         "created_at": fields.DateTime(dt_format="rfc822", description="Дата создания записи"),
@@ -81,5 +81,5 @@ class StudentCreateResource(Resource):
             return student, HTTPStatus.CREATED
         except DoesNotExist:
             students_bp.abort(HTTPStatus.NOT_FOUND, "Группа не найдена")
-        except Exception as e:
+        except IntegrityError as e:
             students_bp.abort(HTTPStatus.BAD_REQUEST, str(e))
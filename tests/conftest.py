@@ -0,0 +1,72 @@
+"""
+Общие фикстуры тестов: приложение create_app() на временной базе, наполненной seed.py.
+
+Каждый тест работает в своём временном каталоге (результаты задач, файлы домашек,
+архивы и копии базы пишутся туда), рабочую базу academy_orm.db тесты не трогают.
+"""
+
+import time
+
+import pytest
+from flask.testing import FlaskClient
+
+import jobs
+import timetable
+from app import create_app
+from models import db, configure_db, Jobs, MODELS
+from seed import seed_database
+
+SEED = {"groups": 3, "students_per_group": 5, "lessons_per_group": 4}
+
+ADMIN = {"X-API-KEY": "admin_api_key"}
+MODERATOR = {"X-API-KEY": "moderator1_api_key"}
+USER = {"X-API-KEY": "user1_api_key"}
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / "academy_orm.db")
+    configure_db(path, 5.0)
+    db.create_tables(MODELS)
+    seed_database(**SEED)
+    db.close()
+    # Кэш недель живёт в процессе и не должен переходить между базами тестов
+    timetable._cache.clear()
+    yield path
+    if not db.is_closed():
+        db.close()
+
+
+class ClosingClient(FlaskClient):
+    """
+    Тестовый клиент, который дочитывает и закрывает ответ, как это делает WSGI сервер:
+    метрики и контроль допуска завершают запрос при закрытии ответа. Потоковый ответ
+    держится открытым с buffered=False.
+    """
+
+    def open(self, *args, buffered=True, **kwargs):
+        return super().open(*args, buffered=buffered, **kwargs)
+
+
+@pytest.fixture
+def app(db_path):
+    app = create_app({"DATABASE": db_path, "DATABASE_TIMEOUT": 5.0, "TESTING": True})
+    app.test_client_class = ClosingClient
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def wait_finished(job_id: int, timeout: float = 10.0) -> Jobs:
+    """Ждёт, пока фоновая задача завершится, и возвращает её строку Jobs."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = Jobs.get_by_id(job_id)
+        if job.status in jobs.FINISHED_STATUSES:
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"Задача {job_id} не завершилась за {timeout} с")
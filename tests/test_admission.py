@@ -0,0 +1,94 @@
+import pytest
+from peewee import OperationalError
+
+import admission
+from models import HomeworksStudents
+from tests.conftest import ADMIN, USER
+from utils import FILE_ACCEPTING_STATUSES
+
+
+def test_retry_on_locked_recovers():
+    calls = []
+
+    @admission.retry_on_locked(attempts=3, base_delay=0.001)
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise OperationalError("database is locked")
+        return "ok"
+
+    assert flaky() == "ok"
+    assert len(calls) == 3
+
+
+def test_retry_on_locked_gives_up_and_ignores_other_errors():
+    @admission.retry_on_locked(attempts=2, base_delay=0.001)
+    def locked():
+        raise OperationalError("database is locked")
+
+    @admission.retry_on_locked(attempts=5, base_delay=0.001)
+    def broken():
+        broken.calls += 1
+        raise OperationalError("no such table: x")
+
+    broken.calls = 0
+    with pytest.raises(OperationalError):
+        locked()
+    with pytest.raises(OperationalError):
+        broken()
+    assert broken.calls == 1
+
+
+def test_full_queue_is_shed_with_503(client, monkeypatch):
+    gate = admission.AdmissionGate("read", max_concurrent=0, max_queue=0, queue_timeout=0.1)
+    monkeypatch.setitem(admission.gates, "read", gate)
+
+    response = client.get("/group/list/", headers=ADMIN)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    # Мониторинг не ограничивается
+    assert client.get("/metrics").status_code == 200
+
+
+def test_locked_database_becomes_503(client, monkeypatch):
+    import groups_bp
+
+    def locked(*args, **kwargs):
+        raise OperationalError("database is locked")
+
+    monkeypatch.setattr(groups_bp, "get_groups_list", locked)
+    response = client.get("/group/list/", headers=ADMIN)
+    assert response.status_code == 503
+
+
+def test_streamed_export_holds_heavy_gate_until_closed(client, monkeypatch):
+    gate = admission.AdmissionGate("heavy", max_concurrent=1, max_queue=0, queue_timeout=0.1)
+    monkeypatch.setitem(admission.gates, "heavy", gate)
+
+    response = client.get("/export/gradebook", headers=ADMIN, buffered=False)
+    assert response.status_code == 200
+    # Тело выгрузки ещё не сгенерировано - место в классе занято
+    assert gate.active == 1
+    assert client.get("/export/gradebook", headers=ADMIN).status_code == 503
+
+    assert response.get_data()
+    response.close()
+    assert gate.active == 0
+    assert client.get("/export/gradebook", headers=ADMIN).status_code == 200
+    assert gate.active == 0
+
+
+def test_file_download_releases_gate(client, monkeypatch):
+    submission = (
+        HomeworksStudents.select().where(HomeworksStudents.status.in_(FILE_ACCEPTING_STATUSES)).first()
+    )
+    url = f"/homework/{submission.homework_id.id}/submissions/{submission.student_id.id}/file"
+    assert client.put(url, query_string={"filename": "work.zip"}, data=b"zip" * 1000, headers=USER).status_code == 201
+
+    gate = admission.AdmissionGate("read", max_concurrent=1, max_queue=0, queue_timeout=0.1)
+    monkeypatch.setitem(admission.gates, "read", gate)
+    # Файлы (send_file) werkzeug отдаёт мимо call_on_close - место освобождается в teardown
+    for _ in range(2):
+        response = client.get(url, headers=USER)
+        assert response.status_code == 200
+        assert gate.active == 0
@@ -0,0 +1,85 @@
+import datetime
+import os
+import sqlite3
+
+import archive
+from models import OnlineLessons, Homeworks, HomeworksStudents, StudentsOnlineLessons
+from tests.conftest import ADMIN
+
+# seed.py ставит занятия с 2024-09-02, учебный год 2024/25 уже закончился
+YEAR = 2024
+TODAY = datetime.date(2025, 9, 15)
+PERIOD = {"from": "2024-09-01", "to": "2024-12-31"}
+
+
+def _rows(model):
+    return sorted(model.select().tuples())
+
+
+def test_archive_round_trip(client):
+    before = {model: _rows(model) for model in archive.ARCHIVED_MODELS}
+    schedule = client.get("/lesson/schedule", query_string=PERIOD, headers=ADMIN).json
+
+    totals = archive.archive_year(YEAR, today=TODAY)
+    assert totals["groups"] == 3
+    for model in archive.ARCHIVED_MODELS:
+        assert totals[model._meta.table_name] == len(before[model])
+        assert model.select().count() == 0
+
+    # Без include_archived занятий больше нет, с ним - те же, что до переноса
+    assert client.get("/lesson/schedule", query_string=PERIOD, headers=ADMIN).json == []
+    archived = client.get(
+        "/lesson/schedule", query_string={**PERIOD, "include_archived": 1}, headers=ADMIN
+    ).json
+    assert archived == schedule
+
+    with archive.attached([YEAR]):
+        for model in archive.ARCHIVED_MODELS:
+            assert _rows(archive._archived_model(model, YEAR)) == before[model]
+
+
+def test_timetable_with_archive(client):
+    lesson = OnlineLessons.select().order_by(OnlineLessons.id).first()
+    query = {"week": lesson.lesson_date.isoformat()}
+    url = f"/lesson/timetable/{lesson.group_id.id}"
+    week = client.get(url, query_string=query, headers=ADMIN).json
+
+    archive.archive_year(YEAR, today=TODAY)
+    assert client.get(url, query_string=query, headers=ADMIN).json["lessons"] == []
+
+    response = client.get(url, query_string={**query, "include_archived": 1}, headers=ADMIN)
+    assert response.json["lessons"] == week["lessons"]
+    again = client.get(
+        url,
+        query_string={**query, "include_archived": 1},
+        headers={**ADMIN, "If-None-Match": response.headers["ETag"]},
+    )
+    assert again.status_code == 304
+
+
+def test_archive_created_by_older_models(db_path):
+    # Архив прошлой версии: другой порядок колонок и нет lesson_notes
+    os.makedirs(archive.ARCHIVE_DIR, exist_ok=True)
+    connection = sqlite3.connect(archive.archive_path(YEAR))
+    connection.execute(
+        'CREATE TABLE "onlinelessons" ("lesson_theme" TEXT, "id" INTEGER PRIMARY KEY, "group_id" INTEGER, '
+        '"lesson_date" DATE, "lesson_time" TIME, "academic_hours" INTEGER, "telegram_record_link" TEXT, '
+        '"created_at" DATETIME, "updated_at" DATETIME)'
+    )
+    connection.close()
+    OnlineLessons.update(lesson_notes="заметка").execute()
+    themes = dict(OnlineLessons.select(OnlineLessons.id, OnlineLessons.lesson_theme).tuples())
+
+    archive.archive_year(YEAR, today=TODAY)
+
+    with archive.attached([YEAR]):
+        model = archive._archived_model(OnlineLessons, YEAR)
+        rows = list(model.select(model.id, model.lesson_theme, model.lesson_notes).tuples())
+    assert {lesson_id: theme for lesson_id, theme, _ in rows} == themes
+    assert {notes for _, _, notes in rows} == {"заметка"}
+
+
+def test_unfinished_year_is_not_archived(db_path):
+    assert archive.archive_year(YEAR, today=datetime.date(2025, 3, 1))["groups"] == 0
+    assert Homeworks.select().count() and HomeworksStudents.select().count()
+    assert StudentsOnlineLessons.select().count()
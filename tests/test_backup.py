@@ -0,0 +1,61 @@
+import json
+import sqlite3
+
+import pytest
+
+import backup
+from models import Students
+from tests.conftest import ADMIN, MODERATOR, wait_finished
+
+
+def _count(path, table):
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        connection.close()
+
+
+@pytest.mark.parametrize("mode", backup.MODES)
+def test_backup_is_a_verified_copy(app, tmp_path, mode):
+    dest = str(tmp_path / f"copy_{mode}.db")
+    steps = []
+    report = backup.create_backup(mode, dest, pages=4, sleep=0, progress=lambda done, total: steps.append(done))
+
+    assert report["path"] == dest and report["integrity_check"] == "ok"
+    assert not (tmp_path / f"copy_{mode}.db.part").exists()
+    assert _count(dest, Students._meta.table_name) == Students.select().count()
+    if mode == "online":
+        # По 4 страницы за шаг - прогресс приходит много раз
+        assert len(steps) > 1 and steps[-1] == report["pages"]
+
+
+def test_verify_rejects_a_broken_file(tmp_path):
+    broken = tmp_path / "broken.db"
+    broken.write_bytes(b"SQLite format 3\x00" + b"\xff" * 4096)
+    with pytest.raises((backup.BackupError, sqlite3.DatabaseError)):
+        backup.verify(str(broken))
+
+
+def test_backup_job(client):
+    response = client.post("/admin/backup", json={"mode": "snapshot"}, headers=ADMIN)
+    assert response.status_code == 202
+
+    job = wait_finished(response.json["id"])
+    assert job.status == "done", job.error
+    with open(job.result_path, encoding="utf-8") as f:
+        report = json.load(f)
+    assert report["mode"] == "snapshot"
+    assert _count(report["path"], Students._meta.table_name) == Students.select().count()
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [{"mode": "tape"}, {"pages": 0}, {"pages": "10"}, {"pages": True}, {"sleep_ms": -1}, {"sleep_ms": "1"}],
+)
+def test_backup_validation(client, payload):
+    assert client.post("/admin/backup", json=payload, headers=ADMIN).status_code == 400
+
+
+def test_backup_requires_admin(client):
+    assert client.post("/admin/backup", json={}, headers=MODERATOR).status_code == 403
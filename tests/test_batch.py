@@ -0,0 +1,69 @@
+import batch
+from models import Groups, Students
+from tests.conftest import ADMIN
+
+
+def test_atomic_batch_with_refs_commits(client):
+    response = client.post(
+        "/batch/",
+        json={
+            "operations": [
+                {"op": "create_group", "ref": "g", "args": {"group_name": "python900"}},
+                {"op": "create_student", "ref": "s", "args": {"first_name": "Анна", "last_name": "Новая", "group_id": "$g"}},
+                {"op": "update_student", "args": {"student_id": "$s", "notes": "$g.group_name"}},
+            ]
+        },
+        headers=ADMIN,
+    )
+    assert response.status_code == 200
+    assert response.json["committed"] is True
+    assert [entry["status"] for entry in response.json["results"]] == ["ok", "ok", "ok"]
+
+    group = Groups.get(Groups.group_name == "python900")
+    student = Students.get(Students.id == response.json["results"][1]["result"]["id"])
+    assert student.group_id.id == group.id
+    assert student.notes == "python900"
+
+
+def test_atomic_batch_rollback_marks_earlier_operations(client):
+    response = client.post(
+        "/batch/",
+        json={
+            "operations": [
+                {"op": "create_group", "ref": "g", "args": {"group_name": "python901"}},
+                # Дубликат имени - IntegrityError, пакет откатывается целиком
+                {"op": "create_group", "args": {"group_name": "python413"}},
+            ]
+        },
+        headers=ADMIN,
+    )
+    assert response.status_code == 400
+    body = response.json
+    assert body["committed"] is False
+    assert body["results"][0]["status"] == "rolled_back"
+    assert body["results"][0].get("result") is None
+    assert body["results"][1]["status"] == "error"
+    assert not Groups.select().where(Groups.group_name == "python901").exists()
+
+
+def test_continue_batch_keeps_successful_operations(client):
+    response = client.post(
+        "/batch/",
+        json={
+            "mode": "continue",
+            "operations": [
+                {"op": "create_group", "args": {"group_name": "python902"}},
+                {"op": "create_group", "args": {"group_name": "python413"}},
+            ],
+        },
+        headers=ADMIN,
+    )
+    assert response.json["committed"] is True
+    assert [entry["status"] for entry in response.json["results"]] == ["ok", "error"]
+    assert Groups.select().where(Groups.group_name == "python902").exists()
+
+
+def test_refs_are_resolved_in_nested_arguments():
+    group = Groups(id=7, group_name="python907")
+    resolved = batch._resolve({"outer": {"id": "$g", "items": ["$g.group_name", {"deep": "$g"}]}}, {"g": group})
+    assert resolved == {"outer": {"id": 7, "items": ["python907", {"deep": 7}]}}
@@ -0,0 +1,108 @@
+import gzip
+
+import pytest
+
+import compression
+import metrics
+from models import Groups, HomeworksStudents
+from tests.conftest import USER
+from utils import FILE_ACCEPTING_STATUSES
+
+GZIP = {"Accept-Encoding": "gzip"}
+TEXT = ("строка отчёта о домашнем задании\n" * 4000).encode("utf-8")
+
+
+@pytest.fixture(autouse=True)
+def _empty_cache():
+    compression.compressed_cache.clear()
+    yield
+    compression.compressed_cache.clear()
+
+
+@pytest.fixture
+def calendar_url(db_path):
+    return f"/lesson/{Groups.select().first().id}/calendar.ics"
+
+
+@pytest.fixture
+def file_url(client):
+    submission = (
+        HomeworksStudents.select().where(HomeworksStudents.status.in_(FILE_ACCEPTING_STATUSES)).first()
+    )
+    url = f"/homework/{submission.homework_id.id}/submissions/{submission.student_id.id}/file"
+    assert client.put(url, query_string={"filename": "report.txt"}, data=TEXT, headers=USER).status_code == 201
+    return url
+
+
+def test_gzip_body_vary_and_etag(client, calendar_url, monkeypatch):
+    monkeypatch.setattr(compression, "MIN_SIZE", 1)
+    plain = client.get(calendar_url)
+    response = client.get(calendar_url, headers=GZIP)
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.vary
+    assert gzip.decompress(response.data) == plain.data
+    assert response.headers["ETag"] == plain.headers["ETag"][:-1] + '-gzip"'
+
+
+def test_small_response_is_not_compressed(client, calendar_url):
+    response = client.get(calendar_url, headers=GZIP)
+    assert len(response.data) < compression.MIN_SIZE
+    assert "Content-Encoding" not in response.headers
+
+
+def test_not_modified_comes_from_view(client, calendar_url, monkeypatch):
+    monkeypatch.setattr(compression, "MIN_SIZE", 1)
+    etag = client.get(calendar_url, headers=GZIP).headers["ETag"]
+
+    # 304 отвечает сам обработчик: до сжатия дело не доходит, даже без кэша сжатых тел
+    compression.compressed_cache.clear()
+
+    def fail(*args):
+        raise AssertionError("ответ 304 не должен собираться и сжиматься")
+
+    monkeypatch.setattr(compression, "compress", fail)
+    response = client.get(calendar_url, headers={**GZIP, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert "Accept-Encoding" in response.vary
+
+    # Несжатый ETag по-прежнему подходит клиенту без gzip
+    plain_etag = client.get(calendar_url).headers["ETag"]
+    assert client.get(calendar_url, headers={"If-None-Match": plain_etag}).status_code == 304
+
+
+def test_small_file_is_compressed(client, file_url):
+    response = client.get(file_url, headers={**USER, **GZIP})
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(response.data) == TEXT
+    assert "Accept-Ranges" not in response.headers
+
+    etag = response.headers["ETag"]
+    assert etag.endswith('-gzip"')
+    assert client.get(file_url, headers={**USER, **GZIP, "If-None-Match": etag}).status_code == 304
+
+
+def test_range_and_large_file_pass_through(client, file_url, monkeypatch):
+    partial = client.get(file_url, headers={**USER, **GZIP, "Range": "bytes=100-199"})
+    assert partial.status_code == 206
+    assert "Content-Encoding" not in partial.headers
+    assert partial.data == TEXT[100:200]
+
+    monkeypatch.setattr(compression, "MAX_FILE_SIZE", len(TEXT) - 1)
+    response = client.get(file_url, headers={**USER, **GZIP})
+    assert "Content-Encoding" not in response.headers
+    assert response.data == TEXT
+
+
+def test_cached_file_keeps_close_callbacks(client, file_url):
+    client.get(file_url, headers={**USER, **GZIP})
+    before = metrics._gauges["academy_http_requests_in_flight"][()]
+
+    # Второй раз сжатый файл берётся из кэша, а сам файл закрывается без чтения
+    response = client.get(file_url, headers={**USER, **GZIP}, buffered=False)
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert metrics._gauges["academy_http_requests_in_flight"][()] == before + 1
+    response.close()
+    assert metrics._gauges["academy_http_requests_in_flight"][()] == before
@@ -0,0 +1,57 @@
+import csv
+import gzip
+import io
+
+import pytest
+
+import export
+from models import Students
+from tests.conftest import ADMIN, MODERATOR, SEED
+
+
+def _rows(data: bytes):
+    return list(csv.reader(io.StringIO(data.decode("utf-8"))))
+
+
+def test_csv_gradebook(client):
+    response = client.get("/export/gradebook", headers=ADMIN)
+    assert response.status_code == 200
+    assert response.mimetype == "text/csv"
+    assert "gradebook_all.csv" in response.headers["Content-Disposition"]
+
+    header, *rows = _rows(response.data)
+    assert header == list(export.columns(SEED["lessons_per_group"]))
+    assert len(rows) == Students.select().count()
+    student = Students.get_by_id(int(rows[0][0]))
+    assert rows[0][1:3] == [student.last_name, student.first_name]
+    marks = [value for row in rows for value in row[len(export.STUDENT_COLUMNS):] if value]
+    assert marks and all(1 <= int(value) <= 12 for value in marks)
+
+
+def test_csv_gradebook_gzip_and_group(client):
+    plain = client.get("/export/gradebook?group_id=2", headers=ADMIN).data
+    response = client.get("/export/gradebook?group_id=2", headers={**ADMIN, "Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(response.data) == plain
+    rows = _rows(plain)[1:]
+    assert len(rows) == SEED["students_per_group"]
+    assert {row[4] for row in rows} == {"2"}
+
+
+def test_chunks_do_not_change_the_result(client, monkeypatch):
+    whole = client.get("/export/gradebook", headers=ADMIN).data
+    monkeypatch.setattr(export, "CHUNK_SIZE", 2)
+    assert client.get("/export/gradebook", headers=ADMIN).data == whole
+
+
+@pytest.mark.skipif(export.PYARROW_INSTALLED, reason="pyarrow установлен")
+def test_columnar_formats_need_pyarrow(client):
+    for export_format in ("arrow", "parquet"):
+        response = client.get(f"/export/gradebook?format={export_format}", headers=ADMIN)
+        assert response.status_code == 400
+
+
+def test_export_validation(client):
+    assert client.get("/export/gradebook?format=xlsx", headers=ADMIN).status_code == 400
+    assert client.get("/export/gradebook?group_id=x", headers=ADMIN).status_code == 400
+    assert client.get("/export/gradebook", headers=MODERATOR).status_code == 403
@@ -0,0 +1,81 @@
+from models import HomeworksStudents
+from tests.conftest import MODERATOR, USER
+
+
+def _submission(status: str) -> HomeworksStudents:
+    return HomeworksStudents.select().where(HomeworksStudents.status == status).first()
+
+
+def test_grading_changes_only_what_differs(client):
+    submission = _submission("принято")
+    homework_id = submission.__data__["homework_id"]
+    student_id = submission.__data__["student_id"]
+
+    response = client.patch(
+        f"/homework/{homework_id}/submissions",
+        json={"submissions": [{"student_id": student_id, "status": "проверено", "mark": 11}]},
+        headers=MODERATOR,
+    )
+    assert response.status_code == 200
+    assert [item["student_id"] for item in response.json["changed"]] == [student_id]
+    stored = HomeworksStudents.get_by_id(submission.id)
+    assert (stored.status, stored.mark) == ("проверено", 11)
+    assert stored.checked_date is not None
+
+    # Повтор тех же оценок ничего не меняет
+    response = client.patch(
+        f"/homework/{homework_id}/submissions",
+        json={"submissions": [{"student_id": student_id, "status": "проверено", "mark": 11}]},
+        headers=MODERATOR,
+    )
+    assert response.json["changed"] == []
+
+
+def test_grading_rejects_status_going_back_atomically(client):
+    checked = _submission("проверено")
+    homework_id = checked.__data__["homework_id"]
+    others = list(
+        HomeworksStudents.select().where(
+            (HomeworksStudents.homework_id == homework_id) & (HomeworksStudents.id != checked.id)
+        )
+    )
+    grades = [{"student_id": other.__data__["student_id"], "mark": 5} for other in others]
+    grades.append({"student_id": checked.__data__["student_id"], "status": "не сдано"})
+
+    response = client.patch(f"/homework/{homework_id}/submissions", json={"submissions": grades}, headers=MODERATOR)
+    assert response.status_code == 409
+    assert response.json["conflicts"][0]["student_id"] == checked.__data__["student_id"]
+    # Ни одна оценка из пачки не применилась
+    for other in others:
+        assert HomeworksStudents.get_by_id(other.id).mark == other.mark
+
+
+def test_grading_validation_and_access(client):
+    submission = _submission("принято")
+    homework_id = submission.__data__["homework_id"]
+    student_id = submission.__data__["student_id"]
+
+    assert client.patch(f"/homework/{homework_id}/submissions", json={"submissions": []}, headers=MODERATOR).status_code == 400
+    assert (
+        client.patch(
+            f"/homework/{homework_id}/submissions",
+            json={"submissions": [{"student_id": student_id, "mark": 13}]},
+            headers=MODERATOR,
+        ).status_code
+        == 400
+    )
+    for mark in (True, False, 5.0, "5"):
+        response = client.patch(
+            f"/homework/{homework_id}/submissions",
+            json={"submissions": [{"student_id": student_id, "mark": mark}]},
+            headers=MODERATOR,
+        )
+        assert response.status_code == 400, mark
+    assert HomeworksStudents.get_by_id(submission.id).mark == submission.mark
+    assert client.patch("/homework/999/submissions", json={"submissions": [{"student_id": 1}]}, headers=MODERATOR).status_code == 404
+    assert (
+        client.patch(
+            f"/homework/{homework_id}/submissions", json={"submissions": [{"student_id": student_id}]}, headers=USER
+        ).status_code
+        == 403
+    )
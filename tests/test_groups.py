@@ -0,0 +1,49 @@
+import counters
+from models import Groups, Students, GroupCounters
+from tests.conftest import ADMIN, SEED
+
+
+def test_group_responses_keep_their_shape(client):
+    group = Groups.select().first()
+    response = client.get(f"/group/{group.id}", headers=ADMIN)
+    assert response.status_code == 200
+    assert set(response.json) == {"id", "group_name", "created_at"}
+
+    response = client.get("/group/list/", headers=ADMIN)
+    assert response.status_code == 200
+    assert all(set(item) == {"id", "group_name", "created_at"} for item in response.json)
+
+
+def test_list_with_counters(client):
+    response = client.get("/group/list/?with_counters=1", headers=ADMIN)
+    assert response.status_code == 200
+    assert len(response.json) == SEED["groups"]
+    for item in response.json:
+        assert item["students_count"] == SEED["students_per_group"]
+        assert item["lessons_count"] == SEED["lessons_per_group"]
+        assert "pending_homeworks_count" in item
+
+
+def test_counters_follow_writes(client):
+    group = Groups.select().order_by(Groups.id).first()
+    other = Groups.select().order_by(Groups.id.desc()).first()
+    client.post(
+        "/student/create/",
+        json={"first_name": "Анна", "last_name": "Новая", "group_id": group.id},
+        headers=ADMIN,
+    )
+    moved = Students.select().where(Students.group_id == group.id).first()
+    Students.update(group_id=other.id).where(Students.id == moved.id).execute()
+
+    listed = {item["id"]: item for item in client.get("/group/list/?with_counters=1", headers=ADMIN).json}
+    # +1 созданный и -1 переведённый
+    assert listed[group.id]["students_count"] == SEED["students_per_group"]
+    assert listed[other.id]["students_count"] == SEED["students_per_group"] + 1
+    assert counters.reconcile() == []
+
+
+def test_reconcile_repairs_drift(app):
+    GroupCounters.update(students_count=0).execute()
+    drift = counters.reconcile(repair=True)
+    assert drift
+    assert counters.reconcile() == []
@@ -0,0 +1,83 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+import homework_files
+import homeworks_bp
+from models import HomeworksStudents
+from tests.conftest import ADMIN, USER
+from utils import FILE_ACCEPTING_STATUSES
+
+CONTENT = os.urandom(200 * 1024)
+
+
+@pytest.fixture
+def submission(db_path):
+    return HomeworksStudents.select().where(HomeworksStudents.status.in_(FILE_ACCEPTING_STATUSES)).first()
+
+
+def _url(submission):
+    return f"/homework/{submission.homework_id.id}/submissions/{submission.student_id.id}/file"
+
+
+def _upload(client, submission, data=CONTENT, name="work.zip"):
+    return client.put(_url(submission), query_string={"filename": name}, data=data, headers=USER)
+
+
+def test_upload_and_download(client, submission):
+    response = _upload(client, submission)
+    assert response.status_code == 201
+    assert response.json["sha256"] == hashlib.sha256(CONTENT).hexdigest()
+    assert response.json["size"] == len(CONTENT) and response.json["deduplicated"] is False
+
+    download = client.get(_url(submission), headers=USER)
+    assert download.status_code == 200
+    assert download.data == CONTENT
+    assert "work.zip" in download.headers["Content-Disposition"]
+    assert download.cache_control.private and not download.cache_control.public
+
+
+def test_range_and_conditional(client, submission):
+    _upload(client, submission)
+    partial = client.get(_url(submission), headers={**USER, "Range": "bytes=100-199"})
+    assert partial.status_code == 206
+    assert partial.data == CONTENT[100:200]
+    assert partial.headers["Content-Range"] == f"bytes 100-199/{len(CONTENT)}"
+
+    etag = client.get(_url(submission), headers=USER).headers["ETag"]
+    assert client.get(_url(submission), headers={**USER, "If-None-Match": etag}).status_code == 304
+
+
+def test_same_content_is_stored_once(client, submission):
+    _upload(client, submission)
+    other = (
+        HomeworksStudents.select()
+        .where(HomeworksStudents.status.in_(FILE_ACCEPTING_STATUSES) & (HomeworksStudents.id != submission.id))
+        .first()
+    )
+    response = _upload(client, other, name="copy.zip")
+    assert response.status_code == 201 and response.json["deduplicated"] is True
+    blobs = [name for _, _, names in os.walk(homework_files.FILES_DIR) for name in names]
+    assert blobs == [hashlib.sha256(CONTENT).hexdigest()]
+
+
+def test_too_large(client, submission, monkeypatch):
+    monkeypatch.setattr(homeworks_bp, "MAX_FILE_SIZE", 1024)
+    assert _upload(client, submission).status_code == 413
+    # Без Content-Length лимит проверяется по ходу записи, недописанный файл удаляется
+    with pytest.raises(homework_files.FileTooLarge):
+        homework_files.store_stream(io.BytesIO(CONTENT), max_size=1024)
+    assert os.listdir(os.path.join(homework_files.FILES_DIR, "tmp")) == []
+
+
+def test_graded_submission_is_locked(client, submission):
+    HomeworksStudents.update(status="проверено").where(HomeworksStudents.id == submission.id).execute()
+    assert _upload(client, submission).status_code == 409
+
+
+def test_missing_file_and_key(client, submission):
+    assert client.get(_url(submission), headers=USER).status_code == 404
+    assert client.get(_url(submission)).status_code == 401
+    assert client.get("/homework/999999/submissions/1/file", headers=ADMIN).status_code == 404
@@ -0,0 +1,122 @@
+import os
+import subprocess
+import sys
+import threading
+
+import jobs
+import reports
+from models import db, Groups, Jobs, Students, StudentsReviews
+from tests.conftest import ADMIN, wait_finished
+
+
+def _dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_reviews_job_creates_review_per_student(client):
+    response = client.post(
+        "/jobs/reviews/",
+        json={"review_start_date": "2024-09-01", "review_end_date": "2024-12-31"},
+        headers=ADMIN,
+    )
+    assert response.status_code == 202
+
+    job = wait_finished(response.json["id"])
+    assert job.status == "done", job.error
+    assert job.done_units == job.total_units == 3
+    assert StudentsReviews.select().count() == Students.select().count()
+
+    body = client.get(f"/jobs/{job.id}", headers=ADMIN).json
+    assert body["progress"] == 1.0
+
+
+def test_init_jobs_recovers_jobs_of_dead_process(app):
+    dead_pid = _dead_pid()
+    queued = Jobs.create(
+        job_type="students_reviews",
+        params='{"review_start_date": "2024-09-01", "review_end_date": "2024-12-31"}',
+        worker_pid=dead_pid,
+    )
+    running = Jobs.create(job_type="students_reviews", status="running", worker_pid=dead_pid)
+    unknown = Jobs.create(job_type="no_such_job", worker_pid=dead_pid)
+
+    jobs.init_jobs()
+
+    assert wait_finished(queued.id).status == "done"
+    assert Jobs.get_by_id(running.id).status == "failed"
+    assert Jobs.get_by_id(unknown.id).status == "failed"
+
+
+def test_init_jobs_keeps_jobs_of_live_process(app):
+    # Задача в очереди живого процесса (этого) - не наша забота, её выполнит он сам
+    job = Jobs.create(job_type="students_reviews", worker_pid=os.getpid())
+
+    jobs.init_jobs()
+
+    assert Jobs.get_by_id(job.id).status == "queued"
+
+
+def test_map_closes_worker_connections(app):
+    def touch(item):
+        db.connect(reuse_if_open=True)
+        return item * 2
+
+    ctx = jobs.JobContext(Jobs.create(job_type="students_reviews").id, jobs._job_types["students_reviews"])
+    assert ctx.map(touch, range(6)) == [0, 2, 4, 6, 8, 10]
+
+    # Соединения peewee хранит по потокам: проверяем их в каждом потоке пула
+    still_open = []
+    barrier = threading.Barrier(jobs.JOB_WORKERS)
+
+    def check():
+        still_open.append(not db.is_closed())
+        barrier.wait(timeout=5)
+
+    futures = [jobs._get_workers().submit(check) for _ in range(jobs.JOB_WORKERS)]
+    for future in futures:
+        future.result()
+    assert not any(still_open)
+
+
+def test_reviews_job_rejects_bad_group_ids(client):
+    period = {"review_start_date": "2024-09-01", "review_end_date": "2024-12-31"}
+    for group_ids in (None, 5, [], ["1"], [True], {"id": 1}):
+        response = client.post("/jobs/reviews/", json={**period, "group_ids": group_ids}, headers=ADMIN)
+        assert response.status_code == 400, group_ids
+
+
+def test_cancel_running_job_leaves_no_reviews(client, monkeypatch):
+    first_group = Groups.select(Groups.id).order_by(Groups.id).first().id
+    release = threading.Event()
+    first_built = threading.Event()
+    build = reports.build_group_reviews
+
+    def slow_build(group_id, *args):
+        # Первая группа считается сразу, остальные - пока тест не отменит задачу
+        if group_id != first_group:
+            release.wait(timeout=10)
+            return build(group_id, *args)
+        rows = build(group_id, *args)
+        first_built.set()
+        return rows
+
+    monkeypatch.setattr(reports, "build_group_reviews", slow_build)
+    reviews_before = StudentsReviews.select().count()
+    response = client.post(
+        "/jobs/reviews/",
+        json={"review_start_date": "2024-09-01", "review_end_date": "2024-12-31"},
+        headers=ADMIN,
+    )
+    job_id = response.json["id"]
+
+    assert first_built.wait(timeout=10)
+    assert Jobs.get_by_id(job_id).status == "running"
+
+    cancelled = client.post(f"/jobs/{job_id}/cancel", headers=ADMIN)
+    assert cancelled.status_code == 200 and cancelled.json["cancel_requested"] is True
+    release.set()
+
+    assert wait_finished(job_id).status == "cancelled"
+    assert StudentsReviews.select().count() == reviews_before
@@ -0,0 +1,83 @@
+import json
+import os
+import subprocess
+import sys
+
+import metrics
+from tests.conftest import ADMIN
+
+
+def _dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def _counter(text: str, line_prefix: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(line_prefix):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def _write_snapshot(directory, pid: int, started: float, requests: int, in_flight: int) -> str:
+    labels = [["method", "GET"], ["route", "/old"], ["status", "200"]]
+    path = os.path.join(directory, f"metrics_{pid}_{int(started * 1000)}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "pid": pid,
+                "started": started,
+                "counters": {"academy_http_requests_total": [[labels, requests]]},
+                "gauges": {"academy_http_requests_in_flight": [[[], in_flight]]},
+                "histograms": {},
+                "buckets": {},
+            },
+            f,
+        )
+    return path
+
+
+def test_metrics_endpoint_counts_requests(client):
+    client.get("/group/list/", headers=ADMIN)
+    text = client.get("/metrics").get_data(as_text=True)
+    assert _counter(text, 'academy_http_requests_total{method="GET",route="/group/list/",status="200"}') >= 1
+
+
+def test_streamed_response_is_in_flight_until_closed(client):
+    before = _counter(metrics.render(), "academy_http_requests_in_flight ")
+    line = 'academy_http_requests_total{method="GET",route="/export/gradebook",status="200"}'
+    requests_before = _counter(metrics.render(), line)
+
+    response = client.get("/export/gradebook", headers=ADMIN, buffered=False)
+    assert response.status_code == 200
+    # Тело ещё не отдано - запрос всё ещё выполняется
+    assert _counter(metrics.render(), "academy_http_requests_in_flight ") == before + 1
+    assert _counter(metrics.render(), line) == requests_before
+
+    assert response.get_data()
+    response.close()
+    assert _counter(metrics.render(), "academy_http_requests_in_flight ") == before
+    assert _counter(metrics.render(), line) == requests_before + 1
+
+
+def test_dead_snapshots_are_retired_without_losing_counters(tmp_path, monkeypatch):
+    directory = str(tmp_path / "metrics")
+    os.makedirs(directory)
+    monkeypatch.setattr(metrics, "METRICS_DIR", directory)
+
+    dead = _write_snapshot(directory, _dead_pid(), 100.0, requests=5, in_flight=3)
+    # Тот же pid, что у этого процесса, но старый старт: процесс, чей pid нам достался
+    reused = _write_snapshot(directory, os.getpid(), 50.0, requests=7, in_flight=2)
+
+    line = 'academy_http_requests_total{method="GET",route="/old",status="200"}'
+    text = metrics.render()
+    assert _counter(text, line) == 12
+    assert _counter(text, "academy_http_requests_in_flight ") == 0
+    assert not os.path.exists(dead) and not os.path.exists(reused)
+    assert os.path.exists(os.path.join(directory, metrics.RETIRED_FILE))
+
+    # Повторная сборка не удваивает перенесённые счётчики
+    assert _counter(metrics.render(), line) == 12
+    own = [name for name in os.listdir(directory) if name.startswith(f"metrics_{os.getpid()}_")]
+    assert len(own) == 1
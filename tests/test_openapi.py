@@ -0,0 +1,60 @@
+import gzip
+import json
+
+import openapi
+from app import create_app
+from tests.conftest import ClosingClient
+
+
+def test_spec_etag_and_versioned_url(client):
+    response = client.get("/swagger.json")
+    assert response.status_code == 200
+    spec = json.loads(response.data)
+    assert "/group/list/" in spec["paths"]
+    assert response.cache_control.public and response.cache_control.max_age == openapi.SPEC_MAX_AGE
+    etag = response.headers["ETag"]
+
+    again = client.get("/swagger.json", headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.data == b""
+
+    versioned = client.get(response.headers["Content-Location"])
+    assert versioned.status_code == 200 and versioned.data == response.data
+    assert versioned.cache_control.immutable
+    assert client.get("/swagger.000000000000.json").status_code == 404
+
+
+def test_spec_gzip(client):
+    plain = client.get("/swagger.json")
+    response = client.get("/swagger.json", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.vary
+    assert gzip.decompress(response.data) == plain.data
+    assert response.headers["ETag"] != plain.headers["ETag"]
+
+    again = client.get(
+        "/swagger.json", headers={"Accept-Encoding": "gzip", "If-None-Match": response.headers["ETag"]}
+    )
+    assert again.status_code == 304
+
+
+def test_spec_from_file(db_path, tmp_path):
+    spec_file = tmp_path / "swagger.json"
+    spec_file.write_bytes(b'{"swagger": "2.0", "paths": {}}')
+    app = create_app({"DATABASE": db_path, "SWAGGER_SPEC_FILE": str(spec_file)})
+    app.test_client_class = ClosingClient
+    assert app.test_client().get("/swagger.json").data == spec_file.read_bytes()
+
+
+def test_swagger_ui_assets(client):
+    response = client.get("/swaggerui/swagger-ui-bundle.js")
+    assert response.status_code == 200
+    assert response.cache_control.max_age == openapi.ASSETS_MAX_AGE
+    response.close()
+
+
+def test_spec_without_ui(db_path):
+    app = create_app({"DATABASE": db_path, "SWAGGER_UI": False})
+    app.test_client_class = ClosingClient
+    client = app.test_client()
+    assert client.get("/swaggerui/swagger-ui-bundle.js").status_code == 404
+    assert client.get("/swagger.json").status_code == 200
@@ -0,0 +1,88 @@
+import threading
+
+import pytest
+
+import groups_bp
+import profiler
+from tests.conftest import ADMIN
+
+
+@pytest.fixture(autouse=True)
+def _reset_profiler():
+    yield
+    profiler.reset_capture()
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        {"seconds": "5"},
+        {"requests": "3"},
+        {"requests": True},
+        {"requests": 3, "interval_ms": "x"},
+        {"requests": 3, "route": 5},
+        {"requests": 0},
+        {"seconds": profiler.MAX_SECONDS + 1},
+        {"mode": "gprof", "requests": 3},
+        {},
+    ],
+)
+def test_profiler_rejects_bad_input(client, payload):
+    response = client.post("/admin/profiler/", json=payload, headers=ADMIN)
+    assert response.status_code == 400
+
+
+def test_profiler_requires_admin(client):
+    response = client.post("/admin/profiler/", json={"requests": 1}, headers={"X-API-KEY": "user1_api_key"})
+    assert response.status_code == 403
+
+
+def test_cprofile_captures_requests(client):
+    response = client.post("/admin/profiler/", json={"mode": "cprofile", "requests": 2}, headers=ADMIN)
+    assert response.status_code == 201
+    client.get("/group/list/", headers=ADMIN)
+    client.get("/group/list/", headers=ADMIN)
+
+    status = client.get("/admin/profiler/", headers=ADMIN).json
+    assert status["requests_profiled"] == 2
+    assert not status["active"]
+    text = client.get("/admin/profiler/result?format=text", headers=ADMIN).get_data(as_text=True)
+    assert "get_groups_list" in text
+
+
+def test_sample_capture_is_time_bounded(monkeypatch):
+    monkeypatch.setattr(profiler, "MAX_SECONDS", 0.1)
+    capture = profiler.ProfileCapture(mode="sample", requests=5, interval_ms=1)
+    capture._sampler.join(timeout=2)
+    assert not capture._sampler.is_alive()
+    assert not capture.active
+
+
+def test_cprofile_profiles_one_request_at_a_time(app, monkeypatch):
+    # Оба запроса одновременно внутри обработчика: второй cProfile на Python 3.12+ падал бы
+    barrier = threading.Barrier(2)
+    get_groups_list = groups_bp.get_groups_list
+
+    def overlapping(*args):
+        barrier.wait(timeout=5)
+        return get_groups_list(*args)
+
+    monkeypatch.setattr(groups_bp, "get_groups_list", overlapping)
+    capture = profiler.start_capture(mode="cprofile", requests=5)
+
+    statuses = []
+
+    def call():
+        statuses.append(app.test_client().get("/group/list/", headers=ADMIN).status_code)
+
+    threads = [threading.Thread(target=call) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    assert statuses == [200, 200]
+    assert capture.requests_profiled == 1
+    # Пропущенный запрос места в лимите не занимает
+    assert capture.requests_left == 4
+    assert capture.active
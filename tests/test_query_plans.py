@@ -0,0 +1,45 @@
+import migrate_indexes
+import query_plans
+from models import db, Groups
+from tests.conftest import SEED
+
+
+def test_query_plans_have_no_violations(db_path, monkeypatch):
+    checked = []
+    check_plan = query_plans.check_plan
+
+    def recording_check_plan(sql, *args):
+        checked.append(sql)
+        return check_plan(sql, *args)
+
+    monkeypatch.setattr(query_plans, "check_plan", recording_check_plan)
+    assert query_plans.run() == 0
+
+    # Проверены и записи, и чтение из архива
+    assert any(sql.startswith("UPDATE") for sql in checked)
+    assert any(sql.startswith("DELETE") for sql in checked)
+    assert any(f'"arch_{query_plans.ARCHIVE_YEAR}"' in sql for sql in checked)
+
+    # db снова привязана к базе теста
+    assert db.database == db_path
+    assert Groups.select().count() == SEED["groups"]
+
+
+def test_migrate_indexes_builds_missing_and_drops_replaced(db_path):
+    # База в состоянии до миграции: старые индексы есть, новых нет
+    db.execute_sql('DROP INDEX "onlinelessons_lesson_date_lesson_time"')
+    db.execute_sql('CREATE INDEX "onlinelessons_lesson_date" ON "onlinelessons" ("lesson_date")')
+    db.execute_sql('CREATE INDEX "students_group_id_first_name" ON "students" ("group_id", "first_name")')
+
+    assert migrate_indexes.migrate(dry_run=True) == {
+        "onlinelessons_lesson_date_lesson_time": ("created", 0.0),
+        "onlinelessons_lesson_date": ("dropped", 0.0),
+        "students_group_id_first_name": ("dropped", 0.0),
+    }
+    report = migrate_indexes.migrate(pause=0)
+    assert {name: action for name, (action, _) in report.items()} == {
+        "onlinelessons_lesson_date_lesson_time": "created",
+        "onlinelessons_lesson_date": "dropped",
+        "students_group_id_first_name": "dropped",
+    }
+    assert migrate_indexes.migrate(pause=0) == {}
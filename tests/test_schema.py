@@ -0,0 +1,15 @@
+import datetime
+
+from models import db, Homeworks, OnlineLessons
+
+
+def test_homework_deadline_defaults_to_a_week(db_path):
+    # DEFAULT с выражением SQLite принимает только в скобках: DEFAULT (DATE('now', '+7 days'))
+    lesson = OnlineLessons.select().first()
+    homework_id = (
+        Homeworks.insert(online_lesson_id=lesson.id, summary="s", homework_text="t", homework_date=datetime.date.today())
+        .execute()
+    )
+    deadline = db.execute_sql("SELECT deadline_date FROM homeworks WHERE id = ?", (homework_id,)).fetchone()[0]
+    utc_today = db.execute_sql("SELECT DATE('now')").fetchone()[0]
+    assert deadline == (datetime.date.fromisoformat(utc_today) + datetime.timedelta(days=7)).isoformat()
@@ -0,0 +1,31 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, sys
+from app import create_app
+app = create_app({"DATABASE": sys.argv[1], "COMPRESSION": False})
+app.test_client().get("/group/list/", headers={"X-API-KEY": "admin_api_key"})
+print(json.dumps(sorted(set(sys.modules) & {"compression", "archive", "cProfile", "pstats", "pyarrow"})))
+"""
+
+
+def test_optional_modules_are_not_imported(db_path):
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE, db_path], cwd=ROOT, capture_output=True, text=True, timeout=60
+    )
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout.strip().splitlines()[-1]) == []
+
+
+def test_default_app_is_built_on_first_access(db_path):
+    env = {**os.environ, "ACADEMY_DB_PATH": db_path}
+    result = subprocess.run(
+        [sys.executable, "-c", "import app; assert 'app' not in vars(app); app.app.test_client()"],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+
+import pytest
+
+import utils
+from models import Groups, Students
+from statement_cache import statement_cache
+
+NAMES = ["50% скидка", "100%", "a_b", "ab", "back\\slash", "back\\\\slash", "Группа Ёж", "группа еж"]
+FILTERS = ["%", "_", "\\", "\\\\", "0%", "a_b", "Ё", "Группа", "ж", "%_\\", "нет такой"]
+
+
+@pytest.fixture
+def groups(app):
+    statement_cache.clear()
+    for name in NAMES:
+        utils.create_group(name)
+    yield
+    statement_cache.clear()
+
+
+def _names(groups):
+    return [group.group_name for group in groups]
+
+
+@pytest.mark.parametrize("with_counters", [False, True])
+@pytest.mark.parametrize("sort_direction", ["asc", "desc"])
+def test_groups_list_matches_uncached_query(groups, sort_direction, with_counters):
+    for name_filter in FILTERS + [None]:
+        shape = (sort_direction, bool(name_filter), with_counters)
+        expected = list(utils._groups_list_query(SimpleNamespace(name_filter=name_filter), *shape))
+        # Дважды: второй вызов идёт по уже скомпилированному запросу
+        for _ in range(2):
+            cached = utils.get_groups_list(sort_direction, name_filter, with_counters)
+            assert _names(cached) == _names(expected), name_filter
+        if with_counters:
+            assert [g.students_count for g in cached] == [g.students_count for g in expected]
+
+    assert statement_cache.stats["hits"] > 0
+    assert _names(utils.get_groups_list(sort_direction, "%")) == sorted(
+        ["50% скидка", "100%"], reverse=sort_direction == "desc"
+    )
+    assert _names(utils.get_groups_list(sort_direction, "_")) == ["a_b"]
+    assert _names(utils.get_groups_list(sort_direction, "\\\\")) == ["back\\\\slash"]
+
+
+def test_groups_list_rejects_unknown_sort_direction(groups):
+    with pytest.raises(ValueError):
+        utils.get_groups_list("ASC")
+    assert not any(key[1][0] == "ASC" for key in statement_cache._statements)
+
+
+@pytest.mark.parametrize("expand", [False, True])
+def test_student_by_id_matches_uncached_query(groups, expand):
+    expand_fields = ["group"] if expand else None
+    for student in Students.select().order_by(Students.id):
+        expected = utils._student_by_id_query(SimpleNamespace(student_id=student.id), expand).get()
+        cached = utils.get_student_by_id(student.id, expand_fields)
+        assert cached.__data__ == expected.__data__
+        if expand:
+            assert cached.group_id.group_name == Groups.get_by_id(student.group_id).group_name
+
+    assert utils.get_student_by_id(999999, expand_fields) is None
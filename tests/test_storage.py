@@ -0,0 +1,89 @@
+import datetime
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+from peewee import Model
+
+from db_fields import EnumCodeField, EpochDateTimeField, sql_literal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATUSES = ("не сдано", "принято", "проверено")
+
+
+class _Row(Model):
+    status = EnumCodeField(STATUSES)
+    stamp = EpochDateTimeField()
+
+# Запускается в отдельном процессе: режим хранения выбирается при импорте models
+CHECK_SCRIPT = """
+import json
+import counters
+from models import HomeworksStudents, Students
+print(json.dumps({
+    "statuses": sorted({row.status for row in HomeworksStudents.select()}),
+    "created": min(student.created_at for student in Students.select()).isoformat(),
+    "drift": counters.reconcile(),
+}))
+"""
+
+
+def _run(db_path, compact, *args):
+    env = {**os.environ, "ACADEMY_DB_PATH": db_path, "ACADEMY_COMPACT_STORAGE": "1" if compact else "0"}
+    result = subprocess.run(
+        [sys.executable, *args], cwd=ROOT, env=env, capture_output=True, text=True, timeout=60
+    )
+    assert result.returncode == 0, result.stderr
+    return result.stdout
+
+
+def _dump(db_path, table):
+    connection = sqlite3.connect(db_path)
+    try:
+        return connection.execute(f"SELECT * FROM {table} ORDER BY id").fetchall()
+    finally:
+        connection.close()
+
+
+def test_enum_code_field():
+    field = _Row.status
+    assert field.db_value("проверено") == 2
+    assert field.python_value(2) == "проверено"
+    # Уже переведённые значения и NULL проходят как есть
+    assert field.db_value(1) == 1 and field.db_value(None) is None
+    assert sql_literal(field, "принято") == "1"
+    with pytest.raises(ValueError):
+        field.db_value("потеряно")
+
+
+def test_epoch_datetime_field():
+    field = _Row.stamp
+    moment = datetime.datetime(2024, 9, 2, 18, 30, 15, 123456)
+    assert field.python_value(field.db_value(moment)) == moment
+    assert field.db_value("2024-09-02 18:30:15.123456") == field.db_value(moment)
+    aware = moment.replace(tzinfo=datetime.timezone(datetime.timedelta(hours=3)))
+    assert field.python_value(field.db_value(aware)) == moment - datetime.timedelta(hours=3)
+    # Ещё не переведённая текстовая колонка читается
+    assert field.python_value("2024-09-02 18:30:15.123456") == moment
+
+
+def test_migrate_to_compact_and_back(app, db_path):
+    text_rows = _dump(db_path, "homeworksstudents")
+    text_check = json.loads(_run(db_path, False, "-c", CHECK_SCRIPT))
+
+    _run(db_path, True, "migrate_storage.py")
+    compact_rows = _dump(db_path, "homeworksstudents")
+    assert all(isinstance(value, int) for row in compact_rows for value in (row[5], row[7]))
+    compact_check = json.loads(_run(db_path, True, "-c", CHECK_SCRIPT))
+    assert compact_check == text_check
+    assert compact_check["drift"] == []
+
+    # Повторный запуск ничего не перестраивает, обратная миграция возвращает те же данные
+    assert "уже в выбранном режиме" in _run(db_path, True, "migrate_storage.py")
+    _run(db_path, False, "migrate_storage.py")
+    assert json.loads(_run(db_path, False, "-c", CHECK_SCRIPT)) == text_check
+    assert len(_dump(db_path, "homeworksstudents")) == len(text_rows)
@@ -0,0 +1,31 @@
+from models import Students
+from tests.conftest import ADMIN
+
+
+def test_student_group_id_is_an_integer(client):
+    # group_id - внешний ключ: без attribute="group_id.id" flask_restx пытался
+    # превратить в число объект Groups и отвечал 500
+    student = Students.select().first()
+    response = client.get(f"/student/{student.id}", headers=ADMIN)
+    assert response.status_code == 200
+    assert response.json["group_id"] == student.__data__["group_id"]
+    assert response.json["group_name"] == "python413"
+
+
+def test_create_student_returns_group_id(client):
+    response = client.post(
+        "/student/create/",
+        json={"first_name": "Анна", "last_name": "Новая", "group_id": 2},
+        headers=ADMIN,
+    )
+    assert response.status_code == 201
+    assert response.json["group_id"] == 2
+
+
+def test_create_student_unknown_group(client):
+    response = client.post(
+        "/student/create/",
+        json={"first_name": "Анна", "last_name": "Новая", "group_id": 999},
+        headers=ADMIN,
+    )
+    assert response.status_code == 404
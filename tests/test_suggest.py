@@ -0,0 +1,56 @@
+from models import Groups
+from tests.conftest import ADMIN
+
+
+def _suggest(client, query, **params):
+    response = client.get("/group/suggest", query_string={"q": query, **params}, headers=ADMIN)
+    assert response.status_code == 200
+    return [item["group_name"] for item in response.json]
+
+
+def test_prefix_matches_come_first(client):
+    client.post("/group/create/", json={"group_name": "Основы python"}, headers=ADMIN)
+    names = _suggest(client, "Pyth")
+    assert names[:3] == ["python413", "python414", "python415"]
+    assert names[3:] == ["Основы python"]
+
+
+def test_substring_and_normalisation(client):
+    client.post("/group/create/", json={"group_name": "Ёлки-Python"}, headers=ADMIN)
+    assert _suggest(client, "414") == ["python414"]
+    assert _suggest(client, "ЕЛКИ") == ["Ёлки-Python"]
+
+
+def test_limit(client):
+    assert len(_suggest(client, "python", limit=2)) == 2
+    response = client.get("/group/suggest", query_string={"q": "p", "limit": 0}, headers=ADMIN)
+    assert response.status_code == 400
+    response = client.get("/group/suggest", query_string={"q": "p", "limit": "x"}, headers=ADMIN)
+    assert response.status_code == 400
+
+
+def test_index_follows_group_changes(client):
+    group = Groups.get(Groups.group_name == "python413")
+    client.put(f"/group/update/{group.id}", json={"group_name": "java413"}, headers=ADMIN)
+    assert "python413" not in _suggest(client, "python")
+    assert _suggest(client, "java") == ["java413"]
+
+    client.delete(f"/group/delete/{group.id}", headers=ADMIN)
+    assert _suggest(client, "java") == []
+
+
+def test_rolled_back_batch_is_not_suggested(client):
+    response = client.post(
+        "/batch/",
+        json={
+            "mode": "atomic",
+            "operations": [
+                {"op": "create_group", "args": {"group_name": "rust1"}},
+                {"op": "create_group", "args": {"group_name": "python413"}},
+            ],
+        },
+        headers=ADMIN,
+    )
+    assert response.status_code == 400
+    assert response.json["results"][0]["status"] == "rolled_back"
+    assert _suggest(client, "rust") == []
@@ -0,0 +1,63 @@
+import datetime
+
+from models import Groups, OnlineLessons
+from tests.conftest import ADMIN
+
+WEEK = "2024-09-02"
+
+
+def test_week_timetable_is_conditional(client):
+    response = client.get(f"/lesson/timetable/1?week={WEEK}", headers=ADMIN)
+    assert response.status_code == 200
+    assert response.json["lessons"]
+    etag = response.headers["ETag"]
+
+    cached = client.get(f"/lesson/timetable/1?week={WEEK}", headers={**ADMIN, "If-None-Match": etag})
+    assert cached.status_code == 304
+
+
+def test_week_timetable_changes_with_lessons(client):
+    etag = client.get(f"/lesson/timetable/1?week={WEEK}", headers=ADMIN).headers["ETag"]
+    lesson = OnlineLessons.select().where(OnlineLessons.group_id == 1).order_by(OnlineLessons.lesson_date).first()
+    OnlineLessons.update(lesson_theme="Новая тема").where(OnlineLessons.id == lesson.id).execute()
+
+    response = client.get(f"/lesson/timetable/1?week={WEEK}", headers={**ADMIN, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json["lessons"][0]["lesson_theme"] == "Новая тема"
+
+
+def test_week_timetable_unknown_group(client):
+    assert client.get("/lesson/timetable/999", headers=ADMIN).status_code == 404
+
+
+def test_calendar_etag_changes_on_group_rename(client):
+    response = client.get("/lesson/1/calendar.ics", headers=ADMIN)
+    assert response.status_code == 200
+    assert "X-WR-CALNAME:python413" in response.get_data(as_text=True)
+    etag = response.headers["ETag"]
+
+    Groups.update(group_name="python999").where(Groups.id == 1).execute()
+
+    response = client.get("/lesson/1/calendar.ics", headers={**ADMIN, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert "X-WR-CALNAME:python999" in response.get_data(as_text=True)
+
+
+def test_calendar_dtstamp_is_utc(client):
+    lesson = OnlineLessons.select().where(OnlineLessons.group_id == 1).order_by(OnlineLessons.id).first()
+    updated_at = datetime.datetime(2024, 9, 2, 12, 30, 15)
+    OnlineLessons.update(lesson_date=datetime.date.today(), updated_at=updated_at).where(
+        OnlineLessons.id == lesson.id
+    ).execute()
+
+    calendar = client.get("/lesson/1/calendar.ics", headers=ADMIN).get_data(as_text=True)
+    event = calendar.split(f"UID:lesson-{lesson.id}@academy")[1].split("END:VEVENT")[0]
+    expected = updated_at.astimezone(datetime.timezone.utc)
+    assert f"DTSTAMP:{expected:%Y%m%dT%H%M%S}Z\r\n" in event
+
+
+def test_invalid_integer_params(client):
+    period = {"from": "2024-09-01", "to": "2024-12-31"}
+    assert client.get("/lesson/schedule", query_string={**period, "group_id": "abc"}).status_code == 400
+    assert client.get("/lesson/schedule", query_string={**period, "group_id": "1"}).status_code == 200
+    assert client.get("/lesson/1/calendar.ics?weeks_back=x").status_code == 400
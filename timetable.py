@@ -0,0 +1,265 @@
+"""
+Модуль timetable.py
+
+Кэш недельного расписания групп (OnlineLessons) и iCalendar лента по нему.
+
+Неделя группы собирается один раз и лежит в памяти процесса вместе с номером версии.
+Версии хранятся в таблице TimetableVersions и увеличиваются триггерами на OnlineLessons,
+поэтому неделя пересобирается только когда меняются занятия именно этой недели - неважно,
+через какой воркер или прямым SQL была сделана запись. Занятия из архивов прошлых
+учебных лет (archive.py) добавляются к неделе по запросу и в кэш не попадают.
+"""
+
+import datetime
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+from models import db, OnlineLessons, TimetableVersions
+
+# Понедельник недели для даты в SQLite: ближайшее воскресенье (включительно) минус 6 дней
+_SQL_WEEK_START = "date({row}.lesson_date, 'weekday 0', '-6 days')"
+
+_TRIGGER_BUMP = """
+    INSERT INTO {versions} (group_id, week_start, version)
+    VALUES ({row}.group_id, {week_start}, 1)
+    ON CONFLICT (group_id, week_start) DO UPDATE SET version = version + 1;
+"""
+
+
+class WeekTimetable(NamedTuple):
+    group_id: int
+    week_start: datetime.date
+    version: int
+    lessons: List[Dict[str, Any]]
+    ics_events: str  # Готовые VEVENT блоки недели
+    etag: str
+
+
+# Сколько недель держим в памяти процесса (самые давно запрошенные вытесняются)
+MAX_CACHED_WEEKS = 5000
+
+# (group_id, week_start) -> WeekTimetable
+_cache: "OrderedDict[Tuple[int, datetime.date], WeekTimetable]" = OrderedDict()
+_lock = threading.Lock()
+stats = {"hits": 0, "misses": 0}
+
+
+def week_start_of(day: datetime.date) -> datetime.date:
+    """Понедельник недели, в которую попадает day."""
+    return day - datetime.timedelta(days=day.weekday())
+
+
+def init_timetable() -> None:
+    """
+    Создаёт таблицу версий и триггеры на OnlineLessons, которые увеличивают версию недели.
+    """
+    db.create_tables([TimetableVersions], safe=True)
+    lessons = OnlineLessons._meta.table_name
+    versions = TimetableVersions._meta.table_name
+
+    def bump(row: str) -> str:
+        return _TRIGGER_BUMP.format(
+            versions=versions, row=row, week_start=_SQL_WEEK_START.format(row=row)
+        )
+
+    triggers = {
+        "trg_timetable_lesson_insert": f"AFTER INSERT ON {lessons} BEGIN {bump('NEW')} END",
+        "trg_timetable_lesson_delete": f"AFTER DELETE ON {lessons} BEGIN {bump('OLD')} END",
+        "trg_timetable_lesson_update": (
+            f"AFTER UPDATE ON {lessons} BEGIN {bump('OLD')} {bump('NEW')} END"
+        ),
+    }
+    with db.atomic():
+        for name, body in triggers.items():
+            db.execute_sql(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+
+def _current_version(group_id: int, week_start: datetime.date) -> int:
+    version = (
+        TimetableVersions.select(TimetableVersions.version)
+        .where(
+            (TimetableVersions.group_id == group_id)
+            & (TimetableVersions.week_start == week_start)
+        )
+        .scalar()
+    )
+    # Недели без единой записи в версиях ни разу не менялись
+    return version or 0
+
+
+def _ics_escape(text: str) -> str:
+    return (
+        text.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def _ics_fold(line: str) -> str:
+    """Переносит строку iCalendar длиннее 75 октетов (RFC 5545, 3.1)."""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line
+    parts = []
+    current = ""
+    limit = 75
+    for char in line:
+        if len((current + char).encode("utf-8")) > limit:
+            parts.append(current)
+            current = char
+            limit = 74  # Продолжение начинается с пробела
+        else:
+            current += char
+    parts.append(current)
+    return "\r\n ".join(parts)
+
+
+def _lesson_event(lesson: Dict[str, Any]) -> str:
+    start = datetime.datetime.combine(lesson["lesson_date"], lesson["lesson_time"])
+    # DTSTAMP по RFC 5545 - в UTC; время в базе локальное (наивное)
+    stamp = (lesson["updated_at"] or start).astimezone(datetime.timezone.utc)
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:lesson-{lesson['id']}@academy",
+        f"DTSTAMP:{stamp:%Y%m%dT%H%M%SZ}",
+        f"DTSTART:{start:%Y%m%dT%H%M%S}",
+        # Академический час - 45 минут
+        f"DURATION:PT{lesson['academic_hours'] * 45}M",
+        f"SUMMARY:{_ics_escape(lesson['lesson_theme'])}",
+    ]
+    if lesson["telegram_record_link"]:
+        lines.append(f"URL:{lesson['telegram_record_link']}")
+    if lesson["lesson_notes"]:
+        lines.append(f"DESCRIPTION:{_ics_escape(lesson['lesson_notes'])}")
+    lines.append("END:VEVENT")
+    return "".join(_ics_fold(line) + "\r\n" for line in lines)
+
+
+def _week_lessons(model, group_id: int, week_start: datetime.date) -> List[Dict[str, Any]]:
+    week_end = week_start + datetime.timedelta(days=6)
+    return list(
+        model.select(
+            model.id,
+            model.group_id,
+            model.lesson_date,
+            model.lesson_time,
+            model.academic_hours,
+            model.lesson_theme,
+            model.telegram_record_link,
+            model.lesson_notes,
+            model.updated_at,
+        )
+        .where((model.group_id == group_id) & (model.lesson_date.between(week_start, week_end)))
+        .order_by(model.lesson_date, model.lesson_time)
+        .dicts()
+    )
+
+
+def _build_week(group_id: int, week_start: datetime.date, version: int) -> WeekTimetable:
+    lessons = _week_lessons(OnlineLessons, group_id, week_start)
+    ics_events = "".join(_lesson_event(lesson) for lesson in lessons)
+    etag = f"{group_id}-{week_start.isoformat()}-{version}"
+    return WeekTimetable(group_id, week_start, version, lessons, ics_events, etag)
+
+
+def get_week(group_id: int, day: datetime.date, include_archived: bool = False) -> WeekTimetable:
+    """
+    Возвращает расписание группы на неделю, в которую попадает day.
+
+    Из кэша - если версия недели не изменилась, иначе неделя пересобирается.
+    С include_archived к неделе добавляются занятия из архива её учебного года (archive.py).
+    """
+    week = _cached_week(group_id, week_start_of(day))
+    if include_archived:
+        return _with_archived(week)
+    return week
+
+
+def _cached_week(group_id: int, week_start: datetime.date) -> WeekTimetable:
+    version = _current_version(group_id, week_start)
+    key = (group_id, week_start)
+
+    with _lock:
+        cached = _cache.get(key)
+        if cached is not None and cached.version == version:
+            stats["hits"] += 1
+            _cache.move_to_end(key)
+            return cached
+        stats["misses"] += 1
+
+    week = _build_week(group_id, week_start, version)
+    with _lock:
+        _cache[key] = week
+        _cache.move_to_end(key)
+        while len(_cache) > MAX_CACHED_WEEKS:
+            _cache.popitem(last=False)
+    return week
+
+
+def _with_archived(week: WeekTimetable) -> WeekTimetable:
+    """
+    Неделя вместе с занятиями из архива. Не кэшируется: версии недель ведут триггеры
+    основной базы, а архив они не видят. ETag - по содержимому архивной части.
+    """
+    from archive import archived_lessons
+
+    week_end = week.week_start + datetime.timedelta(days=6)
+    with archived_lessons(week.week_start, week_end) as models:
+        archived = [
+            lesson for model in models for lesson in _week_lessons(model, week.group_id, week.week_start)
+        ]
+    if not archived:
+        return week
+    lessons = sorted(week.lessons + archived, key=lambda lesson: (lesson["lesson_date"], lesson["lesson_time"]))
+    digest = hashlib.sha1(
+        "|".join(f"{lesson['id']}:{lesson['updated_at']}" for lesson in archived).encode("utf-8")
+    ).hexdigest()[:16]
+    return week._replace(
+        lessons=lessons,
+        ics_events="".join(_lesson_event(lesson) for lesson in lessons),
+        etag=f"{week.etag}-{digest}",
+    )
+
+
+def get_weeks(
+    group_id: int,
+    weeks_back: int,
+    weeks_ahead: int,
+    today: datetime.date = None,
+    include_archived: bool = False,
+) -> List[WeekTimetable]:
+    """Недели группы от weeks_back недель назад до weeks_ahead недель вперёд."""
+    current = week_start_of(today or datetime.date.today())
+    return [
+        get_week(group_id, current + datetime.timedelta(weeks=offset), include_archived)
+        for offset in range(-weeks_back, weeks_ahead + 1)
+    ]
+
+
+def build_calendar(group_name: str, weeks: List[WeekTimetable]) -> Tuple[str, str]:
+    """
+    Собирает iCalendar ленту из готовых недель.
+
+    Returns:
+        (текст календаря, ETag)
+    """
+    # Название группы тоже в ленте (X-WR-CALNAME): после переименования ETag должен смениться
+    etag = hashlib.sha1(
+        "|".join([group_name] + [week.etag for week in weeks]).encode("utf-8")
+    ).hexdigest()
+    header = "".join(
+        _ics_fold(line) + "\r\n"
+        for line in (
+            "BEGIN:VCALENDAR",
+            "VERSION:2.0",
+            "PRODID:-//Academy//Timetable//RU",
+            "CALSCALE:GREGORIAN",
+            f"X-WR-CALNAME:{_ics_escape(group_name)}",
+        )
+    )
+    body = "".join(week.ics_events for week in weeks)
+    return header + body + "END:VCALENDAR\r\n", etag
@@ -17,8 +17,11 @@ delete_group_id(group_id: int) -> bool
 update_group_id(group_id: int, new_group_name: str) -> Optional[Groups]
     Обновляет имя группы по ID. Возвращает обновлённую группу.
 
-get_groups_list(sort_direction: str = "asc", name_filter: Optional[str] = None) -> list
-    Возвращает список групп с возможностью сортировки и фильтрации по имени.
+suggest_groups(query: str, limit: int = 10) -> List[Dict[str, Any]]
+    Подсказки названий групп по префиксу/подстроке из индекса в памяти (group_index.py).
+
+get_groups_list(sort_direction: str = "asc", name_filter: Optional[str] = None, with_counters: bool = False) -> list
+    Возвращает список групп с возможностью сортировки и фильтрации по имени (и счётчиками).
 
 get_student_by_id(student_id: int, expand_fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]
     Возвращает студента по ID с возможностью раскрытия связанных объектов.
@@ -37,34 +40,89 @@ get_students_list(group_id: Optional[int] = None, name_filter: Optional[str] = N
 
 get_students_by_group_name(group_name: str, expand_fields: Optional[List[str]] = None) -> List[Dict[str, Any]]
     Возвращает список студентов по названию группы.
+
+get_lessons_schedule(date_from: datetime.date, date_to: datetime.date, group_id: Optional[int] = None, include_archived: bool = False) -> List[OnlineLessons]
+    Возвращает занятия за период (проход по диапазону индекса lesson_date), по желанию - и из архивов.
+
+grade_homework_submissions(homework_id: int, grades: List[Dict[str, Any]]) -> List[HomeworksStudents]
+    Выставляет статусы/оценки/отзывы по сдачам домашки набором запросов UPDATE ... FROM (VALUES ...).
+
+get_homework_submission(homework_id: int, student_id: int) -> HomeworksStudents
+    Возвращает сдачу домашки студентом.
+
+attach_homework_file(homework_id: int, student_id: int, file_path: str) -> HomeworksStudents
+    Прикрепляет к сдаче загруженный файл (homework_files.py) и отмечает её принятой.
 """
 
-from models import Groups, Students
-from peewee import DoesNotExist, IntegrityError
+from models import db, Groups, Students, OnlineLessons, Homeworks, HomeworksStudents, GroupCounters
+from peewee import DoesNotExist, IntegrityError, ValuesList, Select, JOIN, Case, Expression, fn
+from statement_cache import statement_cache
+from admission import retry_on_locked
+from group_index import group_index, group_changed
 import json
 import datetime
 from typing import Optional, List, Dict, Any
 
 
+# ========== ПОСТРОИТЕЛИ ГОРЯЧИХ ЗАПРОСОВ (см. statement_cache.py) ==========
+
+
+def _group_by_id_query(p):
+    return Groups.select().where(Groups.id == p.group_id)
+
+
+def _groups_list_query(p, sort_direction, has_name_filter, with_counters=False):
+    query = Groups.select()
+    if with_counters:
+        # Счётчики поддерживают триггеры (counters.py) - вместо COUNT(*) по трём таблицам
+        query = (
+            Groups.select(
+                Groups,
+                GroupCounters.students_count,
+                GroupCounters.lessons_count,
+                GroupCounters.pending_homeworks_count,
+            )
+            .join(GroupCounters, JOIN.LEFT_OUTER, on=(GroupCounters.group_id == Groups.id))
+            .objects()
+        )
+    if has_name_filter:
+        query = query.where(Groups.group_name.contains(p.name_filter))
+    if sort_direction == "asc":
+        query = query.order_by(Groups.group_name.asc())
+    elif sort_direction == "desc":
+        query = query.order_by(Groups.group_name.desc())
+    return query
+
+
+def _student_by_id_query(p, expand_group):
+    query = Students.select()
+    if expand_group:
+        # Выбираем и поля группы, чтобы group_id.group_name не делал отдельный запрос
+        query = Students.select(Students, Groups).join(Groups)
+    return query.where(Students.id == p.student_id)
+
+
 
 def get_group_by_id(group_id: int) -> Optional[Groups]:
     """
     Получает группу по ID.
     """
     try:
-        group = Groups.get(Groups.id == group_id)
+        group = statement_cache.get(_group_by_id_query, group_id=group_id)
         return group
     except DoesNotExist:
         print(f"Группа с ID {group_id} не найдена.")
         raise
 
 
+@retry_on_locked
 def create_group(group_name: str) -> Groups:
     """
     Создает новую группу с заданным именем.
     """
     try:
         group = Groups.create(group_name=group_name)
+        group_changed(group.id, group.group_name)
         return group
     # IntegrityError - нарушение целостности данных (уникальность, внежний ключ и т.д.)
     except IntegrityError:
@@ -72,6 +130,7 @@ def create_group(group_name: str) -> Groups:
         raise
 
 
+@retry_on_locked
 def delete_group_id(group_id: int) -> bool:
     """
     Удаляет группу по ID.
@@ -79,6 +138,7 @@ def delete_group_id(group_id: int) -> bool:
     try:
         group = Groups.get(Groups.id == group_id)
         group.delete_instance()
+        group_changed(group_id, None)
         return True
     except DoesNotExist:
         print("Группа не найдена.")
@@ -88,6 +148,7 @@ def delete_group_id(group_id: int) -> bool:
         raise
 
 
+@retry_on_locked
 def update_group_id(group_id: int, new_group_name: str) -> Optional[Groups]:
     """
     Обновляет имя группы по ID.
@@ -108,6 +169,7 @@ def update_group_id(group_id: int, new_group_name: str) -> Optional[Groups]:
 
         # Получаем обновленную группу
         updated_group = Groups.get(Groups.id == group_id)
+        group_changed(group_id, updated_group.group_name)
         return updated_group
 
     except DoesNotExist:
@@ -119,22 +181,31 @@ def update_group_id(group_id: int, new_group_name: str) -> Optional[Groups]:
 
 
 def get_groups_list(
-    sort_direction: str = "asc", name_filter: Optional[str] = None
+    sort_direction: str = "asc", name_filter: Optional[str] = None, with_counters: bool = False
 ) -> list:
     """
     Получает список групп с возможностью сортировки и фильтрации по имени.
-    """
-    query = Groups.select()
 
+    with_counters=True добавляет группам students_count, lessons_count и pending_homeworks_count.
+
+    Raises:
+        ValueError: Если sort_direction не 'asc' и не 'desc' (направление входит в форму
+            запроса в statement_cache - произвольные строки раздували бы кэш)
+    """
+    if sort_direction not in ("asc", "desc"):
+        raise ValueError(f"Неверное направление сортировки: {sort_direction!r}")
+    shape = (sort_direction, bool(name_filter), bool(with_counters))
     if name_filter:
-        query = query.where(Groups.group_name.contains(name_filter))
+        return statement_cache.select(_groups_list_query, shape, name_filter=name_filter)
+    return statement_cache.select(_groups_list_query, shape)
 
-    if sort_direction == "asc":
-        query = query.order_by(Groups.group_name.asc())
-    elif sort_direction == "desc":
-        query = query.order_by(Groups.group_name.desc())
 
-    return list(query)
+def suggest_groups(query: str, limit: int = 10) -> List[Dict[str, Any]]:
+    """
+    Подсказки для выбора группы: сначала названия, начинающиеся с query, затем содержащие его.
+    Без учёта регистра, "ё" и "е" не различаются. В базу не ходит (см. group_index.py).
+    """
+    return group_index.search(query, limit)
 
 
 # ========== ФУНКЦИИ ДЛЯ РАБОТЫ СО СТУДЕНТАМИ ==========
@@ -155,16 +226,16 @@ def get_student_by_id(
     """
     try:
         # Используем join для эффективного получения связанных данных
-        query = Students.select()
-        if expand_fields and "group" in expand_fields:
-            query = query.join(Groups)
-
-        student = query.where(Students.id == student_id).get()
+        expand_group = bool(expand_fields and "group" in expand_fields)
+        student = statement_cache.get(
+            _student_by_id_query, (expand_group,), student_id=student_id
+        )
         return student
     except DoesNotExist:
         return None
 
 
+@retry_on_locked
 def create_student(
     first_name: str,
     last_name: str,
@@ -213,6 +284,7 @@ def create_student(
         raise
 
 
+@retry_on_locked
 def update_student_by_id(student_id: int, **kwargs) -> Optional[Dict[str, Any]]:
     """
     Обновляет данные студента.
@@ -253,6 +325,7 @@ def update_student_by_id(student_id: int, **kwargs) -> Optional[Dict[str, Any]]:
         raise
 
 
+@retry_on_locked
 def delete_student_by_id(student_id: int) -> bool:
     """
     Удаляет студента по ID.
@@ -362,3 +435,257 @@ def get_students_by_group_name(
     except Exception as e:
         print(f"Ошибка при получении студентов группы: {e}")
         raise
+
+
+# ========== ФУНКЦИИ ДЛЯ РАБОТЫ С РАСПИСАНИЕМ ==========
+
+
+def _lessons_schedule_query(model, date_from, date_to, group_id):
+    query = model.select(model, Groups.id, Groups.group_name).join(Groups)
+    if group_id is not None:
+        query = query.where(model.group_id == group_id)
+    return query.where(model.lesson_date.between(date_from, date_to))
+
+
+def get_lessons_schedule(
+    date_from: datetime.date,
+    date_to: datetime.date,
+    group_id: Optional[int] = None,
+    include_archived: bool = False,
+) -> List[OnlineLessons]:
+    """
+    Получает занятия за период с возможностью фильтрации по группе.
+
+    Условие по lesson_date - диапазон, поэтому запрос идёт по индексу (group_id, lesson_date)
+    или (lesson_date), а не по всей таблице.
+
+    Args:
+        date_from: Начало периода (включительно)
+        date_to: Конец периода (включительно)
+        group_id: ID группы для фильтрации (опционально)
+        include_archived: Добавить занятия из архивов учебных лет за период (см. archive.py)
+
+    Returns:
+        Список занятий, отсортированный по дате и времени
+    """
+    order = (OnlineLessons.lesson_date.asc(), OnlineLessons.lesson_time.asc())
+    lessons = list(_lessons_schedule_query(OnlineLessons, date_from, date_to, group_id).order_by(*order))
+    if not include_archived:
+        return lessons
+
+    # Архивы нужны редко - модуль импортируется только для таких запросов
+    from archive import archived_lessons
+
+    with archived_lessons(date_from, date_to) as models:
+        for model in models:
+            lessons.extend(_lessons_schedule_query(model, date_from, date_to, group_id))
+    lessons.sort(key=lambda lesson: (lesson.lesson_date, lesson.lesson_time))
+    return lessons
+
+
+# ========== ФУНКЦИИ ДЛЯ ПРОВЕРКИ ДОМАШНИХ ЗАДАНИЙ ==========
+
+# Статусы сдачи в порядке движения; назад статус не откатывается
+HOMEWORK_STATUS_ORDER = ("не сдано", "принято", "проверено", "обратная связь выдана")
+# Сколько студентов в одном VALUES: 6 параметров на строку, с запасом до лимита переменных SQLite
+GRADES_CHUNK_SIZE = 500
+
+_GRADE_COLUMNS = ("student_id", "status", "mark", "set_mark", "feedback_text", "set_feedback")
+
+
+class GradingError(ValueError):
+    """Оценки не применены: недопустимые данные или переходы статусов."""
+
+    def __init__(self, message: str, conflicts: Optional[List[Dict[str, Any]]] = None):
+        super().__init__(message)
+        self.conflicts = conflicts or []
+
+
+def _grade_rows(grades: List[Dict[str, Any]]) -> List[tuple]:
+    """Проверяет входные оценки и превращает их в строки для VALUES."""
+    rows = []
+    seen = set()
+    for grade in grades:
+        student_id = grade.get("student_id")
+        if not isinstance(student_id, int) or isinstance(student_id, bool):
+            raise GradingError(f"Неверный student_id: {student_id!r}")
+        if student_id in seen:
+            raise GradingError(f"Студент {student_id} указан несколько раз")
+        seen.add(student_id)
+
+        status = grade.get("status")
+        if status is not None and status not in HOMEWORK_STATUS_ORDER:
+            raise GradingError(f"Неизвестный статус: {status}")
+        mark = grade.get("mark")
+        if mark is not None and (not isinstance(mark, int) or isinstance(mark, bool) or not 1 <= mark <= 12):
+            raise GradingError(f"Оценка должна быть от 1 до 12: {mark!r}")
+
+        # set_* отличают "поле не передано" от "очистить поле" (null).
+        # VALUES идёт в SQL мимо поля, поэтому статус переводим в вид хранения сами (db_fields.py)
+        rows.append(
+            (
+                student_id,
+                HomeworksStudents.status.db_value(status),
+                mark,
+                int("mark" in grade),
+                grade.get("feedback_text"),
+                int("feedback_text" in grade),
+            )
+        )
+    return rows
+
+
+def _status_rank(expression):
+    stored = HomeworksStudents.status.db_value
+    return Case(expression, [(stored(status), rank) for rank, status in enumerate(HOMEWORK_STATUS_ORDER)])
+
+
+def _grade_chunk(homework_id: int, rows: List[tuple], now: datetime.datetime) -> List[HomeworksStudents]:
+    grades = ValuesList(rows).cte("grades", columns=_GRADE_COLUMNS)
+    hs = HomeworksStudents
+
+    # Проверка всей пачки одним запросом: сдача существует и статус не идёт назад
+    conflicts = (
+        Select([grades], [grades.c.student_id, hs.status])
+        .with_cte(grades)
+        .join(hs, JOIN.LEFT_OUTER, on=((hs.homework_id == homework_id) & (hs.student_id == grades.c.student_id)))
+        .where(
+            hs.id.is_null()
+            | (grades.c.status.is_null(False) & (_status_rank(grades.c.status) < _status_rank(hs.status)))
+        )
+        .bind(hs._meta.database)
+        .dicts()
+    )
+    conflicts = [
+        {
+            "student_id": row["student_id"],
+            "error": (
+                "Сдача не найдена"
+                if row["status"] is None
+                else f"Статус нельзя вернуть из '{hs.status.python_value(row['status'])}'"
+            ),
+        }
+        for row in conflicts
+    ]
+    if conflicts:
+        raise GradingError("Оценки не применены", conflicts)
+
+    new_status = fn.COALESCE(grades.c.status, hs.status)
+    new_mark = Case(None, [(grades.c.set_mark == 1, grades.c.mark)], hs.mark)
+    new_feedback = Case(None, [(grades.c.set_feedback == 1, grades.c.feedback_text)], hs.feedback_text)
+    status_changed = grades.c.status.is_null(False) & (grades.c.status != hs.status)
+
+    query = (
+        hs.update(
+            status=new_status,
+            mark=new_mark,
+            feedback_text=new_feedback,
+            # Как trg_homeworks_students_check_date из doc/lesson_43.sql: дата первой проверки
+            checked_date=Case(
+                None,
+                [
+                    (
+                        status_changed & (grades.c.status != hs.status.db_value("не сдано")) & hs.checked_date.is_null(),
+                        hs.checked_date.db_value(now),
+                    )
+                ],
+                hs.checked_date,
+            ),
+            updated_at=now,
+        )
+        .with_cte(grades)
+        .from_(grades)
+        .where(
+            (hs.homework_id == homework_id)
+            & (hs.student_id == grades.c.student_id)
+            # Строки без изменений не трогаем - и не возвращаем
+            & (
+                status_changed
+                | ((grades.c.set_mark == 1) & Expression(hs.mark, "IS NOT", grades.c.mark))
+                | ((grades.c.set_feedback == 1) & Expression(hs.feedback_text, "IS NOT", grades.c.feedback_text))
+            )
+        )
+        .returning(hs)
+    )
+    return list(query.execute())
+
+
+@retry_on_locked
+def grade_homework_submissions(homework_id: int, grades: List[Dict[str, Any]]) -> List[HomeworksStudents]:
+    """
+    Выставляет статусы, оценки и отзывы по сдачам одной домашки.
+
+    Вся пачка применяется в одной транзакции: переходы статусов проверяются одним
+    запросом на пачку, изменения вносятся одним UPDATE ... FROM (VALUES ...) на пачку
+    (по GRADES_CHUNK_SIZE студентов), а не отдельным UPDATE на каждого.
+
+    Args:
+        homework_id: ID домашнего задания
+        grades: Список {"student_id", "status"?, "mark"?, "feedback_text"?};
+            не переданные поля не меняются, null в mark/feedback_text их очищает
+
+    Returns:
+        Только те сдачи, которые действительно изменились
+
+    Raises:
+        DoesNotExist: Если домашнее задание не найдено
+        GradingError: Если данные неверны, сдачи нет или статус идёт назад
+            (в conflicts - список {"student_id", "error"}); ничего не изменяется
+    """
+    try:
+        Homeworks.get_by_id(homework_id)
+    except DoesNotExist:
+        print(f"Домашнее задание с ID {homework_id} не найдено.")
+        raise
+
+    rows = _grade_rows(grades)
+    now = datetime.datetime.now()
+    changed: List[HomeworksStudents] = []
+    with db.atomic("IMMEDIATE"):
+        for start in range(0, len(rows), GRADES_CHUNK_SIZE):
+            changed.extend(_grade_chunk(homework_id, rows[start : start + GRADES_CHUNK_SIZE], now))
+    return changed
+
+
+# Пока сдачу не проверили, файл можно загрузить заново
+FILE_ACCEPTING_STATUSES = ("не сдано", "принято")
+
+
+def get_homework_submission(homework_id: int, student_id: int) -> HomeworksStudents:
+    """
+    Возвращает сдачу домашнего задания студентом.
+
+    Raises:
+        DoesNotExist: Если такой сдачи нет
+    """
+    hs = HomeworksStudents
+    try:
+        return hs.get((hs.homework_id == homework_id) & (hs.student_id == student_id))
+    except DoesNotExist:
+        print(f"Сдача домашнего задания {homework_id} студентом {student_id} не найдена.")
+        raise
+
+
+@retry_on_locked
+def attach_homework_file(homework_id: int, student_id: int, file_path: str) -> HomeworksStudents:
+    """
+    Прикрепляет к сдаче файл, уже записанный в хранилище (см. homework_files.store_stream).
+
+    Сдача становится "принято" с текущей датой сдачи.
+
+    Raises:
+        DoesNotExist: Если такой сдачи нет
+        GradingError: Если сдачу уже проверили
+    """
+    with db.atomic("IMMEDIATE"):
+        submission = get_homework_submission(homework_id, student_id)
+        if submission.status not in FILE_ACCEPTING_STATUSES:
+            raise GradingError(f"Сдача уже в статусе '{submission.status}', файл заменить нельзя")
+
+        now = datetime.datetime.now()
+        submission.file_path = file_path
+        submission.status = "принято"
+        submission.submission_date = now
+        submission.updated_at = now
+        submission.save()
+    return submission